@@ -1,5 +1,6 @@
 import click
 
+from .snapshot import snapshot
 from .typeset import typeset
 
 
@@ -17,3 +18,4 @@ def monospace():
 
 
 monospace.add_command(typeset)
+monospace.add_command(snapshot)
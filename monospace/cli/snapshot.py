@@ -0,0 +1,71 @@
+import os
+
+import click
+
+from ..core.snapshot import SnapshotError
+from ..core.snapshot import file_extension as snapshot_extension
+from ..core.snapshot import read_snapshot, snapshot_key, write_snapshot
+from ..core.typeset import process_documents
+from .typeset import read_input, set_log_level
+
+
+@click.command()
+@click.argument(
+    "markdown_file",
+    type=click.Path(exists=True), required=True)
+@click.option(
+    "--rebuild",
+    is_flag=True, default=False,
+    help="Parse and process the input again, and overwrite the snapshot.",
+)
+@click.option(
+    "-v", "--verbose",
+    count=True,
+    help="Enable logging. (-v: info, -vv: debug)"
+)
+@click.option(
+    "--no-cache", "no_cache",
+    is_flag=True, default=False,
+    help="Do not use the on-disk cache of parsed markdown.",
+)
+@click.option(
+    "--parser",
+    type=click.Choice(["pandoc", "builtin"]), default="pandoc",
+    help="Markdown parser: Pandoc, or the faster built-in parser "
+         "(supports a subset of Pandoc's markdown).",
+)
+def snapshot(markdown_file, rebuild, verbose, no_cache, parser):
+    """Inspect or rebuild the snapshot of a markdown file.
+
+    Snapshots hold the processed document, they are written next to the
+    output by `monospace typeset --snapshot`.
+    """
+    set_log_level(verbose)
+
+    output, working_dir, content = read_input(markdown_file)
+    path = "%s.%s" % (output, snapshot_extension)
+    documents = [content] if isinstance(content, str) else content
+
+    key = snapshot_key(documents, working_dir, parser)
+
+    if rebuild:
+        processed = process_documents(
+            documents, working_dir, use_cache=not no_cache, parser=parser)
+        write_snapshot(path, key, processed)
+
+    try:
+        snapshot = read_snapshot(path)
+    except FileNotFoundError:
+        raise click.ClickException(
+            f"No snapshot at '{path}', create it with --rebuild.")
+    except (OSError, SnapshotError) as e:
+        raise click.ClickException(str(e))
+
+    _, references, elements = snapshot.processed
+    click.echo(f"Snapshot:         {path}")
+    click.echo(f"Size:             {os.path.getsize(path)} bytes")
+    click.echo(f"Version:          {snapshot.version}")
+    click.echo(f"Source hash:      {snapshot.key[:12]}")
+    click.echo(f"Status:           {'up to date' if snapshot.key == key else 'outdated'}")
+    click.echo(f"Elements:         {len(elements)}")
+    click.echo(f"Cross-references: {len(references)}")
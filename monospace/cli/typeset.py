@@ -10,8 +10,10 @@ import click
 from leet.logging import log
 
 from ..core import typeset as do_typeset
+from ..core.domain import UnknownEdition
 from ..core.formatting import AnsiFormatter, HtmlFormatter, PostScriptFormatter
-from ..util import concatenate_markdown_directory
+from ..core.snapshot import file_extension as snapshot_extension
+from ..util import read_markdown_directory
 
 formatters = {
     "ansi": AnsiFormatter,
@@ -21,14 +23,24 @@ formatters = {
 }
 
 
+def parse_formats(ctx, param, value):
+    formats = value.split(",")
+    for name in formats:
+        if name not in formatters:
+            raise click.BadParameter(
+                "'%s' is not one of %s." % (name, ", ".join(formatters)))
+    return formats
+
+
 @click.command()
 @click.argument(
     "markdown_file",
     type=click.Path(exists=True), required=True)
 @click.option(
     "-t", "--to",
-    type=click.Choice(formatters.keys()), required=True,
-    help="Destination format.")
+    callback=parse_formats, required=True,
+    metavar="[%s],..." % "|".join(formatters),
+    help="Destination formats, separated by commas.")
 @click.option(
     "-p", "--preview", "preview",
     is_flag=True, default=False,
@@ -54,15 +66,106 @@ formatters = {
     is_flag=True, default=False,
     help="Skip checking the spelling of the input file(s).",
 )
-def typeset(markdown_file, to, preview, do_open, linear, verbose, skip_spellcheck):
+@click.option(
+    "--no-cache", "no_cache",
+    is_flag=True, default=False,
+    help="Do not use the on-disk caches of parsed markdown and rendered blocks.",
+)
+@click.option(
+    "--pandoc-server", "pandoc_server",
+    is_flag=True, default=False,
+    help="Run all conversions through a single long-lived Pandoc server.",
+)
+@click.option(
+    "--parser",
+    type=click.Choice(["pandoc", "builtin"]), default="pandoc",
+    help="Markdown parser: Pandoc, or the faster built-in parser "
+         "(supports a subset of Pandoc's markdown).",
+)
+@click.option(
+    "--snapshot",
+    is_flag=True, default=False,
+    help="Save the processed document next to the output, and reuse it "
+         "while the input does not change.",
+)
+@click.option(
+    "-j", "--jobs",
+    type=click.IntRange(min=1), default=1,
+    help="Number of processes rendering the book.",
+)
+@click.option(
+    "-e", "--edition", "editions",
+    multiple=True,
+    help="Only typeset this edition of the book, from the 'editions' setting "
+         "(can be repeated).",
+)
+def typeset(
+    markdown_file, to, preview, do_open, linear, verbose, skip_spellcheck, no_cache,
+    pandoc_server, parser, snapshot, jobs, editions,
+):
     """Typeset a markdown file into a book.
 
     Saves the formatted book in the same directory as the input file.
+    Each edition listed in the 'editions' setting is saved with the
+    name of the edition before the extension.
 
     If the MARKDOWN_FILE argument is a path, all contained markdown files will
     be concatenated before typesetting (in alphabetical order.)
     """
 
+    set_log_level(verbose)
+
+    output, working_dir, content = read_input(markdown_file)
+    snapshot_path = None
+    if snapshot:
+        snapshot_path = "%s.%s" % (output, snapshot_extension)
+
+    # Parsing, rendering and layout are shared by all formats
+    selected = list(dict.fromkeys(formatters[name] for name in to))
+
+    if preview:
+        if len(to) > 1:
+            raise click.UsageError(
+                "Option --preview is not available with more than one format")
+        if to == ["pdf"]:
+            raise click.UsageError(
+                "Option --preview is not available with format 'pdf'")
+        output = sys.stdout
+
+    try:
+        outputs = do_typeset(
+            markdown_content=content,
+            output=output,
+            working_dir=working_dir,
+            formatters=selected,
+            linear=linear,
+            check_spelling_path=markdown_file if not skip_spellcheck else None,
+            use_cache=not no_cache,
+            pandoc_server=pandoc_server,
+            parser=parser,
+            snapshot_path=snapshot_path,
+            jobs=jobs,
+            editions=list(editions) or None,
+        )
+    except UnknownEdition as e:
+        # Editions are only known once the settings of the book are read
+        raise click.BadParameter(str(e), param_hint="'-e' / '--edition'")
+
+    if preview:
+        return
+
+    for output in outputs:
+        if "pdf" in to:
+            subprocess.check_call(["ps2pdf", output + ".ps", output + ".pdf"])
+
+        if do_open:
+            for name in to:
+                path = os.path.abspath("%s.%s" % (output, name))
+                uri = pathlib.Path(path).as_uri()
+                webbrowser.open(uri)
+
+
+def set_log_level(verbose):
     log_level = logging.WARNING
     if verbose == 1:
         log_level = logging.INFO
@@ -70,37 +173,17 @@ def typeset(markdown_file, to, preview, do_open, linear, verbose, skip_spellchec
         log_level = logging.DEBUG
     log.setLevel(log_level)
 
+
+def read_input(markdown_file):
+    """Returns the output path (without extension), working directory
+    and markdown content of a markdown file or directory."""
     if os.path.isdir(markdown_file):
         output = os.path.join(markdown_file, os.path.split(markdown_file)[-1])
         working_dir = Path(markdown_file)
-        content = concatenate_markdown_directory(markdown_file)
+        content = read_markdown_directory(markdown_file)
     else:
         output = markdown_file.rsplit(".md", 1)[0]
         working_dir = Path(markdown_file).parent
         with open(markdown_file, "r") as f:
             content = f.read()
-
-    formatter = formatters[to]
-
-    if preview:
-        if to == "pdf":
-            raise click.UsageError(
-                "Option --preview is not available with format 'pdf'")
-        output = sys.stdout
-
-    do_typeset(
-        markdown_content=content,
-        output=output,
-        working_dir=working_dir,
-        formatter=formatter,
-        linear=linear,
-        check_spelling_path=markdown_file if not skip_spellcheck else None,
-    )
-
-    if to == "pdf":
-        subprocess.check_call(["ps2pdf", output + ".ps", output + ".pdf"])
-
-    if do_open and not preview:
-        path = os.path.abspath("%s.%s" % (output, to))
-        uri = pathlib.Path(path).as_uri()
-        webbrowser.open(uri)
+    return output, working_dir, content
@@ -0,0 +1,184 @@
+"""Content-addressed on-disk caches, and in-memory caches
+
+Entries of on-disk caches are stored compressed, one file per key,
+under a namespace directory:
+
+    $MONOSPACE_CACHE_DIR/<namespace>/<key[:2]>/<key>
+
+When no cache directory is configured, `$XDG_CACHE_HOME/monospace`
+(or `~/.cache/monospace`) is used.
+
+Each namespace is bounded in size. Reading an entry refreshes its
+modification time, so that when the namespace grows over its size cap,
+the least recently used entries are evicted first.
+
+In-memory caches are bounded in number of entries, and also evict the least
+recently used entries first.
+"""
+
+import hashlib
+import os
+import tempfile
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, List, Optional, Tuple
+
+from leet.logging import log
+
+
+def default_cache_dir() -> Path:
+    if "MONOSPACE_CACHE_DIR" in os.environ:
+        return Path(os.environ["MONOSPACE_CACHE_DIR"])
+    xdg_cache = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return Path(xdg_cache) / "monospace"
+
+
+def make_key(*parts) -> str:
+    """Hashes all given parts (strings or bytes) into a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("UTF-8")
+        # Length-prefix each part so that ("ab", "c") != ("a", "bc")
+        digest.update(b"%d:" % len(part))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class Cache(object):
+    """Hit and miss counters of a cache."""
+
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def log_stats(self) -> None:
+        total = self.hits + self.misses
+        if total:
+            log.info(
+                f"Cache '{self.namespace}': {self.hits}/{total} hits "
+                f"({100 * self.hits / total:.0f}%)."
+            )
+
+
+class DiskCache(Cache):
+    def __init__(
+        self,
+        namespace: str,
+        max_size: int,
+        directory: Optional[Path] = None
+    ) -> None:
+        super().__init__(namespace)
+        self.max_size = max_size
+        self.directory = (
+            Path(directory) if directory is not None else default_cache_dir()
+        ) / namespace
+        # Total size on disk, computed lazily on first write
+        self.size: Optional[int] = None
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        compressed = zlib.compress(data)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write atomically, concurrent builds may share the cache
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log.warning(f"Could not write to cache '{self.directory}': {e}")
+            return
+
+        if self.size is None:
+            self.size = sum(size for _, _, size in self.entries())
+        else:
+            self.size += len(compressed)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def entries(self) -> List[Tuple[float, Path, int]]:
+        result = []
+        if not self.directory.is_dir():
+            return result
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith(".tmp-"):
+                    continue
+                stat = entry.stat()
+                result.append((stat.st_mtime, Path(entry.path), stat.st_size))
+        return result
+
+    def evict(self) -> None:
+        entries = sorted(self.entries())
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, path, size in entries:
+            if total <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        self.size = total
+        log.debug(f"Evicted {evicted} entries from cache '{self.namespace}'.")
+
+    def clear(self) -> None:
+        for _, path, _ in self.entries():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self.size = 0
+
+
+class MemoryCache(Cache):
+    def __init__(self, namespace: str, max_entries: int) -> None:
+        super().__init__(namespace)
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = value
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
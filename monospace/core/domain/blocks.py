@@ -1,11 +1,17 @@
 from dataclasses import dataclass, field
 from typing import List
 
+from ...util import slotted
+from ..formatting import Line
 
+
+@slotted
 @dataclass
 class Block:
-    main: List[str] = field(default_factory=list)
-    sides: List[List[str]] = field(default_factory=list)
+    main: List[Line] = field(default_factory=list)
+    sides: List[List[Line]] = field(default_factory=list)
     side_offset: int = 0
     block_offset: int = 1
     break_before: bool = False
+    # The main part can be split between any two lines across pages
+    splittable: bool = False
@@ -1,19 +1,23 @@
 from dataclasses import dataclass, field
 from typing import List, Optional, Union
 
+from ...util import slotted
 
+
+@slotted
 @dataclass
 class TextElement:
     children: List["Element"]
 
 
 class StructureElement:
-    pass
+    __slots__ = ()
 
 
 TextElements = List[Union[TextElement, str]]
 
 
+@slotted
 @dataclass
 class Text:
     elements: TextElements
@@ -25,12 +29,14 @@ Element = Union[StructureElement, TextElement, "Space", str]
 # --- Structure Elements ------------------------------------------------------
 
 
+@slotted
 @dataclass
 class Chapter(StructureElement):
     title: Text
     identifier: str
 
 
+@slotted
 @dataclass
 class SubChapter(StructureElement):
     title: Text
@@ -38,45 +44,53 @@ class SubChapter(StructureElement):
     identifier: str
 
 
+@slotted
 @dataclass
 class Section(StructureElement):
     title: Text
     identifier: str
 
 
+@slotted
 @dataclass
 class Paragraph(StructureElement):
     text: Text
 
 
+@slotted
 @dataclass
 class Quote(StructureElement):
     text: Text
 
 
+@slotted
 @dataclass
 class OrderedList(StructureElement):
     # Pandoc SHOULD only provide StructureElements here
     list_elements: List[List[Element]]
 
 
+@slotted
 @dataclass
 class UnorderedList(StructureElement):
     # Pandoc SHOULD only provide StructureElements here
     list_elements: List[List[Element]]
 
 
+@slotted
 @dataclass
 class Aside(StructureElement):
     elements: List[Element]
 
 
+@slotted
 @dataclass
 class CodeBlock(StructureElement):
     language: str
     code: str
 
 
+@slotted
 @dataclass
 class Image(StructureElement):
     uri: str
@@ -85,11 +99,13 @@ class Image(StructureElement):
     mode: Optional[str] = None
 
 
+@slotted
 @dataclass
 class PageBreak(StructureElement):
     pass
 
 
+@slotted
 @dataclass
 class Unprocessed(StructureElement):
     kind: str
@@ -98,44 +114,67 @@ class Unprocessed(StructureElement):
 # --- Text Elements -----------------------------------------------------------
 
 
+@slotted
 @dataclass
 class Italic(TextElement):
     pass
 
 
+@slotted
 @dataclass
 class Bold(TextElement):
     pass
 
 
+@slotted
+@dataclass
+class SmallCaps(TextElement):
+    """Text already set in small caps, see `styles.small_caps`."""
+
+
+@slotted
 @dataclass
 class CrossRef(TextElement):
     identifier: str
 
 
+@slotted
 @dataclass
 class Code(TextElement):
     pass
 
 
+@slotted
 @dataclass
 class Quoted(TextElement):
     pass
 
 
+@slotted
 @dataclass
 class Anchor(TextElement):
     identifier: str
 
 
+@slotted
 @dataclass
 class Note(TextElement):
     count: Optional[int]
 
 
-@dataclass
 class Space:
-    count: int = 1
+    """A single space between two words.
+
+    There is only one instance, shared by all word gaps: the additional
+    spaces used to justify lines are counted by `paragraph.align`.
+    """
+    __slots__ = ()
+    instance: Optional["Space"] = None
+
+    def __new__(cls):
+        if cls.instance is None:
+            cls.instance = super().__new__(cls)
+        return cls.instance
 
     def __repr__(self):
         return "_"
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Dict, Generic, List, TypeVar
 
 from ...util import flatten_dict
@@ -6,6 +6,10 @@ from ...util import flatten_dict
 T = TypeVar("T")
 
 
+class UnknownEdition(ValueError):
+    pass
+
+
 @dataclass
 class Setting(Generic[T]):
     key: str
@@ -86,16 +90,54 @@ schema = {
             help="Draw border around the pages (mostly for debugging)",
             default=False,
         ),
+        "line_breaking": Setting[str](
+            key="line-breaking",
+            help="How justified paragraphs are broken into lines: "
+                 "greedy (line by line) or optimal (whole paragraph, Knuth-Plass)",
+            default="greedy",
+        ),
+        "page_breaking": Setting[str](
+            key="page-breaking",
+            help="How blocks are broken into pages: greedy (page by page) "
+                 "or optimal (several pages at once, splitting paragraphs)",
+            default="greedy",
+        ),
+        "page_lookahead": Setting[int](
+            key="page-lookahead",
+            help="Number of pages the optimal page breaking considers at once",
+            default=4,
+        ),
+        "language": Setting[str](
+            key="language",
+            help="Language of the text, used for hyphenation (e.g. en_US, de, fr_FR)",
+            default="en_US",
+        ),
         "dictionary": Setting[List[str]](
             key="dictionary",
             help="List of words to ignore during spell-check",
             default=[],
         ),
+        "editions": Setting[Dict[str, dict]](
+            key="editions",
+            help="Named editions of the book, each changing some of the page height, "
+                 "margins, separation, borders and page breaking "
+                 "(e.g. pocket: {dimensions: {page-height: 40}})",
+            default={},
+        ),
     },
 }
 
 flat_schema: Dict[str, Setting] = flatten_dict(schema)
 
+# Settings that only change how blocks are laid out in pages, editions can change them
+layout_settings = [
+    "page_height",
+    "margin_top", "margin_inside", "margin_outside", "margin_bottom",
+    "side_spacing",
+    "draw_borders",
+    "page_breaking", "page_lookahead",
+]
+
 
 @dataclass
 class Settings:
@@ -116,7 +158,12 @@ class Settings:
     break_before: List[str]
     github_anchors: bool
     draw_borders: bool
+    line_breaking: str
+    page_breaking: str
+    page_lookahead: int
+    language: str
     dictionary: List[str]
+    editions: Dict[str, dict]
     # Internal use
     working_dir: str
 
@@ -138,8 +185,57 @@ class Settings:
             **kwargs,
         )
         settings.dictionary = [w.lower() for w in settings.dictionary]
+        check_values(settings)
+        allowed = {flat_schema[name].key for name in layout_settings}
+        for name, edition in settings.editions.items():
+            if not isinstance(edition, dict):
+                raise ValueError("Edition '%s' must be a map of settings" % name)
+            unknown = sorted(set(keys(edition)) - allowed)
+            if unknown:
+                raise ValueError(
+                    "Edition '%s' cannot change '%s', only the page height, "
+                    "margins, separation, borders and page breaking"
+                    % (name, "', '".join(unknown))
+                )
+            try:
+                check_values(settings.edition(name))
+            except ValueError as e:
+                raise ValueError("Edition '%s': %s" % (name, e)) from e
         return settings
 
+    def edition(self, name: str) -> "Settings":
+        """Returns the settings of an edition of the book.
+
+        Editions only change the layout settings, so that all editions
+        can be laid out from the same rendered blocks.
+        """
+        if name not in self.editions:
+            raise UnknownEdition(
+                "Unknown edition '%s', expected one of: %s"
+                % (name, ", ".join(self.editions) or "(none)")
+            )
+        overrides = self.editions[name]
+        return replace(self, **{
+            setting: get(overrides, flat_schema[setting].key, getattr(self, setting))
+            for setting in layout_settings
+        })
+
+
+def check_values(settings: Settings) -> None:
+    """Raises a ValueError if a setting has a value that is not supported."""
+    if settings.line_breaking not in ("greedy", "optimal"):
+        raise ValueError(
+            "Unknown line breaking '%s', expected 'greedy' or 'optimal'"
+            % settings.line_breaking
+        )
+    if settings.page_breaking not in ("greedy", "optimal"):
+        raise ValueError(
+            "Unknown page breaking '%s', expected 'greedy' or 'optimal'"
+            % settings.page_breaking
+        )
+    if settings.page_lookahead < 1:
+        raise ValueError("Page lookahead must be at least 1 page")
+
 
 def get(dictionary, key, default):
     keys = key.split(".")
@@ -150,3 +246,12 @@ def get(dictionary, key, default):
         else:
             return default
     return current
+
+
+def keys(dictionary, prefix=""):
+    """Dotted keys of all values of nested dictionaries."""
+    for key, value in dictionary.items():
+        if isinstance(value, dict):
+            yield from keys(value, prefix + key + ".")
+        else:
+            yield prefix + key
@@ -1,5 +1,6 @@
 from .ansi import AnsiFormatter
-from .formatter import Format, FormatTag, Formatter
+from .formatter import (Format, FormatTag, Formatter, Glyph, Line, styled,
+                        write_files)
 from .html import HtmlFormatter
 from .postscript import PostScriptFormatter
 
@@ -8,6 +9,10 @@ __all__ = [
     "Format",
     "FormatTag",
     "Formatter",
+    "Glyph",
     "HtmlFormatter",
+    "Line",
     "PostScriptFormatter",
+    "styled",
+    "write_files",
 ]
@@ -1,6 +1,8 @@
+import unicodedata
 from typing import List, Union
 
 from ..domain import Settings
+from ..symbols import characters
 from .formatter import Format as F
 from .formatter import FormatTag, Formatter
 
@@ -19,16 +21,18 @@ def tag_color(tag, fg):
     return csi([38 if fg else 48, 2, *rgb(tag.data["color"])], "m")
 
 
+# Default colors, by whether the theme is light
+default_fg = {False: csi([39], "m"), True: csi([30], "m")}
+default_bg = {False: csi([49], "m"), True: csi([107], "m")}
+reset = csi([0], "m")
+
+
 def reset_fg(settings):
-    if settings.light:
-        return csi([30], "m")
-    return csi([39], "m")
+    return default_fg[settings.light]
 
 
 def reset_bg(settings):
-    if settings.light:
-        return csi([107], "m")
-    return csi([49], "m")
+    return default_bg[settings.light]
 
 
 def fg_sequence(tag, settings):
@@ -56,6 +60,12 @@ def get_code(tag, settings):
 
 class AnsiFormatter(Formatter):
     file_extension = "ansi"
+    glyphs = {characters.small_cap_q: "Q"}
+
+    @staticmethod
+    def glyph_width(glyph: str) -> int:
+        # Terminals print circled numbers up to 20 on one character o_O
+        return 2 if unicodedata.east_asian_width(glyph) == "W" else 1
 
     @staticmethod
     def format_tags(line: List[Union[FormatTag, str]], settings) -> str:
@@ -78,7 +88,7 @@ class AnsiFormatter(Formatter):
 
     @staticmethod
     def format_line(line: str, settings) -> str:
-        return reset_fg(settings) + reset_bg(settings) + line + csi([0], "m")
+        return reset_fg(settings) + reset_bg(settings) + line + reset
 
     @staticmethod
     def end_page(settings: Settings) -> str:
@@ -1,21 +1,25 @@
 from abc import ABCMeta, abstractmethod, abstractproperty
+from contextlib import ExitStack
 from dataclasses import dataclass, field
 from enum import Enum
 from io import TextIOWrapper as IOStream
-from typing import Any, Dict, List, Union
+from typing import (Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type,
+                    Union)
 
 from leet.logging import log
 
+from ...util import slotted
 from ..domain import Settings
 
 Format = Enum("Format", [
     "Bold", "Italic",
-    "Code", "Quoted", "CrossRef", "Anchor",
+    "Code", "Quoted", "CrossRef", "Anchor", "SmallCaps",
     # Warning: nesting colors of the same type will not be supported
     "ForegroundColor", "BackgroundColor"
 ])
 
 
+@slotted
 @dataclass
 class FormatTag:
     kind: Format
@@ -27,40 +31,129 @@ class FormatTag:
         return FormatTag(kind=self.kind, open=False)
 
 
+@slotted
+@dataclass
+class Glyph:
+    """A symbol padded with spaces to `width` characters.
+
+    How many characters the symbol itself takes depends on the format,
+    see `Formatter.glyph_width`.
+    """
+    text: str
+    width: int
+
+
+# Styled lines are rendered once and serialised by each formatter when writing
+# the file. A line is a tuple of spans, each span is serialised by one call to
+# `Formatter.format_tags`, so lines are concatenated with `+`.
+Span = Tuple[Union[FormatTag, str], ...]
+Line = Tuple[Union[Span, Glyph], ...]
+
+
+def styled(elements: Union[str, List[Union[FormatTag, str]]]) -> Line:
+    """Returns a line made of a single span of strings and tags."""
+    if isinstance(elements, str):
+        return ((elements,),)
+    return (tuple(elements),)
+
+
 class Formatter(metaclass=ABCMeta):
     """A suite of static methods for formatting a file in a given format."""
 
+    # Glyphs that do not display nicely in this format, and their replacement
+    # in `Glyph` spans and small caps
+    glyphs: Dict[str, str] = {}
+
+    @classmethod
+    def write_file(cls, output: Union[str, IOStream], pages: Iterable[Sequence[Line]],
+                   settings: Settings):
+        write_files([cls], output, pages, settings)
+
     @classmethod
-    def write_file(cls, output: Union[str, IOStream], pages: List[List[str]], settings: Settings):
-        output_name = str(output.name) if isinstance(output, IOStream) else output
-        log.debug(f"Writing final book to '{output_name}' using renderer '{cls.__name__}'...")
-
-        def do_write(f):
-            def w(s):
-                f.write(s)
-                f.write("\n")
-
-            w(cls.begin_file(settings))
-            for page in pages:
-                w(cls.begin_page(settings))
-                for line in page:
-                    w(cls.format_line(line, settings))
-                w(cls.end_page(settings))
-            w(cls.end_file(settings))
-
-        if isinstance(output, IOStream):
-            do_write(output)
-        else:
-            with open("%s.%s" % (output, cls.file_extension), "w") as f:
-                do_write(f)
+    def format_page(cls, page: Sequence[Line], settings: Settings) -> str:
+        """Returns a page in this format, ending with a new line.
+
+        Lines and spans repeated on a page (margins, empty lines) are the same
+        objects, they are serialised once per page.
+        """
+        spans: Dict[int, str] = {}
+        formatted: Dict[int, str] = {}
+        # Lines are looked up by identity, keep the ones composed when they
+        # are read alive until the page is formatted
+        page = list(page)
+        lines = [cls.begin_page(settings)]
+        for line in page:
+            result = formatted.get(id(line))
+            if result is None:
+                result = cls.format_line(cls.serialize(line, settings, spans), settings)
+                formatted[id(line)] = result
+            lines.append(result)
+        lines.append(cls.end_page(settings))
+        lines.append("")
+        return "\n".join(lines)
+
+    @classmethod
+    def serialize(
+        cls, line: Line, settings: Settings, spans: Optional[Dict[int, str]] = None,
+    ) -> str:
+        """Returns a styled line in this format.
+
+        Spans are looked up by identity in `spans`, and added to it.
+        """
+        if spans is None:
+            spans = {}
+
+        def format_span(span):
+            result = spans.get(id(span))
+            if result is None:
+                if isinstance(span, Glyph):
+                    text = cls.replace_glyphs(span.text)
+                    result = cls.format_tags(
+                        [text + " " * (span.width - cls.glyph_width(text))], settings)
+                else:
+                    result = cls.format_tags(span, settings)
+                    # Rarely needed, glyphs are only replaced in small caps
+                    if cls.glyphs and any(glyph in result for glyph in cls.glyphs):
+                        result = cls.format_tags(cls.replace_small_caps(span), settings)
+                spans[id(span)] = result
+            return result
+
+        return "".join(map(format_span, line))
+
+    @classmethod
+    def replace_glyphs(cls, text: str) -> str:
+        for glyph, replacement in cls.glyphs.items():
+            text = text.replace(glyph, replacement)
+        return text
+
+    @classmethod
+    def replace_small_caps(cls, span: Span) -> Span:
+        """Replaces the glyphs of the texts in small caps of a span.
+
+        Other texts are left as they are, they may use the same characters.
+        """
+        result: List[Union[FormatTag, str]] = []
+        depth = 0
+        for elem in span:
+            if isinstance(elem, str):
+                if depth > 0:
+                    elem = cls.replace_glyphs(elem)
+            elif elem.kind == Format.SmallCaps:
+                depth += 1 if elem.open else -1
+            result.append(elem)
+        return tuple(result)
+
+    @staticmethod
+    def glyph_width(glyph: str) -> int:
+        """Returns the number of characters a glyph takes in this format."""
+        return 1
 
     @staticmethod
     @abstractmethod
     def format_tags(line: List[Union[FormatTag, str]], settings) -> str:
         """Returns the formatting necessary for given tags.
 
-        This is used in `paragraph.align`, but must also
-        be used for any inserted text in `Renderer` or in `layout`.
+        Every span of a styled line is formatted with one call, see `serialize`.
         """
 
     @abstractproperty
@@ -82,7 +175,7 @@ class Formatter(metaclass=ABCMeta):
     def format_line(line: str, settings: Settings) -> str:
         """Formats a line in this format.
 
-        The line must have been formatted using `format_tag` calls.
+        The line has been serialised with `serialize`.
         """
 
     @staticmethod
@@ -94,3 +187,37 @@ class Formatter(metaclass=ABCMeta):
     @abstractmethod
     def end_file(settings: Settings) -> str:
         """Returns the end of a file necessary for this format."""
+
+
+def write_files(
+    formatters: List[Type[Formatter]],
+    output: Union[str, IOStream],
+    pages: Iterable[Sequence[Line]],
+    settings: Settings,
+):
+    """Writes pages in several formats at once, as they are laid out.
+
+    Every page is written and flushed before the next one is taken from
+    `pages`, so only one page of the book is in memory.
+    """
+    if isinstance(output, IOStream) and len(formatters) > 1:
+        raise ValueError("Only one format can be written to a stream")
+
+    with ExitStack() as stack:
+        files = []
+        for formatter in formatters:
+            if isinstance(output, IOStream):
+                f = output
+            else:
+                f = stack.enter_context(open("%s.%s" % (output, formatter.file_extension), "w"))
+            log.debug(f"Writing final book to '{f.name}' using renderer '{formatter.__name__}'...")
+            f.write(formatter.begin_file(settings) + "\n")
+            files.append(f)
+
+        for page in pages:
+            for formatter, f in zip(formatters, files):
+                f.write(formatter.format_page(page, settings))
+                f.flush()
+
+        for formatter, f in zip(formatters, files):
+            f.write(formatter.end_file(settings) + "\n")
@@ -2,6 +2,7 @@ import html
 from typing import List, Union
 
 from ..domain import Settings
+from ..symbols import characters
 from .formatter import Format as F
 from .formatter import FormatTag, Formatter
 
@@ -32,7 +33,10 @@ tag_attributes = {
     }
 }
 
-black_list = [F.Code, F.Quoted]
+black_list = [F.Code, F.Quoted, F.SmallCaps]
+
+# Circled numbers are two characters wide
+wide_glyphs = set(characters.circled_numbers)
 
 
 def tag(format_tag):
@@ -50,6 +54,11 @@ def tag(format_tag):
 class HtmlFormatter(Formatter):
     file_extension = "html"
     counter = 0  # Bad!
+    glyphs = {characters.small_cap_q: "Q"}
+
+    @staticmethod
+    def glyph_width(glyph: str) -> int:
+        return 2 if glyph in wide_glyphs else 1
 
     @staticmethod
     def format_tags(line: List[Union[FormatTag, str]], settings) -> str:
@@ -1,27 +1,38 @@
+from functools import lru_cache
+from importlib import resources
 from typing import List, Set, Union
 
-import pkg_resources
-from jinja2 import Template
-
 from ..domain import Settings
 from .formatter import Format as F
 from .formatter import FormatTag, Formatter
 
 
 def get_file(name):
-    return pkg_resources.resource_string(__name__, name).decode("UTF-8")
+    return resources.files(__package__).joinpath(name).read_bytes().decode("UTF-8")
+
+
+# The fonts weigh a few megabytes: only load them when writing a PostScript file
+
+@lru_cache(maxsize=None)
+def template():
+    from jinja2 import Template
+    return Template(get_file("postscript_template.ps"))
+
 
+@lru_cache(maxsize=None)
+def fonts():
+    return "\n".join([
+        get_file("iosevka-plus-regular.t42"),
+        get_file("iosevka-plus-italic.t42"),
+        get_file("iosevka-plus-bold.t42"),
+        get_file("iosevka-plus-bold-italic.t42"),
+    ])
 
-template = Template(get_file("postscript_template.ps"))
 
-fonts = "\n".join([
-    get_file("iosevka-plus-regular.t42"),
-    get_file("iosevka-plus-italic.t42"),
-    get_file("iosevka-plus-bold.t42"),
-    get_file("iosevka-plus-bold-italic.t42"),
-])
+@lru_cache(maxsize=None)
+def reverse_glyphs():
+    return get_file("reverse_glyphs.ps")
 
-reverse_glyphs = get_file("reverse_glyphs.ps")
 
 font_styles = {
     (): "fR",
@@ -93,9 +104,9 @@ class PostScriptFormatter(Formatter):
 
     @staticmethod
     def begin_file(settings: Settings) -> str:
-        return template.render(
-            fonts=fonts,
-            reverse_glyphs=reverse_glyphs,
+        return template().render(
+            fonts=fonts(),
+            reverse_glyphs=reverse_glyphs(),
             page_width=settings.page_width,
             page_height=settings.page_height,
         )
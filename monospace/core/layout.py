@@ -1,75 +1,205 @@
-from typing import Dict, Iterator, List, Tuple, Type
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Iterator, List, Optional, Tuple
 
-from leet.logging import log, log_progress
+from leet.logging import log
 
+from ..util import slotted
 from .domain import Settings
 from .domain import blocks as b
-from .formatting import Formatter
-from .rendering import paragraph as p
+from .formatting import Line, styled
 
-# Left side: list of main lines
-# Right side, dict for the side notes: desired offset, line
-Page = Tuple[List[str], Dict[int, str]]
-RenderedPage = List[str]
+
+@slotted
+@dataclass
+class Page:
+    """Lines of a page, before they are composed with the margins.
+
+    Both parts have a slot for each line of the page, holding the lines of
+    the blocks: `main` down to its last line, empty lines are the empty
+    tuple, and `sides` down to the last line of the side notes, empty
+    lines are None.
+    """
+    main: List[Line]
+    sides: List[Optional[Line]]
+
+    @property
+    def height(self) -> int:
+        return max(len(self.main), len(self.sides), 1)
+
+
+@slotted
+@dataclass
+class Chrome:
+    """Parts of the lines of a page that are the same on every even or odd page.
+
+    Lines of even pages are `left`, a side line, `spacing`, a main line and
+    `right`, odd pages have the side and the main lines the other way round.
+    """
+    even: bool
+    left: Line
+    right: Line
+    spacing: Line
+    empty_side_line: Line
+    empty_main_line: Line
+    # Line without main or side line
+    empty_line: Line
+    # Lines below the content, and borders above and below the page
+    bottom_line: Line
+    top_border: Optional[Line]
+    bottom_border: Optional[Line]
+
+
+@slotted
+@dataclass
+class RenderedPage(Sequence):
+    """Lines of a page with its margins, page number and borders.
+
+    Lines are composed from the page and its chrome when they are read, a
+    rendered page only holds references to them. Lines without main or
+    side lines, below the content and borders are shared by all the pages.
+    """
+    page: Page
+    chrome: Chrome
+    page_number: Line
+    length: int
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, j):  # type: ignore
+        if isinstance(j, slice):
+            return [self.line(i) for i in range(*j.indices(self.length))]
+        if j < 0:
+            j += self.length
+        if not 0 <= j < self.length:
+            raise IndexError("page line index out of range")
+        return self.line(j)
+
+    def __iter__(self) -> Iterator[Line]:
+        return map(self.line, range(self.length))
+
+    def line(self, j: int) -> Line:
+        """Line `j` of the page, composed from its slots and the chrome."""
+        c = self.chrome
+        if c.top_border is not None and j == 0:
+            return c.top_border
+        if c.bottom_border is not None and j == self.length - 1:
+            return c.bottom_border
+        if j == self.length - 3:
+            return self.page_number
+
+        main, sides = self.page.main, self.page.sides
+        if j >= len(main) and j >= len(sides):
+            return c.bottom_line if j >= self.page.height else c.empty_line
+        line: Line = main[j] if j < len(main) else ()
+        side_line = sides[j] if j < len(sides) else None
+        if not line and side_line is None:
+            return c.empty_line
+        if not line:
+            line = c.empty_main_line
+        if side_line is None:
+            side_line = c.empty_side_line
+
+        if c.even:
+            return (*c.left, *side_line, *c.spacing, *line, *c.right)
+        return (*c.left, *line, *c.spacing, *side_line, *c.right)
+
+
+PageBreaking = Enum("PageBreaking", ["greedy", "optimal"])
 
 
 def layout(
     blocks: Iterator[b.Block],
     settings: Settings,
-    formatter: Type[Formatter],
     linear=False,
 ) -> Iterator[RenderedPage]:
+    """Lays out blocks on pages, one page at a time."""
 
     s = settings
     content_length = s.page_height - s.margin_top - s.margin_bottom
 
-    pages = list(break_blocks(blocks, linear, content_length, s.margin_top))
-    rendered_pages = render_pages(pages, linear, s, formatter)
+    if PageBreaking[s.page_breaking] == PageBreaking.optimal and not linear:
+        pages = break_blocks_optimally(blocks, content_length, s.margin_top, s.page_lookahead)
+    else:
+        pages = break_blocks(blocks, linear, content_length, s.margin_top)
+    rendered_pages = render_pages(pages, linear, s)
 
     return rendered_pages
 
 
+def linear_layout(
+    blocks: Iterator[b.Block],
+    settings: Settings,
+) -> Tuple[Settings, RenderedPage]:
+    """Lays out all blocks on one long page.
+
+    Returns the settings with the height of that page, which formatters
+    need before writing it, and the page.
+    """
+    page = next(break_blocks(blocks, True, 0, settings.margin_top))
+
+    # Height of the rendered page, and its bottom margin
+    lines = page.height + settings.margin_bottom
+    settings = replace(settings, page_height=lines + settings.margin_bottom)
+
+    return settings, next(render_pages([page], True, settings))
+
+
 def break_blocks(blocks, linear, content_length, margin_top) -> Iterator[Page]:
     log.info("Breaking blocks into pages...")
 
     page_count = 0
-    latest_side_offset = 0
     first_page = True
     first_block = True
-    current_page: Page = ([], {})
+    main: List[Line] = []
+    sides: List[Side] = []
+    sides_height = 0
+    # Sides that did not fit on the previous page
+    carried: List[List[Line]] = []
+    bottom = None if linear else content_length
+    # Sides are carried about one page at most: the sides of a page must fit
+    # next to it and the next one
+    sides_capacity = 2 * (content_length - margin_top + 1)
 
     def new_page():
-        nonlocal latest_side_offset, current_page, first_block, page_count
+        nonlocal main, sides, sides_height, first_block, page_count
         page_count += 1
-        main = [""] * margin_top
-        sides: Dict[int, str] = {}
-        latest_side_offset = 0
+        main = [()] * margin_top
+        sides = [(margin_top, margin_top, side) for side in carried]
+        sides_height = sum(len(side) + 1 for side in carried)
         first_block = True
-        current_page = (main, sides)
+
+    def finish_page() -> Page:
+        nonlocal carried
+        placed, carried = place_sides(sides, margin_top, bottom)
+        return Page(main=main, sides=placed)
 
     new_page()
 
-    # Prepare pages by breaking when there's not enough space
-    # for either a block or its sides
+    # Prepare pages by breaking when there's not enough space for a block,
+    # sides that don't fit are carried to the next page
     for block in blocks:
-        block_size = len(block.main)
-        sides_size = sum(len(s) for s in block.sides) + len(block.sides) - 1
+        block_sides_height = sum(len(s) + 1 for s in block.sides)
+        needed = len(block.main) + block.block_offset
+        if not block.main:
+            # Blocks with only sides (sub-chapter titles) start what follows them
+            needed = block_sides_height - 1 + block.block_offset
 
-        needed_main = block_size + block.block_offset
-        needed_sides = sides_size + block.block_offset
-        needed = max(needed_main, needed_sides)
-
-        occupied = len(current_page[0])
+        occupied = len(main)
         manual_page_break = not block.main and not block.sides
 
         # Don't break into pages when in linear mode
         if not linear:
             if (
                 content_length - occupied < needed
+                or sides_height + block_sides_height > sides_capacity and not first_block
                 or manual_page_break
                 or block.break_before and not first_page
             ):
-                yield current_page
+                yield finish_page()
                 new_page()
                 if manual_page_break:
                     continue
@@ -79,130 +209,412 @@ def break_blocks(blocks, linear, content_length, margin_top) -> Iterator[Page]:
         # If we're at the beginning of the page, we don't need to offset block
         if not first_block:
             for _ in range(block.block_offset):
-                current_page[0].append("")
-
-        i = max(len(current_page[0]), latest_side_offset)
-        current_page[0].extend(block.main)
-        if block.sides:
-            for side in block.sides:
-                for line in side:
-                    current_page[1][i] = line
-                    i += 1
-                i += 1  # Gap to separate sides from each other
-        latest_side_offset = i
+                main.append(())
+
+        sides.extend(block_sides(block, len(main)))
+        sides_height += block_sides_height
+        main.extend(block.main)
 
         first_block = False
 
+    yield finish_page()
+    while carried:
+        new_page()
+        yield finish_page()
+
     log.debug(f"Broken into {page_count} pages.")
-    yield current_page
 
 
-def render_pages(
-    pages,
-    linear,
-    settings,
-    formatter
-) -> Iterator[RenderedPage]:
-    log.info(f"Rendering pages using formatter '{formatter.__name__}'...")
+# Demerits of the optimal page breaking
+PAGE_PENALTY = 1
+# First line of a paragraph alone at the bottom of a page,
+# and last line of a paragraph alone at the top of a page
+ORPHAN_PENALTY = 50
+WIDOW_PENALTY = 50
+# For each line of main text below the content of a page
+OVERFLOW_DEMERITS = 10 ** 6
+# For each line of side notes carried to the next page
+CARRIED_DEMERITS = 1000
+# Paragraphs are only split on pages with at most this many empty lines
+SPLIT_SLACK = 8
+
+# A position is the index of a block, and the line of the block at which
+# a page starts (0 is before the block)
+Position = Tuple[int, int]
+# Lines of a block set on a page: the block, its first and last lines
+Part = Tuple[b.Block, int, int]
+
+
+def break_blocks_optimally(blocks, content_length, margin_top, lookahead) -> Iterator[Page]:
+    """Breaks blocks into pages with the least total demerits.
+
+    Paragraphs can be split between any two lines. Blocks are read until
+    they fill `lookahead` pages, then these blocks are broken optimally and
+    all pages but the last one are yielded: the last page is broken again
+    along with the next blocks. Manual page breaks and breaks before blocks
+    end the pending blocks.
+    """
+    log.info("Breaking blocks into pages optimally...")
 
-    s = settings
-    ft = lambda l: formatter.format_tags(l, s)
+    window = lookahead * (content_length - margin_top)
+    page_count = 0
+    pending: List[b.Block] = []
+    # First line of the first pending block
+    start = 0
+    pending_lines = 0
+    # Sides that did not fit on the previous page
+    carried: List[List[Line]] = []
+
+    def compose_pages(pages: List[List[Part]]) -> Iterator[Page]:
+        nonlocal page_count, carried
+        for parts in pages:
+            page_count += 1
+            page, carried = compose_page(parts, margin_top, content_length, carried)
+            yield page
 
-    page_nums = page_numbers(s)
+    for block in blocks:
+        manual_page_break = not block.main and not block.sides
 
-    def spaces(width):
-        return ft([width * " "])
+        if pending and (manual_page_break or block.break_before):
+            yield from compose_pages(
+                optimal_pages(pending, start, content_length, margin_top, final=True)[0])
+            pending, start, pending_lines = [], 0, 0
+        if manual_page_break:
+            continue
+
+        pending.append(block)
+        pending_lines += len(block.main) + max(0, block.block_offset)
+
+        if pending_lines > window:
+            pages, (k, start) = optimal_pages(
+                pending, start, content_length, margin_top, final=False)
+            yield from compose_pages(pages)
+            pending = pending[k:]
+            pending_lines = sum(len(block.main) + max(0, block.block_offset) for block in pending)
+            pending_lines -= start
+
+    pages = optimal_pages(pending, start, content_length, margin_top, final=True)[0]
+    yield from compose_pages(pages or [[]])
+    while carried:
+        yield from compose_pages([[]])
 
-    # Go through pages and compose lines
-    for i, page in log_progress.debug(list(enumerate(pages))):
-        main = page[0]
-        sides = page[1]
+    log.debug(f"Broken into {page_count} pages.")
 
-        rendered_page = []
 
-        margin_outside = spaces(s.margin_outside)
-        margin_inside = spaces(s.margin_inside)
+def optimal_pages(
+    blocks: List[b.Block],
+    start: int,
+    content_length: int,
+    margin_top: int,
+    final: bool,
+) -> Tuple[List[List[Part]], Position]:
+    """Pages with the least total demerits, from line `start` of the first block.
 
-        if s.draw_borders:
-            if i % 2 == 0:
-                margin_outside = ft("│" + " " * (s.margin_outside - 1))
-                margin_inside = ft(" " * (s.margin_inside - 1) + "│")
-            else:
-                margin_outside = ft(" " * (s.margin_outside - 1) + "│")
-                margin_inside = ft("│" + " " * (s.margin_inside - 1))
-
-        spacing = spaces(s.side_spacing)
-        empty_side_line = spaces(s.side_width)
-        empty_line = spaces(s.main_width)
-
-        highest_side_offset = max(sides.keys(), default=0) + 1
-        main_height = len(main)
-
-        for j in range(max(main_height, highest_side_offset)):
-            line = ""
-            if j < main_height:
-                line = main[j]
-            if not line:
-                line = empty_line
-
-            side_line = empty_side_line
-            if j in sides:
-                side_line = sides[j]
-
-            if i % 2 == 0:
-                rendered_page.append(
-                    margin_outside + side_line + spacing
-                    + line + margin_inside
-                )
+    Unless the blocks are `final`, the last page is free: it can be completed
+    by the next blocks. Returns the pages before it, and its position.
+    """
+    capacity = content_length - margin_top
+    sizes = [len(block.main) for block in blocks]
+    offsets = [max(0, block.block_offset) for block in blocks]
+    sides_sizes = [sum(len(side) + 1 for side in block.sides) for block in blocks]
+
+    # All the positions in order, and the index of the first position of each block
+    positions: List[Position] = []
+    indices: List[int] = []
+    for k, block in enumerate(blocks):
+        indices.append(len(positions))
+        lines = max(1, sizes[k]) if block.splittable else 1
+        positions.extend((k, line) for line in range(lines))
+    indices.append(len(positions))
+    positions.append((len(blocks), 0))
+    end = len(positions) - 1
+
+    # Demerits of a page by its number of empty lines, the badness
+    # of a page is 100 when it is empty and grows with its square
+    fill = [(PAGE_PENALTY + 100 * (slack / capacity) ** 2) ** 2 for slack in range(capacity + 1)]
+
+    # Best demerits to reach a position, and the index of the position of the previous page
+    best = [math.inf] * len(positions)
+    previous = [-1] * len(positions)
+    best[start] = 0
+
+    for x in range(end):
+        demerits = best[x]
+        if demerits == math.inf:
+            continue
+
+        # Fill a page from x, the same way as `compose_page`
+        k, first_line = positions[x]
+        pos = margin_top
+        side_lines = -1
+        for i in range(k, len(blocks)):
+            if i != k:
+                pos += offsets[i]
+            if first_line == 0:
+                side_lines += sides_sizes[i]
+            carried = CARRIED_DEMERITS * (side_lines - capacity) if side_lines > capacity else 0
+
+            size = sizes[i]
+            if blocks[i].splittable:
+                # Split lines that leave at most SPLIT_SLACK empty lines
+                fitting = first_line + content_length - pos
+                for m in range(max(first_line + 1, fitting - SPLIT_SLACK), min(fitting + 1, size)):
+                    total = demerits + carried + fill[fitting - m]
+                    if m == 1:
+                        total += ORPHAN_PENALTY
+                    if size - m == 1:
+                        total += WIDOW_PENALTY
+                    y = indices[i] + m
+                    if total < best[y]:
+                        best[y], previous[y] = total, x
+
+            pos += size - first_line
+            first_line = 0
+            if pos > content_length and i != k:
+                break
+            y = indices[i + 1]
+            if pos > content_length:
+                carried += OVERFLOW_DEMERITS * (pos - content_length)
+            if y != end:
+                total = demerits + carried + fill[max(0, content_length - pos)]
+            elif final:
+                # Nothing can fill the last page
+                total = demerits + carried
             else:
-                rendered_page.append(
-                    margin_inside + line
-                    + spacing + side_line + margin_outside
-                )
+                total = demerits
+            if total < best[y]:
+                best[y], previous[y] = total, x
+            if pos > content_length:
+                break
+
+    # Follow the pages back from the end
+    path = [end]
+    while previous[path[-1]] != -1:
+        path.append(previous[path[-1]])
+    path.reverse()
+
+    pages = [
+        page_parts(blocks, positions[path[j]], positions[path[j + 1]])
+        for j in range(len(path) - 1)
+    ]
+    if final:
+        return pages, positions[end]
+    return pages[:-1], positions[path[-2]]
+
+
+def page_parts(blocks, first: Position, last: Position) -> List[Part]:
+    parts = []
+    for k in range(first[0], min(last[0] + 1, len(blocks))):
+        start = first[1] if k == first[0] else 0
+        end = last[1] if k == last[0] else len(blocks[k].main)
+        if k == last[0] and end == 0:
+            break
+        parts.append((blocks[k], start, end))
+    return parts
+
+
+def compose_page(
+    parts: List[Part],
+    margin_top: int,
+    content_length: int,
+    carried: List[List[Line]],
+) -> Tuple[Page, List[List[Line]]]:
+    """Sets lines of blocks on a page, after the sides carried from the previous page.
+
+    The sides of a block are set next to its first line. Returns the page,
+    and the sides that did not fit.
+    """
+    main: List[Line] = [()] * margin_top
+    sides: List[Side] = [(margin_top, margin_top, side) for side in carried]
 
-        lines_left = s.page_height - (j + 1)
+    for j, (block, start, end) in enumerate(parts):
+        if j > 0:
+            main.extend([()] * max(0, block.block_offset))
+        if start == 0:
+            sides.extend(block_sides(block, len(main)))
+        main.extend(block.main[start:end])
 
-        if linear:
-            # In linear mode, the only one page is longer than content_length
-            lines_left = s.margin_bottom
+    placed, carried = place_sides(sides, margin_top, content_length)
+    return Page(main=main, sides=placed), carried
+
+
+# A side to set in the margin: the highest line it can be moved up to,
+# the line it should start at, and its lines
+Side = Tuple[int, int, List[Line]]
+
+
+def block_sides(block: b.Block, line: int) -> List[Side]:
+    """Sides of a block starting at `line`, sides of a block without main
+    lines (sub-chapter titles) are not moved above it."""
+    desired = line + block.side_offset
+    highest = desired if not block.main else 0
+    return [(highest, desired, side) for side in block.sides]
+
+
+def place_sides(
+    sides: List[Side],
+    top: int,
+    bottom: Optional[int],
+) -> Tuple[List[Optional[Line]], List[List[Line]]]:
+    """Sets sides in the margin between lines `top` and `bottom`.
+
+    Sides keep their order, separated by an empty line, and are set as close
+    as possible to their desired line: runs of overlapping sides are merged
+    and centered on their desired lines, then moved up to end above `bottom`.
+    Returns the lines of the margin down to the last side line (None when
+    empty), and the sides that did not fit.
+    """
+    sides = sorted(sides, key=lambda side: side[1])
+
+    # Keep the sides that fit, with an empty line between each other
+    carried: List[List[Line]] = []
+    if bottom is not None:
+        height = -1
+        for i, (_, _, lines) in enumerate(sides):
+            height += len(lines) + 1
+            if height > bottom - top:
+                carried = [lines for _, _, lines in sides[i:]]
+                if i == 0:
+                    # A side taller than the margin is split at the bottom,
+                    # so that every page sets some of it
+                    highest, desired, lines = sides[0]
+                    fitting = max(1, bottom - top)
+                    carried[0] = lines[fitting:]
+                    if not carried[0]:
+                        carried.pop(0)
+                    i, sides[0] = 1, (highest, desired, lines[:fitting])
+                sides = sides[:i]
+                break
+
+    # Runs of sides set next to each other: the index of their first side,
+    # their height, the sum and count of the desired lines of the run
+    # for each of its sides, and the highest line the run can start at
+    runs: List[List[int]] = []
+    for i, (highest, desired, lines) in enumerate(sides):
+        run = [i, len(lines) + 1, desired, 1, max(top, highest)]
+        while runs and run_line(runs[-1]) + runs[-1][1] > run_line(run):
+            previous = runs.pop()
+            run = [
+                previous[0],
+                previous[1] + run[1],
+                previous[2] + run[2] - run[3] * previous[1],
+                previous[3] + run[3],
+                max(previous[4], run[4] - previous[1]),
+            ]
+        runs.append(run)
+
+    # Move runs up from the bottom
+    lines_of_margin: List[Optional[Line]] = []
+    limit = math.inf if bottom is None else bottom + 1
+    for j in reversed(range(len(runs))):
+        first, height = runs[j][:2]
+        line = min(run_line(runs[j]), limit - height)
+        limit = line
+        if not lines_of_margin:
+            lines_of_margin = [None] * (line + height - 1)
+        end = runs[j + 1][0] if j + 1 < len(runs) else len(sides)
+        for _, _, side_lines in sides[first:end]:
+            for side_line in side_lines:
+                lines_of_margin[line] = side_line
+                line += 1
+            line += 1  # Gap to separate sides from each other
+
+    return lines_of_margin, carried
+
+
+def run_line(run: List[int]) -> int:
+    """First line of a run of sides, centered on their desired lines."""
+    _, _, desired, count, highest = run
+    return max(highest, round(desired / count))
+
+
+def page_chrome(settings: Settings, even: bool) -> Chrome:
+    s = settings
+    ft = styled
+
+    outside = ft(" " * s.margin_outside)
+    inside = ft(" " * s.margin_inside)
+    bottom_line = ft(" " * s.page_width)
+    top_border = bottom_border = None
+    if s.draw_borders:
+        if even:
+            outside = ft("│" + " " * (s.margin_outside - 1))
+            inside = ft(" " * (s.margin_inside - 1) + "│")
+        else:
+            outside = ft(" " * (s.margin_outside - 1) + "│")
+            inside = ft("│" + " " * (s.margin_inside - 1))
+        bottom_line = ft("│" + " " * (s.page_width - 2) + "│")
+        top_border = ft("┌" + "─" * (s.page_width - 2) + "┐")
+        bottom_border = ft("└" + "─" * (s.page_width - 2) + "┘")
+    left, right = (outside, inside) if even else (inside, outside)
+
+    spacing = ft(" " * s.side_spacing)
+    empty_side_line = ft(" " * s.side_width)
+    empty_main_line = ft(" " * s.main_width)
+    first, second = empty_side_line, empty_main_line
+    if not even:
+        first, second = second, first
+
+    return Chrome(
+        even=even,
+        left=left,
+        right=right,
+        spacing=spacing,
+        empty_side_line=empty_side_line,
+        empty_main_line=empty_main_line,
+        empty_line=(*left, *first, *spacing, *second, *right),
+        bottom_line=bottom_line,
+        top_border=top_border,
+        bottom_border=bottom_border,
+    )
+
+
+def render_pages(
+    pages,
+    linear,
+    settings,
+) -> Iterator[RenderedPage]:
+    log.info("Rendering pages...")
 
-        empty_line = spaces(s.page_width)
-        if s.draw_borders:
-            empty_line = ft("│" + " " * (s.page_width - 2) + "│")
+    s = settings
+    page_nums = page_numbers(s)
 
-        rendered_page.extend([empty_line] * lines_left)
+    # Formatted once, lines of every page are composed from these
+    chromes = [page_chrome(s, even=True), page_chrome(s, even=False)]
 
-        # Insert page numbers post-rendering
-        rendered_page[-3] = ft(next(page_nums))
+    for i, page in enumerate(pages):
+        lines_left = s.page_height - page.height
 
-        if s.draw_borders:
-            rendered_page[0] = ft("┌" + "─" * (s.page_width - 2) + "┐")
-            rendered_page[-1] = ft("└" + "─" * (s.page_width - 2) + "┘")
+        if linear:
+            # In linear mode, the only one page is longer than content_length
+            lines_left = s.margin_bottom
 
-        yield rendered_page
+        yield RenderedPage(
+            page=page,
+            chrome=chromes[i % 2],
+            page_number=styled(next(page_nums)),
+            length=page.height + max(0, lines_left),
+        )
 
 
 def page_numbers(settings: Settings) -> Iterator[List[str]]:
     """
     Infinitely generate page numbers
     """
+    s = settings
+    width = s.main_width + s.side_spacing + s.side_width
+
+    # Margins of even and odd pages
+    outside = [" " * s.margin_outside] * 2
+    inside = [" " * s.margin_inside] * 2
+    if s.draw_borders:
+        outside = ["│" + " " * (s.margin_outside - 1), " " * (s.margin_outside - 1) + "│"]
+        inside = [" " * (s.margin_inside - 1) + "│", "│" + " " * (s.margin_inside - 1)]
+
     i = 0
     while True:
-        aligned = p.align(
-            text_elements=[str(i)],
-            alignment=p.Alignment.left if i % 2 == 0 else p.Alignment.right,
-            width=settings.main_width + settings.side_spacing + settings.side_width,
-        )[0]
-        outside = " " * (settings.margin_outside)
-        inside = " " * (settings.margin_inside)
         if i % 2 == 0:
-            if settings.draw_borders:
-                outside = "│" + " " * (settings.margin_outside - 1)
-                inside = " " * (settings.margin_inside - 1) + "│"
-            yield [outside, aligned, inside]
+            yield [outside[0], str(i).ljust(width), inside[0]]
         else:
-            if settings.draw_borders:
-                outside = " " * (settings.margin_outside - 1) + "│"
-                inside = "│" + " " * (settings.margin_inside - 1)
-            yield [inside, aligned, outside]
+            yield [inside[1], str(i).rjust(width), outside[1]]
         i += 1
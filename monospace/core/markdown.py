@@ -0,0 +1,1561 @@
+"""Built-in markdown front-end
+
+A pure-Python replacement for Pandoc, covering the subset of Pandoc's
+markdown that monospace supports. For that subset, `parse_markdown` returns
+the same JSON AST as `pandoc --from=markdown --to=json`, so that `process`
+cannot tell the two apart:
+
+- YAML metadata blocks,
+- ATX and setext headers, with attributes and automatic identifiers,
+- paragraphs, block quotes, bullet and ordered lists, horizontal rules,
+- fenced and indented code blocks, fenced divs (`::: Aside`),
+- emphasis, strong emphasis, strikeout, superscript, subscript, inline code,
+  links, images (and figures) with attributes, footnotes, inline notes,
+  smart quotes, dashes and ellipses.
+
+Other Pandoc extensions (tables, definition lists, raw HTML blocks,
+citations, ...) are not recognized and end up as plain text.
+
+Parsing happens in two passes, like in Pandoc: blocks are parsed first,
+collecting link references and footnotes, and inline content is parsed
+once all of them are known.
+"""
+
+import html
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .parse import auto_identifier
+
+API_VERSION = [1, 23, 1, 1]
+
+# From `pandoc --print-default-data-file abbreviations`
+abbreviations = frozenset("""
+    aet. aetat. al. Apr. Aug. bk. Bros. c. Capt. cf. ch. chap. chs. Co. col.
+    Corp. cp. d. Dec. Dr. e.g. ed. eds. esp. f. fasc. Feb. ff. fig. fl. fol.
+    fols. Fr. Gen. Gov. Hon. i.e. ill. Inc. incl. Jan. Jr. Jul. Jun. Ltd.
+    M.A. M.D. Mar. Mr. Mrs. Ms. n. n.b. nn. No. Nov. Oct. p. Ph.D. pp. Pres.
+    Prof. pt. q.v. Rep. Rev. s.v. s.vv. saec. sec. Sen. Sep. Sept. Sgt. Sr.
+    St. univ. viz. vol. vs.
+""".split())
+
+Attr = list  # [identifier, classes, key-values]
+
+
+def parse_markdown(markdown_content: str) -> dict:
+    """Parses markdown into a Pandoc JSON AST, without Pandoc."""
+    return Markdown(markdown_content).parse()
+
+
+class Context(NamedTuple):
+    in_list: bool = False
+    div_level: int = 0
+
+
+class Deferred(object):
+    """Inline content, parsed once all references and notes are known."""
+
+    __slots__ = ("text", "stop", "figure")
+
+    def __init__(
+        self,
+        text: str,
+        stop: Optional[Callable[[str, int], bool]] = None,
+        figure: bool = False,
+    ) -> None:
+        self.text = text
+        self.stop = stop
+        # Whether a lone captioned image becomes a figure (only in paragraphs)
+        self.figure = figure
+
+
+class Markdown(object):
+    def __init__(self, markdown_content: str) -> None:
+        text = markdown_content.replace("\r\n", "\n").expandtabs(4)
+        self.lines = text.split("\n") + [""]
+        self.meta: dict = {}
+        self.references: Dict[str, Tuple[str, str, Attr]] = {}
+        self.notes: Dict[str, list] = {}
+        self.header_references: Dict[str, str] = {}
+        self.identifiers: Set[str] = set()
+        self.resolving_note = False
+
+    def parse(self) -> dict:
+        blocks, _ = self.parse_blocks(self.lines, 0, Context())
+        self.resolve_headers(blocks)
+        return {
+            "pandoc-api-version": API_VERSION,
+            "meta": {k: self.resolve(v) for k, v in self.meta.items()},
+            "blocks": self.resolve(blocks),
+        }
+
+    # --- Blocks --------------------------------------------------------------
+
+    def parse_blocks(
+        self, lines: List[str], i: int, context: Context, in_div: bool = False
+    ) -> Tuple[list, int]:
+        blocks: list = []
+        rules = (
+            self.fenced_code, self.yaml_metadata, self.bullet_list,
+            self.fenced_div, self.header, self.indented_code, self.block_quote,
+            self.horizontal_rule, self.ordered_list, self.note_definition,
+            self.reference_definition, self.paragraph,
+        )
+        while i < len(lines):
+            if is_blank(lines[i]):
+                i += 1
+                continue
+            if in_div and is_div_end(lines[i]):
+                break
+            for rule in rules:
+                result = rule(lines, i, context)
+                if result is not None:
+                    new_blocks, i = result
+                    blocks.extend(new_blocks)
+                    break
+        return blocks, i
+
+    def fenced_code(self, lines, i, context):
+        fence = code_fence(lines, i)
+        if fence is None:
+            return None
+        attr, start, end, indent = fence
+        code = "\n".join(strip_indent(line, indent) for line in lines[start:end])
+        return [{"t": "CodeBlock", "c": [attr, code]}], skip_blanks(lines, end + 1)
+
+    def yaml_metadata(self, lines, i, context):
+        if lines[i].rstrip(" ") != "---" or i + 1 >= len(lines) or is_blank(lines[i + 1]):
+            return None
+        for end in range(i + 1, len(lines)):
+            if lines[end].rstrip(" ") in ("---", "..."):
+                break
+        else:
+            return None
+        values = YamlParser(lines[i + 1:end]).parse()
+        if isinstance(values, dict):
+            # Later metadata blocks override the fields of earlier ones
+            self.meta.update({
+                key: self.meta_value(value)
+                for key, value in values.items()
+                if not key.endswith("_")
+            })
+        return [], skip_blanks(lines, end + 1)
+
+    def meta_value(self, value):
+        if isinstance(value, dict):
+            return {"t": "MetaMap", "c": {k: self.meta_value(v) for k, v in value.items()}}
+        if isinstance(value, list):
+            return {"t": "MetaList", "c": [self.meta_value(v) for v in value]}
+        if isinstance(value, bool):
+            return {"t": "MetaBool", "c": value}
+        if value is None:
+            return {"t": "MetaString", "c": ""}
+        blocks, _ = self.parse_blocks(value.split("\n") + [""], 0, Context())
+        if len(blocks) == 1 and blocks[0]["t"] in ("Para", "Plain"):
+            return {"t": "MetaInlines", "c": blocks[0]["c"]}
+        return {"t": "MetaBlocks", "c": blocks}
+
+    def bullet_list(self, lines, i, context):
+        if bullet_marker(lines[i]) is None:
+            return None
+        items, i = self.list_items(lines, i, context, lambda line: bullet_marker(line))
+        return [{"t": "BulletList", "c": compactify(items)}], i
+
+    def ordered_list(self, lines, i, context):
+        marker = ordered_marker(lines[i])
+        if marker is None:
+            return None
+        start, style, delimiter = marker.number, marker.style, marker.delimiter
+
+        def same_kind(line):
+            m = ordered_marker(line)
+            if m is not None and kind(m) == kind(marker):
+                return m
+            return None
+
+        items, i = self.list_items(lines, i, context, same_kind)
+        attributes = [start, {"t": style}, {"t": delimiter}]
+        return [{"t": "OrderedList", "c": [attributes, compactify(items)]}], i
+
+    def list_items(self, lines, i, context, marker_at):
+        """Collects the raw lines of each list item, then parses them as blocks."""
+        items = []
+        item_context = context._replace(in_list=True)
+        while i < len(lines):
+            marker = marker_at(lines[i])
+            if marker is None:
+                break
+            indent = marker.indent
+            raw = [lines[i][indent:]]
+            i += 1
+
+            # Lines of the first paragraph, possibly lazy
+            while i < len(lines) and not is_blank(lines[i]):
+                line = lines[i]
+                if list_marker(line) or code_fence(lines, i) is not None:
+                    break
+                if leading_spaces(line) >= indent and list_marker(line[indent:].lstrip(" ")):
+                    break
+                if context.div_level and is_div_end(line):
+                    break
+                raw.append(line[indent:] if leading_spaces(line) >= indent else line)
+                i += 1
+            while i < len(lines) and is_blank(lines[i]):
+                raw.append("")
+                i += 1
+
+            # Indented continuation blocks
+            while (
+                i < len(lines)
+                and not is_blank(lines[i])
+                and leading_spaces(lines[i]) >= indent
+                and not (context.div_level and is_div_end(lines[i]))
+            ):
+                raw.append(lines[i][indent:])
+                i += 1
+                while i < len(lines) and not is_blank(lines[i]):
+                    line = lines[i]
+                    if context.div_level and is_div_end(line):
+                        break
+                    if leading_spaces(line) >= indent:
+                        raw.append(line[indent:])
+                    elif not list_marker(line):
+                        raw.append(line)
+                    else:
+                        break
+                    i += 1
+                while i < len(lines) and is_blank(lines[i]):
+                    raw.append("")
+                    i += 1
+
+            blocks, _ = self.parse_blocks(raw, 0, item_context)
+            items.append(task_list_item(blocks))
+        return items, i
+
+    def fenced_div(self, lines, i, context):
+        match = div_start_pattern.match(lines[i])
+        if match is None:
+            return None
+        rest = match.group(1)
+        if rest.startswith("{"):
+            parsed = parse_attributes(rest, 0)
+            if parsed is None:
+                return None
+            attr, end = parsed
+            if rest[end:].strip(": ") != "":
+                return None
+        else:
+            words = rest.split(None, 1)
+            if not words or words[0].strip(":") != words[0] or (
+                len(words) > 1 and words[1].strip(": ") != ""
+            ):
+                return None
+            attr = ["", [words[0]], []]
+
+        div_context = context._replace(div_level=context.div_level + 1)
+        blocks, i = self.parse_blocks(lines, i + 1, div_context, in_div=True)
+        return [{"t": "Div", "c": [attr, blocks]}], skip_blanks(lines, i + 1)
+
+    def header(self, lines, i, context):
+        line = lines[i]
+        setext = i + 1 < len(lines) and setext_pattern.match(lines[i + 1])
+        if setext and not is_blank(line):
+            level = 1 if setext.group(1)[0] == "=" else 2
+            text = line.lstrip(" ")
+            closing = setext_closing
+            i += 2
+        else:
+            match = atx_pattern.match(line)
+            if match is None:
+                return None
+            level = len(match.group(1))
+            # A line of only hashes is an empty header
+            text = match.group(2) or ""
+            closing = atx_closing
+            i += 1
+
+        return [{"t": "Header", "c": [level, None, Deferred(text, closing)]}], skip_blanks(lines, i)
+
+    def indented_code(self, lines, i, context):
+        if leading_spaces(lines[i]) < 4:
+            return None
+        code = []
+        while i < len(lines):
+            if leading_spaces(lines[i]) >= 4 and not is_blank(lines[i]):
+                code.append(lines[i][4:])
+                i += 1
+                continue
+            j = skip_blanks(lines, i)
+            if j == i or j >= len(lines) or leading_spaces(lines[j]) < 4:
+                break
+            code.extend("" for _ in range(j - i))
+            i = j
+        return [{"t": "CodeBlock", "c": [["", [], []], "\n".join(code)]}], skip_blanks(lines, i)
+
+    def block_quote(self, lines, i, context):
+        if quote_pattern.match(lines[i]) is None:
+            return None
+        raw = []
+        while i < len(lines):
+            match = quote_pattern.match(lines[i])
+            if match is not None:
+                raw.append(lines[i][match.end():])
+            elif raw and not self.ends_paragraph(lines, i, context):
+                raw.append(lines[i])
+            else:
+                break
+            i += 1
+        blocks, _ = self.parse_blocks(raw + [""], 0, context)
+        return [{"t": "BlockQuote", "c": blocks}], skip_blanks(lines, i)
+
+    def horizontal_rule(self, lines, i, context):
+        if not is_horizontal_rule(lines[i]):
+            return None
+        return [{"t": "HorizontalRule"}], skip_blanks(lines, i + 1)
+
+    def note_definition(self, lines, i, context):
+        match = note_definition_pattern.match(lines[i])
+        if match is None:
+            return None
+        label = match.group(1)
+        first = lines[i][match.end():]
+        i += 1
+        if not first.strip(" ") and i < len(lines) and not is_blank(lines[i]):
+            first = lines[i]
+            i += 1
+        raw = [first[4:] if leading_spaces(first) >= 4 else first]
+        while i < len(lines) and not is_blank(lines[i]):
+            raw.append(lines[i])
+            i += 1
+        while True:
+            j = skip_blanks(lines, i)
+            if j >= len(lines) or j == i or leading_spaces(lines[j]) < 4:
+                break
+            raw.append("")
+            i = j
+            while i < len(lines) and not is_blank(lines[i]):
+                raw.append(strip_indent(lines[i], 4))
+                i += 1
+
+        blocks, _ = self.parse_blocks(raw + [""], 0, context)
+        self.notes.setdefault(label, blocks)
+        return [], skip_blanks(lines, i)
+
+    def reference_definition(self, lines, i, context):
+        match = reference_definition_pattern.match(lines[i])
+        if match is None:
+            return None
+        label = match.group(1)
+        rest = match.group(2).strip(" ")
+        end = i + 1
+        if not rest and end < len(lines) and not is_blank(lines[end]):
+            rest = lines[end].strip(" ")
+            end += 1
+        definition = parse_reference(rest)
+        if definition is None or rest.startswith("["):
+            return None
+        self.references.setdefault(normalize_key(label), definition)
+        return [], skip_blanks(lines, end)
+
+    def paragraph(self, lines, i, context):
+        start = i
+        i += 1
+        while i < len(lines) and not self.ends_paragraph(lines, i, context):
+            i += 1
+
+        text = "\n".join(lines[start:i])
+        # A paragraph must be followed by a blank line,
+        # otherwise (e.g. in tight lists) it is just plain text
+        is_para = i < len(lines) and (
+            is_blank(lines[i])
+            or (lines[i].startswith("`") and code_fence(lines, i) is not None)
+            or (context.div_level > 0 and is_div_end(lines[i]))
+        )
+        block = {"t": "Para", "c": Deferred(text, figure=True)} if is_para else {
+            "t": "Plain", "c": Deferred(text)
+        }
+        return [block], skip_blanks(lines, i)
+
+    def ends_paragraph(self, lines, i, context) -> bool:
+        line = lines[i]
+        return (
+            is_blank(line)
+            or (context.in_list and list_marker(line) is not None)
+            or (line.startswith("`") and code_fence(lines, i) is not None)
+            or (context.div_level > 0 and is_div_end(line))
+        )
+
+    # --- Resolution ----------------------------------------------------------
+
+    def resolve_headers(self, blocks: list) -> None:
+        """Parses the content of all headers, in document order, to assign
+        identifiers before any link to them is resolved."""
+        for block in blocks:
+            kind = block["t"]
+            if kind == "Header":
+                content = block["c"][2]
+                inlines, raw = InlineParser(self, content.text, content.stop).parse_with_raw()
+                block["c"][2] = inlines
+                attr = block["c"][1] = self.header_attributes(content, inlines)
+                self.header_references.setdefault(normalize_key(raw), "#" + attr[0])
+            elif kind in ("BlockQuote", "BulletList"):
+                for child in ([block["c"]] if kind == "BlockQuote" else block["c"]):
+                    self.resolve_headers(child)
+            elif kind == "OrderedList":
+                for child in block["c"][1]:
+                    self.resolve_headers(child)
+            elif kind == "Div":
+                self.resolve_headers(block["c"][1])
+
+    def header_attributes(self, content: Deferred, inlines: list) -> Attr:
+        text = content.text
+        attr: Attr = ["", [], []]
+        end = len(text.rstrip(" "))
+        if text[:end].endswith("}"):
+            start = text.rfind("{", 0, end)
+            while start >= 0:
+                parsed = parse_attributes(text, start)
+                if parsed is not None and parsed[1] == end:
+                    attr = parsed[0]
+                    break
+                start = text.rfind("{", 0, start)
+
+        if attr[0]:
+            self.identifiers.add(attr[0])
+            return attr
+
+        base = auto_identifier(inlines)
+        identifier = base
+        n = 0
+        while identifier in self.identifiers:
+            n += 1
+            identifier = f"{base}-{n}"
+        self.identifiers.add(identifier)
+        return [identifier, attr[1], attr[2]]
+
+    def resolve(self, value):
+        if isinstance(value, Deferred):
+            return InlineParser(self, value.text, value.stop).parse()
+        if isinstance(value, list):
+            return [self.resolve(v) for v in value]
+        if isinstance(value, dict):
+            content = value.get("c")
+            if isinstance(content, Deferred) and content.figure and value["t"] == "Para":
+                return figure_or_paragraph(self.resolve(content))
+            return {k: self.resolve(v) for k, v in value.items()}
+        return value
+
+    def resolve_note(self, label: str) -> Optional[list]:
+        if self.resolving_note or label not in self.notes:
+            return None
+        # Notes inside of notes are not resolved, like in Pandoc
+        self.resolving_note = True
+        try:
+            return self.resolve(self.notes[label])
+        finally:
+            self.resolving_note = False
+
+
+def figure_or_paragraph(inlines: list) -> dict:
+    # Pandoc's `implicit_figures`: a captioned image alone in a paragraph
+    if len(inlines) == 1 and inlines[0]["t"] == "Image" and inlines[0]["c"][1]:
+        attr, caption, target = inlines[0]["c"]
+        image = {"t": "Image", "c": [["", attr[1], attr[2]], caption, target]}
+        return {"t": "Figure", "c": [
+            [attr[0], [], []],
+            [None, [{"t": "Plain", "c": caption}]],
+            [{"t": "Plain", "c": [image]}],
+        ]}
+    return {"t": "Para", "c": inlines}
+
+
+def compactify(items: List[list]) -> List[list]:
+    """Makes list items all tight or all loose, like Pandoc.
+
+    A paragraph only at the end of the last item comes from the blank line
+    after the list, it is turned into plain text. Otherwise, any paragraph
+    makes the whole list loose.
+    """
+    paragraphs = sum(1 for item in items for block in item if block["t"] == "Para")
+    if paragraphs == 1 and items[-1] and items[-1][-1]["t"] == "Para":
+        items[-1][-1] = {"t": "Plain", "c": items[-1][-1]["c"]}
+    elif paragraphs:
+        for item in items:
+            for block in item:
+                if block["t"] == "Plain":
+                    block["t"] = "Para"
+    return items
+
+
+def task_list_item(blocks: list) -> list:
+    if blocks and blocks[0]["t"] in ("Plain", "Para"):
+        content = blocks[0]["c"]
+        match = task_pattern.match(content.text)
+        if match:
+            box = "\u2612" if match.group(1) in "xX" else "\u2610"
+            content.text = box + " " + content.text[match.end():]
+    return blocks
+
+
+# --- Line predicates -----------------------------------------------------------
+
+atx_pattern = re.compile(r"^(#{1,6})(?![.)])(?:[ ]+(.*)|$)")
+setext_pattern = re.compile(r"^(=+|-+)[ ]*$")
+quote_pattern = re.compile(r"^ {0,3}> ?")
+div_start_pattern = re.compile(r"^ {0,3}:{3,}[ ]*(\S.*?)[ ]*$")
+div_end_pattern = re.compile(r"^ {0,3}:{3,}[ ]*$")
+fence_pattern = re.compile(r"^( {0,3})(`{3,}|~{3,})[ ]*([^ ]*)[ ]*(.*?)$")
+bullet_pattern = re.compile(r"^( {0,3})([*+-])(?: |$)")
+ordered_pattern = re.compile(
+    r"^( {0,3})(?:(\d{1,9}|#|[ivxlcdm]+|[IVXLCDM]+|[a-zA-Z])([.)])"
+    r"|\((\d{1,9}|#|[ivxlcdm]+|[IVXLCDM]+|[a-zA-Z])\))(?: |$)"
+)
+note_definition_pattern = re.compile(r"^ {0,3}\[\^([^\]\s]+)\]:[ ]?")
+reference_definition_pattern = re.compile(r"^ {0,3}\[((?:[^\]\\]|\\.)+)\]:(.*)$")
+task_pattern = re.compile(r"^\[([ xX])\][ ]+")
+
+roman_values = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+
+
+def is_blank(line: str) -> bool:
+    return not line.strip(" ")
+
+
+def leading_spaces(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def strip_indent(line: str, n: int) -> str:
+    return line[min(n, leading_spaces(line)):]
+
+
+def skip_blanks(lines: List[str], i: int) -> int:
+    while i < len(lines) and is_blank(lines[i]):
+        i += 1
+    return i
+
+
+def is_div_end(line: str) -> bool:
+    return div_end_pattern.match(line) is not None
+
+
+def is_horizontal_rule(line: str) -> bool:
+    stripped = line.replace(" ", "")
+    return len(stripped) >= 3 and stripped[0] in "*-_" and stripped == stripped[0] * len(stripped)
+
+
+def code_fence(lines: List[str], i: int):
+    """Returns the attributes, content range and indentation of the
+    fenced code block starting at line `i`, if it is closed."""
+    match = fence_pattern.match(lines[i])
+    if match is None:
+        return None
+    indent, fence, info, rest = match.groups()
+    if fence[0] == "`" and "`" in info + rest:
+        return None
+
+    info = (info + " " + rest).strip(" ")
+    if info.startswith("{"):
+        parsed = parse_attributes(info, 0)
+        if parsed is None or info[parsed[1]:].strip(" "):
+            return None
+        attr = parsed[0]
+    elif rest:
+        return None
+    else:
+        attr = ["", [info.lower()] if info else [], []]
+
+    for end in range(i + 1, len(lines)):
+        closing = lines[end]
+        stripped = closing.lstrip(" ")
+        if (
+            leading_spaces(closing) <= 3
+            and stripped.startswith(fence[0] * len(fence))
+            and not stripped.rstrip(" ").strip(fence[0])
+        ):
+            return attr, i + 1, end, len(indent)
+    return None
+
+
+class ListMarker(NamedTuple):
+    indent: int
+    number: int = 1
+    style: str = ""
+    delimiter: str = ""
+
+
+def bullet_marker(line: str) -> Optional[ListMarker]:
+    match = bullet_pattern.match(line)
+    if match is None or is_horizontal_rule(line):
+        return None
+    return ListMarker(content_indent(line, match.end(2)))
+
+
+def ordered_marker(line: str) -> Optional[ListMarker]:
+    match = ordered_pattern.match(line)
+    if match is None:
+        return None
+    if match.group(2) is not None:
+        label, delimiter = match.group(2), "Period" if match.group(3) == "." else "OneParen"
+        end = match.end(3)
+    else:
+        label, delimiter = match.group(4), "TwoParens"
+        end = match.end(4) + 1
+
+    if label.isdigit():
+        number, style = int(label), "Decimal"
+    elif label == "#":
+        number, style = 1, "DefaultStyle"
+        delimiter = "DefaultDelim" if delimiter == "Period" else delimiter
+    elif label in ("i", "I") or (len(label) > 1 and roman(label) is not None):
+        number, style = roman(label), "LowerRoman" if label.islower() else "UpperRoman"
+    elif len(label) == 1:
+        number = ord(label.lower()) - ord("a") + 1
+        style = "LowerAlpha" if label.islower() else "UpperAlpha"
+    else:
+        return None
+
+    # Could be an initial ("B. Russell"), insist on two spaces
+    initial = style == "UpperAlpha" or (
+        style == "UpperRoman" and number in (1, 5, 10, 50, 100, 500, 1000)
+    )
+    if delimiter == "Period" and initial and line[end + 1:end + 2] not in ("", " "):
+        return None
+    return ListMarker(content_indent(line, end), number, style, delimiter)  # type: ignore
+
+
+def kind(marker: ListMarker) -> Tuple[str, str]:
+    # `#.` continues decimal lists, and vice versa
+    if (marker.style, marker.delimiter) == ("DefaultStyle", "DefaultDelim"):
+        return "Decimal", "Period"
+    return marker.style, marker.delimiter
+
+
+def content_indent(line: str, end: int) -> int:
+    if end == len(line):
+        return end
+    spaces = leading_spaces(line[end + 1:])
+    if spaces <= 3:
+        return end + 1 + spaces
+    return end + 1
+
+
+def list_marker(line: str) -> Optional[ListMarker]:
+    return bullet_marker(line) or ordered_marker(line)
+
+
+def roman(label: str) -> Optional[int]:
+    values = [roman_values.get(c) for c in label.lower()]
+    if None in values:
+        return None
+    total = 0
+    for value, following in zip(values, values[1:] + [0]):
+        total += -value if value < following else value  # type: ignore
+    return total
+
+
+# --- Inlines -------------------------------------------------------------------
+
+space_kinds = {"Space": 0, "SoftBreak": 1, "LineBreak": 2}
+mergeable_kinds = {"Emph", "Strong", "Strikeout", "Superscript", "Subscript"}
+
+
+def push(inlines: list, inline: dict) -> None:
+    """Appends an inline, merging it with the previous one the way
+    Pandoc's `Inlines` monoid does."""
+    if inlines:
+        last = inlines[-1]
+        a, b = last["t"], inline["t"]
+        if a == b == "Str":
+            inlines[-1] = {"t": "Str", "c": last["c"] + inline["c"]}
+            return
+        if a in space_kinds and b in space_kinds:
+            inlines[-1] = last if space_kinds[a] >= space_kinds[b] else inline
+            return
+        if a == b and a in mergeable_kinds:
+            merged = list(last["c"])
+            extend(merged, inline["c"])
+            inlines[-1] = {"t": a, "c": merged}
+            return
+    inlines.append(inline)
+
+
+def extend(inlines: list, others: list) -> None:
+    for inline in others:
+        push(inlines, inline)
+
+
+def trim(inlines: list) -> list:
+    start, end = 0, len(inlines)
+    while start < end and inlines[start]["t"] in space_kinds:
+        start += 1
+    while end > start and inlines[end - 1]["t"] in space_kinds:
+        end -= 1
+    return inlines[start:end]
+
+
+def Str(text: str) -> dict:
+    return {"t": "Str", "c": text}
+
+
+def atx_closing(text: str, i: int) -> bool:
+    while i < len(text) and text[i] == "#":
+        i += 1
+    return setext_closing(text, i)
+
+
+def setext_closing(text: str, i: int) -> bool:
+    while i < len(text) and text[i] == " ":
+        i += 1
+    if i < len(text) and text[i] == "{":
+        parsed = parse_attributes(text, i)
+        if parsed is None:
+            return False
+        i = parsed[1]
+    return not text[i:].strip(" ")
+
+
+# Alphanumeric characters, and periods that do not start an ellipsis
+word_pattern = re.compile(r"(?:[^\W_]|\.(?!\.))+")
+entity_pattern = re.compile(r"&(?:[A-Za-z][A-Za-z0-9]*|#[0-9]+|#[xX][0-9a-fA-F]+);")
+autolink_pattern = re.compile(r"<([A-Za-z][A-Za-z0-9+.-]{1,31}:[^\s<>]*)>")
+email_pattern = re.compile(r"<([^\s<>@]+@[^\s<>@]+\.[^\s<>@]+)>")
+raw_html_pattern = re.compile(
+    r"<(?:[A-Za-z][A-Za-z0-9-]*(?:\s+[A-Za-z_:][\w.:-]*"
+    r"(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'|[^\s\"'=<>`]+))?)*\s*/?"
+    r"|/[A-Za-z][A-Za-z0-9-]*\s*|!--.*?--)>",
+    re.DOTALL,
+)
+latex_pattern = re.compile(r"\\[A-Za-z]+\*?(?:\{[^{}]*\})*")
+math_pattern = re.compile(r"\$(?![ \t\n])((?:[^$\\]|\\.)*?[^ \t\n\\])\$(?![0-9])", re.DOTALL)
+uri_needs_escape = set("<>|\"{}[]^`")
+
+
+class InlineParser(object):
+    """Port of the inline parsers of Pandoc's markdown reader."""
+
+    def __init__(
+        self,
+        markdown: Markdown,
+        text: str,
+        stop: Optional[Callable[[str, int], bool]] = None,
+    ) -> None:
+        self.markdown = markdown
+        self.text = text
+        self.stop = stop
+        self.pos = 0
+        # Position right after the last `Str`, for intraword punctuation
+        self.last_str_end = -1
+        self.quotes: Set[str] = set()
+        self.allow_links = True
+
+    def parse(self) -> list:
+        return self.parse_with_raw()[0]
+
+    def parse_with_raw(self) -> Tuple[list, str]:
+        inlines: list = []
+        while self.pos < len(self.text) and not (
+            self.stop is not None and self.stop(self.text, self.pos)
+        ):
+            extend(inlines, self.inline())
+        return trim(inlines), self.text[:self.pos]
+
+    def parse_nested(self, text: str) -> list:
+        parser = InlineParser(self.markdown, text)
+        parser.quotes = set(self.quotes)
+        parser.allow_links = self.allow_links
+        inlines: list = []
+        while parser.pos < len(text):
+            extend(inlines, parser.inline())
+        return inlines
+
+    def save(self):
+        return self.pos, self.last_str_end
+
+    def restore(self, state) -> None:
+        self.pos, self.last_str_end = state
+
+    def peek(self, offset: int = 0) -> str:
+        i = self.pos + offset
+        return self.text[i] if i < len(self.text) else ""
+
+    def inline(self) -> list:
+        c = self.text[self.pos]
+        handler = self.handlers.get(c)
+        if handler is not None:
+            result = handler(self)
+            if result is not None:
+                return result
+        return self.string() or self.symbol()
+
+    # --- Text ----------------------------------------------------------------
+
+    def string(self) -> Optional[list]:
+        text = self.text
+        match = word_pattern.match(text, self.pos)
+        if match is None:
+            return None
+        word = match.group(0)
+        self.pos = self.last_str_end = match.end()
+
+        if word in abbreviations and self.peek() in (" ", "\t"):
+            state = self.save()
+            whitespace = self.whitespace()
+            # Pandoc keeps the space before a footnote reference
+            if (whitespace == [{"t": "Space"}] and self.pos < len(text)
+                    and not text.startswith("[^", self.pos)):
+                return [Str(word + "\u00a0")]
+            self.restore(state)
+        return [Str(word)]
+
+    def symbol(self) -> list:
+        c = self.text[self.pos]
+        self.pos += 1
+        return [Str(c)]
+
+    def whitespace(self) -> list:
+        text = self.text
+        i = self.pos + 1
+        hard = i < len(text) and text[i] in " \t"
+        while i < len(text) and text[i] in " \t":
+            i += 1
+        self.pos = i
+        if hard and self.peek() == "\n":
+            self.endline()
+            return [{"t": "LineBreak"}]
+        return [{"t": "Space"}]
+
+    def endline(self) -> list:
+        self.pos += 1
+        while self.peek() in (" ", "\t") and self.peek():
+            self.pos += 1
+        return [{"t": "SoftBreak"}]
+
+    def escape(self) -> Optional[list]:
+        c = self.peek(1)
+        if c == "\n":
+            self.pos += 1
+            self.endline()
+            return [{"t": "LineBreak"}]
+        if c and not c.isalnum():
+            self.pos += 2
+            return [Str("\u00a0" if c == " " else c)]
+        match = latex_pattern.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            return [{"t": "RawInline", "c": ["tex", match.group(0)]}]
+        return None
+
+    def entity(self) -> Optional[list]:
+        match = entity_pattern.match(self.text, self.pos)
+        if match is None:
+            return None
+        decoded = html.unescape(match.group(0))
+        if decoded == match.group(0):
+            return None
+        self.pos = match.end()
+        return [Str(decoded)]
+
+    def math(self) -> Optional[list]:
+        text = self.text
+        if text.startswith("$$", self.pos):
+            end = text.find("$$", self.pos + 2)
+            if end > self.pos + 2:
+                content = text[self.pos + 2:end]
+                self.pos = end + 2
+                return [{"t": "Math", "c": [{"t": "DisplayMath"}, content]}]
+            return None
+        match = math_pattern.match(text, self.pos)
+        if match is None:
+            return None
+        self.pos = match.end()
+        return [{"t": "Math", "c": [{"t": "InlineMath"}, match.group(1)]}]
+
+    # --- Code ----------------------------------------------------------------
+
+    def code_span_end(self, start: int) -> Optional[Tuple[int, int, int]]:
+        """Returns the content range and end of the code span at `start`."""
+        text = self.text
+        i = start
+        while i < len(text) and text[i] == "`":
+            i += 1
+        ticks = i - start
+        while i < len(text) and text[i] in " \t":
+            i += 1
+        content_start = i
+        while i < len(text):
+            if text[i] == "`":
+                j = i
+                while j < len(text) and text[j] == "`":
+                    j += 1
+                if j - i == ticks:
+                    return content_start, i, j
+                i = j
+            else:
+                i += 1
+        return None
+
+    def code(self) -> Optional[list]:
+        span = self.code_span_end(self.pos)
+        if span is None:
+            return None
+        start, end, self.pos = span
+        content = self.text[start:end].replace("\n", " ").strip(" \t")
+        attr = ["", [], []]
+        if self.peek() == "{":
+            parsed = parse_attributes(self.text, self.pos)
+            if parsed is not None:
+                attr, self.pos = parsed
+        return [{"t": "Code", "c": [attr, content]}]
+
+    # --- Emphasis ------------------------------------------------------------
+
+    def ender(self, c: str, n: int) -> bool:
+        text, i = self.text, self.pos
+        if not text.startswith(c * n, i):
+            return False
+        return c == "*" or not text[i + n:i + n + 1].isalnum()
+
+    def enclosure(self) -> Optional[list]:
+        c = self.text[self.pos]
+        if c == "_" and self.last_str_end == self.pos:
+            return None
+        start = self.pos
+        while self.peek() == c:
+            self.pos += 1
+        delimiters = self.text[start:self.pos]
+        if self.peek() in (" ", "\t") and self.peek():
+            return [Str(delimiters)] + self.whitespace()
+        if len(delimiters) == 3:
+            return self.three(c)
+        if len(delimiters) == 2:
+            return self.two(c, [])
+        if len(delimiters) == 1:
+            return self.one(c, [])
+        return [Str(delimiters)]
+
+    def one(self, c: str, prefix: list) -> list:
+        contents: list = []
+        while self.pos < len(self.text):
+            if not self.ender(c, 1):
+                extend(contents, self.inline())
+                continue
+            if self.text.startswith(c * 2, self.pos):
+                state = self.save()
+                self.pos += 2
+                if not self.ender(c, 1):
+                    extend(contents, self.two(c, []))
+                    continue
+                self.restore(state)
+            break
+        if self.ender(c, 1):
+            self.pos += 1
+            self.last_str_end = self.pos
+            return [{"t": "Emph", "c": prefix + contents}]
+        return [Str(c)] + prefix + contents
+
+    def two(self, c: str, prefix: list) -> list:
+        contents: list = []
+        while self.pos < len(self.text) and not self.ender(c, 2):
+            extend(contents, self.inline())
+        if self.ender(c, 2):
+            self.pos += 2
+            self.last_str_end = self.pos
+            return [{"t": "Strong", "c": prefix + contents}]
+        return [Str(c * 2)] + prefix + contents
+
+    def three(self, c: str) -> list:
+        contents: list = []
+        while self.pos < len(self.text) and not self.ender(c, 1):
+            extend(contents, self.inline())
+        for n in (3, 2, 1):
+            if self.ender(c, n):
+                self.pos += n
+                self.last_str_end = self.pos
+                if n == 3:
+                    return [{"t": "Strong", "c": [{"t": "Emph", "c": contents}]}]
+                if n == 2:
+                    return self.one(c, [{"t": "Strong", "c": contents}])
+                return self.two(c, [{"t": "Emph", "c": contents}])
+        return [Str(c * 3)] + contents
+
+    def between(self, open_: str, close: str, kind: str) -> Optional[list]:
+        """Strikeout, superscript and subscript."""
+        state = self.save()
+        self.pos += len(open_)
+        if not self.peek() or self.peek() in " \t\n" or (
+            open_ == "~~" and self.peek() == "~"
+        ):
+            self.restore(state)
+            return None
+        contents: list = []
+        while self.pos < len(self.text):
+            if contents and self.text.startswith(close, self.pos):
+                self.pos += len(close)
+                return [{"t": kind, "c": contents}]
+            if kind != "Strikeout" and self.peek() in " \t\n":
+                break
+            extend(contents, self.inline())
+        self.restore(state)
+        return None
+
+    def tilde(self) -> Optional[list]:
+        if self.text.startswith("~~", self.pos):
+            return self.between("~~", "~~", "Strikeout")
+        return self.between("~", "~", "Subscript")
+
+    def caret(self) -> Optional[list]:
+        superscript = self.between("^", "^", "Superscript")
+        if superscript is not None:
+            return superscript
+        # Inline note
+        if self.peek(1) == "[":
+            end = self.matching_bracket(self.pos + 1)
+            if end is not None:
+                inlines = self.parse_nested(self.text[self.pos + 2:end])
+                self.pos = end + 1
+                return [{"t": "Note", "c": [{"t": "Para", "c": inlines}]}]
+        return None
+
+    # --- Smart punctuation ---------------------------------------------------
+
+    def single_quote(self) -> list:
+        after_string = self.last_str_end == self.pos
+        following = self.peek(1)
+        if "single" in self.quotes or after_string or not following or following in " \t\n":
+            self.pos += 1
+            return [Str("\u2019")]
+        return self.quoted("single", "SingleQuote", "\u2019", self.single_quote_end)
+
+    def single_quote_end(self) -> bool:
+        return self.peek() == "'" and not self.peek(1).isalnum()
+
+    def double_quote(self) -> list:
+        following = self.peek(1)
+        if "double" in self.quotes or not following or following in " \t\n":
+            self.pos += 1
+            return [Str("\u201d")]
+        return self.quoted("double", "DoubleQuote", "\u201c", lambda: self.peek() == '"')
+
+    def quoted(self, context: str, kind: str, fallback: str, at_end: Callable[[], bool]) -> list:
+        self.pos += 1
+        state = self.save()
+        self.quotes.add(context)
+        try:
+            contents = self.inline() if self.pos < len(self.text) else None
+            while contents is not None and self.pos < len(self.text):
+                if at_end():
+                    self.pos += 1
+                    return [{"t": "Quoted", "c": [{"t": kind}, contents]}]
+                extend(contents, self.inline())
+        finally:
+            self.quotes.discard(context)
+        self.restore(state)
+        return [Str(fallback)]
+
+    def dash(self) -> Optional[list]:
+        if self.text.startswith("---", self.pos):
+            self.pos += 3
+            return [Str("\u2014")]
+        if self.text.startswith("--", self.pos):
+            self.pos += 2
+            return [Str("\u2013")]
+        return None
+
+    def ellipsis(self) -> Optional[list]:
+        if self.text.startswith("...", self.pos):
+            self.pos += 3
+            return [Str("\u2026")]
+        return None
+
+    # --- Links ---------------------------------------------------------------
+
+    def matching_bracket(self, start: int) -> Optional[int]:
+        """Index of the `]` closing the `[` at `start`, skipping escaped
+        characters, code spans and raw HTML."""
+        text = self.text
+        depth = 0
+        i = start
+        while i < len(text):
+            c = text[i]
+            if c == "\\":
+                i += 2
+                continue
+            if c == "`":
+                span = self.code_span_end(i)
+                if span is not None:
+                    i = span[2]
+                    continue
+                while i < len(text) and text[i] == "`":
+                    i += 1
+                continue
+            if c == "<":
+                match = raw_html_pattern.match(text, i)
+                if match:
+                    i = match.end()
+                    continue
+            if c == "[":
+                depth += 1
+            elif c == "]":
+                depth -= 1
+                if depth == 0:
+                    return i
+            i += 1
+        return None
+
+    def bracket(self) -> Optional[list]:
+        text = self.text
+        if self.peek(1) == "^":
+            match = re.compile(r"\[\^([^\]\s]+)\]").match(text, self.pos)
+            if match:
+                self.pos = match.end()
+                note = self.markdown.resolve_note(match.group(1))
+                if note is None:
+                    return [Str(match.group(0))]
+                return [{"t": "Note", "c": note}]
+
+        end = self.matching_bracket(self.pos)
+        if end is None:
+            return None
+        label_text = text[self.pos + 1:end]
+
+        # Bracketed span
+        if text[end + 1:end + 2] == "{":
+            parsed = parse_attributes(text, end + 1)
+            if parsed is not None:
+                inlines = self.parse_nested(label_text)
+                self.pos = parsed[1]
+                return [{"t": "Span", "c": [parsed[0], inlines]}]
+
+        if not self.allow_links:
+            return None
+        return self.link("Link", self.pos, end)
+
+    def image(self) -> Optional[list]:
+        if self.peek(1) != "[":
+            return None
+        end = self.matching_bracket(self.pos + 1)
+        if end is None:
+            return None
+        state = self.save()
+        result = self.link("Image", self.pos + 1, end)
+        if result is None or result[0]["t"] != "Image":
+            self.restore(state)
+            return None
+        return result
+
+    def link(self, kind: str, start: int, end: int) -> Optional[list]:
+        text = self.text
+        raw_label = text[start + 1:end]
+
+        allow_links = self.allow_links
+        self.allow_links = False
+        label = trim(self.parse_nested(raw_label))
+        self.allow_links = allow_links
+
+        # Inline link
+        if text[end + 1:end + 2] == "(":
+            target = parse_link_target(text, end + 1)
+            if target is not None:
+                url, title, self.pos = target
+                attr = ["", [], []]
+                if self.peek() == "{":
+                    parsed = parse_attributes(text, self.pos)
+                    if parsed is not None:
+                        attr, self.pos = parsed
+                return [{"t": kind, "c": [attr, label, [url, title]]}]
+
+        # Reference link
+        key_text = raw_label
+        self.pos = end + 1
+        if self.peek() == "[":
+            key_end = self.matching_bracket(self.pos)
+            if key_end is not None:
+                if key_end > self.pos + 1:
+                    key_text = text[self.pos + 1:key_end]
+                self.pos = key_end + 1
+
+        key = normalize_key(key_text)
+        if key in self.markdown.references:
+            url, title, attr = self.markdown.references[key]
+            return [{"t": kind, "c": [attr, label, [url, title]]}]
+        if key in self.markdown.header_references:
+            url = self.markdown.header_references[key]
+            return [{"t": kind, "c": [["", [], []], label, [url, ""]]}]
+
+        if kind == "Image":
+            return None
+        fallback = [Str("[")]
+        extend(fallback, self.parse_nested(raw_label))
+        extend(fallback, [Str("]")])
+        if key_text is not raw_label or text[end + 1:self.pos] == "[]":
+            extend(fallback, self.parse_nested(text[end + 1:self.pos]))
+        return fallback
+
+    def angle(self) -> Optional[list]:
+        text = self.text
+        match = autolink_pattern.match(text, self.pos)
+        if match:
+            self.pos = match.end()
+            url = match.group(1)
+            return [{"t": "Link", "c": [["", ["uri"], []], [Str(url)], [escape_uri(url), ""]]}]
+        match = email_pattern.match(text, self.pos)
+        if match:
+            self.pos = match.end()
+            email = match.group(1)
+            return [{"t": "Link", "c": [
+                ["", ["email"], []], [Str(email)], ["mailto:" + escape_uri(email), ""]
+            ]}]
+        match = raw_html_pattern.match(text, self.pos)
+        if match:
+            self.pos = match.end()
+            return [{"t": "RawInline", "c": ["html", match.group(0)]}]
+        self.pos += 1
+        return [Str("<")]
+
+    def space(self) -> list:
+        return self.whitespace()
+
+    handlers: Dict[str, Callable[["InlineParser"], Optional[list]]] = {
+        " ": space,
+        "\t": space,
+        "\n": endline,
+        "`": code,
+        "*": enclosure,
+        "_": enclosure,
+        "~": tilde,
+        "^": caret,
+        "[": bracket,
+        "!": image,
+        "<": angle,
+        "\\": escape,
+        "&": entity,
+        "$": math,
+        "'": single_quote,
+        '"': double_quote,
+        "-": dash,
+        ".": ellipsis,
+    }
+
+
+# --- Attributes and links ------------------------------------------------------
+
+identifier_pattern = re.compile(r"[A-Za-z][\w\-:.]*")
+key_value_pattern = re.compile(
+    r"([A-Za-z][\w\-:.]*)="
+    r"(?:\"((?:[^\"\\]|\\.)*)\"|'((?:[^'\\]|\\.)*)'|((?:[^\s}\\]|\\.)*))"
+)
+unescape_pattern = re.compile(r"\\([^A-Za-z0-9\s])")
+
+
+def unescape(text: str) -> str:
+    return html.unescape(unescape_pattern.sub(r"\1", text))
+
+
+def parse_attributes(text: str, i: int) -> Optional[Tuple[Attr, int]]:
+    """Parses `{#identifier .class key=value}` at index `i`."""
+    if text[i:i + 1] != "{":
+        return None
+    identifier, classes, pairs = "", [], []
+    i += 1
+    while True:
+        while i < len(text) and text[i] in " \t\n":
+            i += 1
+        if i >= len(text):
+            return None
+        c = text[i]
+        if c == "}":
+            return [identifier, classes, pairs], i + 1
+        if c in "#.":
+            match = identifier_pattern.match(text, i + 1)
+            if match is None:
+                return None
+            if c == "#":
+                identifier = match.group(0)
+            else:
+                classes.append(match.group(0))
+            i = match.end()
+        elif c == "-":
+            classes.append("unnumbered")
+            i += 1
+        else:
+            match = key_value_pattern.match(text, i)
+            if match is None:
+                return None
+            key = match.group(1)
+            value = unescape(next(g for g in match.groups()[1:] if g is not None))
+            if key == "id":
+                identifier = value
+            elif key == "class":
+                classes.extend(value.split())
+            else:
+                pairs.append([key, value])
+            i = match.end()
+        if i < len(text) and text[i] not in " \t\n}":
+            return None
+
+
+def parse_link_target(text: str, i: int) -> Optional[Tuple[str, str, int]]:
+    """Parses `(url "title")` at index `i`, returns the URL, the title
+    and the index after the closing parenthesis."""
+    i += 1
+    while i < len(text) and text[i] == " ":
+        i += 1
+
+    url_chars: List[str] = []
+    if text[i:i + 1] == "<":
+        end = text.find(">", i)
+        if end < 0:
+            return None
+        url_chars.append(unescape(text[i + 1:end]))
+        i = end + 1
+    else:
+        depth = 0
+        while i < len(text):
+            c = text[i]
+            if c == "\\" and i + 1 < len(text) and not text[i + 1].isalnum():
+                url_chars.append(text[i + 1])
+                i += 2
+                continue
+            if c == "(":
+                depth += 1
+            elif c == ")":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif c in " \n":
+                j = i
+                while j < len(text) and text[j] in " \n":
+                    j += 1
+                if depth == 0 and text[j:j + 1] in ("\"", "'", ")", ""):
+                    break
+                url_chars.append(" ")
+                i = j
+                continue
+            elif c == "&":
+                match = entity_pattern.match(text, i)
+                if match:
+                    url_chars.append(html.unescape(match.group(0)))
+                    i = match.end()
+                    continue
+            url_chars.append(c)
+            i += 1
+
+    url = " ".join("".join(url_chars).split())
+
+    title = ""
+    j = i
+    while j < len(text) and text[j] in " \n":
+        j += 1
+    if text[j:j + 1] in ("\"", "'") and j > i:
+        quote = text[j]
+        k = j + 1
+        while k < len(text):
+            if text[k] == "\\":
+                k += 2
+                continue
+            if text[k] == quote:
+                after = k + 1
+                while after < len(text) and text[after] == " ":
+                    after += 1
+                if text[after:after + 1] == ")":
+                    title = unescape(text[j + 1:k])
+                    i = after
+                    break
+            k += 1
+
+    while i < len(text) and text[i] == " ":
+        i += 1
+    if text[i:i + 1] != ")":
+        return None
+    return escape_uri(url), title, i + 1
+
+
+def parse_reference(text: str) -> Optional[Tuple[str, str, Attr]]:
+    """Parses the target of a link reference definition: `url "title"`."""
+    match = re.match(
+        r"^(<[^>]*>|\S+)(?:\s+(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|\((?:[^)\\]|\\.)*\)))?"
+        r"\s*(\{.*\})?\s*$",
+        text,
+    )
+    if match is None:
+        return None
+    url, title, attributes = match.groups()
+    if url.startswith("<"):
+        url = url[1:-1]
+    attr = ["", [], []]
+    if attributes:
+        parsed = parse_attributes(attributes, 0)
+        if parsed is None:
+            return None
+        attr = parsed[0]
+    return escape_uri(unescape(url)), unescape(title[1:-1]) if title else "", attr
+
+
+def escape_uri(uri: str) -> str:
+    return "".join(
+        "".join("%%%02X" % b for b in c.encode("UTF-8"))
+        if c.isspace() or c in uri_needs_escape else c
+        for c in uri
+    )
+
+
+def normalize_key(label: str) -> str:
+    return " ".join(label.lower().split())
+
+
+# --- YAML ----------------------------------------------------------------------
+
+yaml_true = {"y", "Y", "yes", "Yes", "YES", "true", "True", "TRUE", "on", "On", "ON"}
+yaml_false = {"n", "N", "no", "No", "NO", "false", "False", "FALSE", "off", "Off", "OFF"}
+yaml_null = {"", "~", "null", "Null", "NULL"}
+yaml_int = re.compile(r"^[-+]?[0-9]+$")
+yaml_float = re.compile(r"^[-+]?(\.[0-9]+|[0-9]+(\.[0-9]*)?)([eE][-+]?[0-9]+)?$")
+
+
+class YamlParser(object):
+    """Just enough YAML for metadata blocks: block mappings and sequences,
+    flow sequences, quoted, plain and literal scalars."""
+
+    def __init__(self, lines: List[str]) -> None:
+        self.lines = list(lines)
+        self.i = 0
+
+    def parse(self):
+        return self.block(0)
+
+    def next_line(self) -> Optional[Tuple[int, str]]:
+        while self.i < len(self.lines):
+            line = self.lines[self.i]
+            stripped = line.strip(" ")
+            if stripped and not stripped.startswith("#"):
+                return leading_spaces(line), stripped
+            self.i += 1
+        return None
+
+    def block(self, min_indent: int):
+        following = self.next_line()
+        if following is None or following[0] < min_indent:
+            return None
+        indent, content = following
+        if content == "-" or content.startswith("- "):
+            return self.sequence(indent)
+        return self.mapping(indent)
+
+    def mapping(self, indent: int) -> dict:
+        result: dict = {}
+        while True:
+            following = self.next_line()
+            if following is None or following[0] != indent:
+                return result
+            content = following[1]
+            match = re.match(r"^(\"[^\"]*\"|'[^']*'|[^:#][^:]*?)\s*:(?:\s+|$)(.*)$", content)
+            if match is None:
+                self.i += 1
+                continue
+            key = match.group(1)
+            if key[0] in "\"'":
+                key = key[1:-1]
+            self.i += 1
+            result[key] = self.value(match.group(2), indent)
+
+    def sequence(self, indent: int) -> list:
+        result = []
+        while True:
+            following = self.next_line()
+            if following is None or following[0] != indent:
+                return result
+            content = following[1]
+            if not (content == "-" or content.startswith("- ")):
+                return result
+            rest = content[1:].lstrip(" ")
+            if re.match(r"^[^\"'\[{#][^:]*:(\s|$)", rest):
+                # Mapping inside of a sequence item: re-indent it in place
+                self.lines[self.i] = " " * (len(content) - len(rest) + indent) + rest
+                result.append(self.mapping(len(content) - len(rest) + indent))
+            else:
+                self.i += 1
+                result.append(self.value(rest, indent))
+
+    def value(self, text: str, indent: int):
+        text = strip_comment(text)
+        if text == "":
+            following = self.next_line()
+            if following is not None and (
+                following[0] > indent
+                or (following[0] == indent and following[1].startswith("- "))
+            ):
+                return self.block(following[0])
+            return None
+        if text[0] in "|>":
+            return self.block_scalar(text, indent)
+        if text[0] == "[":
+            return [scalar(item) for item in split_flow(text[1:text.rindex("]")])]
+        return scalar(text)
+
+    def block_scalar(self, header: str, indent: int) -> str:
+        lines = []
+        block_indent = None
+        while self.i < len(self.lines):
+            line = self.lines[self.i]
+            if line.strip(" "):
+                if block_indent is None:
+                    block_indent = leading_spaces(line)
+                if leading_spaces(line) < block_indent or block_indent <= indent:
+                    break
+            lines.append(line[block_indent or 0:])
+            self.i += 1
+        while lines and not lines[-1].strip(" "):
+            lines.pop()
+        if header[0] == ">":
+            text = re.sub(r"(?<=\S)\n(?=\S)", " ", "\n".join(lines))
+        else:
+            text = "\n".join(lines)
+        return text + ("" if "-" in header else "\n")
+
+
+def strip_comment(text: str) -> str:
+    if text[:1] in ("\"", "'"):
+        end = text.find(text[0], 1)
+        return text[:end + 1] if end > 0 else text
+    return re.split(r"\s#", text, 1)[0].strip(" ")
+
+
+def split_flow(text: str) -> List[str]:
+    items, current, quote = [], "", None
+    for c in text:
+        if quote:
+            current += c
+            if c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+            current += c
+        elif c == ",":
+            items.append(current.strip(" "))
+            current = ""
+        else:
+            current += c
+    if current.strip(" "):
+        items.append(current.strip(" "))
+    return items
+
+
+def scalar(text: str):
+    text = text.strip(" ")
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1].replace("''", "'")
+    if len(text) >= 2 and text[0] == text[-1] == "\"":
+        return text[1:-1].encode("latin-1", "backslashreplace").decode("unicode_escape")
+    if text in yaml_true:
+        return True
+    if text in yaml_false:
+        return False
+    if text in yaml_null:
+        return None
+    if yaml_int.match(text):
+        return str(int(text))
+    if yaml_float.match(text):
+        number = float(text)
+        return str(int(number)) if number.is_integer() else repr(number)
+    return text
@@ -0,0 +1,203 @@
+"""Pandoc backends used by `parse`
+
+The Pandoc binary is located once per process, and is never downloaded:
+
+- `$PANDOC_PATH` if set,
+- otherwise `pandoc` on the `PATH`,
+- otherwise the binary bundled with pypandoc, if any.
+
+Two backends are available:
+
+- `Pandoc` starts one Pandoc process per conversion,
+- `PandocServer` keeps a long-lived `pandoc server` worker
+  that serves all conversions over HTTP.
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from leet.logging import log
+
+
+class PandocError(RuntimeError):
+    pass
+
+
+class PandocNotFound(PandocError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def find_pandoc() -> str:
+    if "PANDOC_PATH" in os.environ:
+        return os.environ["PANDOC_PATH"]
+
+    path = shutil.which("pandoc")
+    if path is not None:
+        return path
+
+    try:
+        import pypandoc  # type: ignore
+        return pypandoc.get_pandoc_path()
+    except (ImportError, OSError):
+        pass
+
+    raise PandocNotFound(
+        "Pandoc was not found. Install it (https://pandoc.org/installing.html) "
+        "or set the PANDOC_PATH environment variable."
+    )
+
+
+@lru_cache(maxsize=None)
+def pandoc_version(path: str) -> str:
+    process = subprocess.run(
+        [path, "--version"],
+        stdout=subprocess.PIPE, universal_newlines=True,
+    )
+    if process.returncode != 0:
+        raise PandocError(f"Could not get the version of Pandoc at '{path}'")
+    # First line is "pandoc 3.1.2" (or "pandoc.exe 3.1.2")
+    return process.stdout.splitlines()[0].split()[-1]
+
+
+class Pandoc(object):
+    """Converts markdown to Pandoc's JSON AST, one process per conversion."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path if path is not None else find_pandoc()
+        self.version = pandoc_version(self.path)
+
+    def convert(self, markdown_content: str, extra_args: List[str]) -> str:
+        process = subprocess.run(
+            [self.path, "--from=markdown", "--to=json", *extra_args],
+            input=markdown_content.encode("UTF-8"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if process.returncode != 0:
+            raise PandocError(
+                "Pandoc failed with exit code %d: %s"
+                % (process.returncode, process.stderr.decode("UTF-8").strip())
+            )
+        return process.stdout.decode("UTF-8")
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PandocServer(Pandoc):
+    """Converts markdown using a long-lived `pandoc server` worker.
+
+    The server only accepts the conversion options of its JSON API,
+    command line arguments such as `--quiet` do not apply.
+    """
+
+    startup_timeout = 10
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        super().__init__(path)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}/"
+        log.debug(f"Starting Pandoc server on port {self.port}...")
+        self.process = subprocess.Popen(
+            [self.path, "server", f"--port={self.port}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self.wait_until_ready()
+
+    def wait_until_ready(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                error = self.process.stderr.read().decode("UTF-8")  # type: ignore
+                self.close()
+                raise PandocError("Pandoc server exited: %s" % error.strip())
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    pass
+            except OSError:
+                time.sleep(0.05)
+                continue
+            # Listening is not enough, make sure the server can convert
+            try:
+                self.request("")
+                return
+            except (PandocError, OSError) as e:
+                self.close()
+                raise PandocError("Pandoc server is not working: %s" % e)
+        self.close()
+        raise PandocError("Pandoc server did not start in time")
+
+    def convert(self, markdown_content: str, extra_args: List[str]) -> str:
+        import urllib.error
+
+        try:
+            return self.request(markdown_content)
+        except urllib.error.URLError as e:
+            log.warning(f"Pandoc server is unreachable, falling back to a subprocess: {e}")
+            return super().convert(markdown_content, extra_args)
+
+    def request(self, markdown_content: str) -> str:
+        # Only needed by the server, urllib is slow to import
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({
+                "text": markdown_content,
+                "from": "markdown",
+                "to": "json",
+            }).encode("UTF-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            },
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise PandocError("Pandoc server failed: %s" % e.read().decode("UTF-8"))
+        return result["output"]
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait()
+        self.process.stderr.close()  # type: ignore
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(server: bool = False) -> Pandoc:
+    """Returns a Pandoc backend, falling back to one process per conversion
+    if the server cannot be started."""
+    if server:
+        try:
+            return PandocServer()
+        except (PandocError, OSError) as e:
+            log.warning(f"Could not start Pandoc server, falling back to subprocesses: {e}")
+    return default_backend()
+
+
+@lru_cache(maxsize=None)
+def default_backend() -> Pandoc:
+    return Pandoc()
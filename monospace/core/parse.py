@@ -1,21 +1,334 @@
 import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set
 
-import pypandoc  # type: ignore
 from leet.logging import log
 
-try:
-    pypandoc._ensure_pandoc_path()
-except OSError:
-    pypandoc.download_pandoc()
-    pypandoc._ensure_pandoc_path()
+from .cache import DiskCache, make_key
+from .pandoc import Pandoc, default_backend
 
+# Maximum size of the on-disk Pandoc AST cache
+AST_CACHE_SIZE = 64 * 1024 * 1024
+
+pandoc_args = ["--quiet"]
+
+
+def ast_cache(directory=None) -> DiskCache:
+    return DiskCache("ast", max_size=AST_CACHE_SIZE, directory=directory)
+
+
+def parse(
+    markdown_content,
+    cache: Optional[DiskCache] = None,
+    backend: Optional[Pandoc] = None,
+    stream: bool = False,
+) -> dict:
+    """Parses markdown into Pandoc's AST.
+
+    With `stream`, the blocks of the AST are decoded lazily, see `decode_stream`.
+    """
+    raw_ast = parse_raw(markdown_content, cache, backend)
+    return decode_stream(raw_ast) if stream else json.loads(raw_ast)
+
+
+def parse_chapters(
+    chapters: List[str],
+    cache: Optional[DiskCache] = None,
+    jobs: Optional[int] = None,
+    backend: Optional[Pandoc] = None,
+    stream: bool = False,
+) -> dict:
+    """Parses each chapter separately and merges the resulting ASTs.
+
+    Chapters that are not cached are converted concurrently, each by its
+    own Pandoc process (or all by the same Pandoc server). `chapters` should
+    come from `shard`, so that the merged AST is identical to the AST of the
+    whole document. With `stream`, the blocks of the merged AST are decoded
+    lazily, see `decode_stream`.
+    """
+    if len(chapters) == 1 or jobs == 1:
+        raw_asts = [parse_raw(chapter, cache, backend) for chapter in chapters]
+    else:
+        workers = min(len(chapters), jobs or os.cpu_count() or 1)
+        log.debug(f"Parsing {len(chapters)} chapters using {workers} Pandoc processes...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            raw_asts = list(executor.map(
+                lambda chapter: parse_raw(chapter, cache, backend),
+                chapters
+            ))
+
+    decode = decode_stream if stream else json.loads
+    return merge([decode(raw_ast) for raw_ast in raw_asts])
+
+
+def parse_raw(
+    markdown_content,
+    cache: Optional[DiskCache] = None,
+    backend: Optional[Pandoc] = None,
+) -> str:
+    if backend is None:
+        backend = default_backend()
+
+    key = None
+    if cache is not None:
+        key = make_key(markdown_content, backend.version, *pandoc_args)
+        cached = cache.get(key)
+        if cached is not None:
+            log.info("Pandoc AST cache hit (%s), skipping Pandoc." % key[:12])
+            return cached.decode("UTF-8")
+        log.info("Pandoc AST cache miss (%s)." % key[:12])
 
-def parse(markdown_content) -> dict:
-    raw_ast: str = pypandoc.convert_text(
-        markdown_content,
-        format="markdown",
-        to="json",
-        extra_args=["--quiet"],
-    )
     log.debug("Parsing markdown AST using Pandoc (%d chars)..." % len(markdown_content))
-    return json.loads(raw_ast)
+    raw_ast = backend.convert(markdown_content, extra_args=pandoc_args)
+
+    if cache is not None and key is not None:
+        cache.put(key, raw_ast.encode("UTF-8"))
+
+    return raw_ast
+
+
+def merge(asts: List[dict]) -> dict:
+    """Merges the ASTs of consecutive chapters into a single AST.
+
+    Like Pandoc, later metadata blocks override the fields of earlier ones.
+    Header identifiers are de-duplicated across chapters the same way
+    Pandoc does it inside a single document (`intro`, `intro-1`, ...).
+    Streamed blocks are merged lazily.
+    """
+    if len(asts) == 1:
+        return asts[0]
+
+    meta: dict = {}
+    for ast in asts:
+        meta.update(ast["meta"])
+
+    blocks = merge_blocks(asts)
+    if all(isinstance(ast["blocks"], list) for ast in asts):
+        blocks = list(blocks)
+
+    return {
+        "pandoc-api-version": asts[0]["pandoc-api-version"],
+        "meta": meta,
+        "blocks": blocks,
+    }
+
+
+def merge_blocks(asts: List[dict]) -> Iterator[dict]:
+    used: Set[str] = set()
+
+    for ast in asts:
+        # Identifiers seen in this chapter, before renaming
+        local: Set[str] = set()
+        for block in ast["blocks"]:
+            if block["t"] == "Header":
+                attributes = block["c"][1]
+                identifier = attributes[0]
+                attributes[0] = unique_identifier(
+                    identifier, auto_identifier(block["c"][2]), local, used)
+                local.add(identifier)
+                used.add(attributes[0])
+            yield block
+
+
+def unique_identifier(identifier: str, auto: str, local: Set[str], used: Set[str]) -> str:
+    if not identifier:
+        return identifier
+
+    base = identifier
+    # Pandoc already appended a suffix to de-duplicate within the chapter
+    if auto in local and re.fullmatch(re.escape(auto) + r"-\d+", identifier):
+        base = auto
+
+    if base not in used:
+        return base
+
+    n = 1
+    while f"{base}-{n}" in used:
+        n += 1
+    return f"{base}-{n}"
+
+
+def auto_identifier(inlines: list) -> str:
+    """Identifier that Pandoc generates for a header with the given content."""
+    def stringify(inlines):
+        for inline in inlines:
+            kind, value = inline["t"], inline.get("c")
+            if kind == "Str":
+                yield value
+            elif kind in ("Space", "SoftBreak", "LineBreak"):
+                yield " "
+            elif kind in ("Code", "Math"):
+                yield value[1]
+            elif kind in ("Link", "Image", "Span"):
+                yield from stringify(value[1])
+            elif kind == "Quoted":
+                yield from stringify(value[1])
+            elif kind in ("Emph", "Strong", "Underline", "Strikeout",
+                          "Superscript", "Subscript", "SmallCaps"):
+                yield from stringify(value)
+
+    text = "".join(stringify(inlines)).lower()
+    text = "".join(c for c in text if c.isalnum() or c in "_-. ")
+    identifier = "-".join(text.split())
+    identifier = identifier[next(
+        (i for i, c in enumerate(identifier) if c.isalpha()),
+        len(identifier)
+    ):]
+    return identifier or "section"
+
+
+# --- Streaming ---------------------------------------------------------------
+
+decoder = json.JSONDecoder()
+whitespace_pattern = re.compile(r"[ \t\n\r]*")
+
+
+def decode_stream(raw_ast: str) -> dict:
+    """Decodes Pandoc's JSON AST, except for its blocks which are decoded one at a time.
+
+    The `blocks` of the returned AST is a generator: a block is only decoded
+    when it is needed, and can be garbage collected as soon as it has been
+    processed, instead of keeping the whole decoded AST in memory.
+    Pandoc writes the metadata before the blocks, if it does not the whole
+    AST is decoded at once.
+    """
+    ast: dict = {}
+    position = expect(raw_ast, 0, "{")
+
+    while raw_ast[position] != "}":
+        key, position = decoder.raw_decode(raw_ast, position)
+        position = expect(raw_ast, position, ":")
+        if key == "blocks" and "meta" in ast:
+            ast[key] = decode_array(raw_ast, position)
+            return ast
+        ast[key], position = decoder.raw_decode(raw_ast, position)
+        position = skip_whitespace(raw_ast, position)
+        if raw_ast[position] == ",":
+            position = skip_whitespace(raw_ast, position + 1)
+
+    return ast
+
+
+def decode_array(raw_json: str, position: int) -> Iterator[dict]:
+    position = expect(raw_json, position, "[")
+    while raw_json[position] != "]":
+        element, position = decoder.raw_decode(raw_json, position)
+        yield element
+        position = skip_whitespace(raw_json, position)
+        if raw_json[position] == ",":
+            position = skip_whitespace(raw_json, position + 1)
+
+
+def expect(raw_json: str, position: int, character: str) -> int:
+    position = skip_whitespace(raw_json, position)
+    if raw_json[position:position + 1] != character:
+        raise json.JSONDecodeError(f"Expecting '{character}'", raw_json, position)
+    return skip_whitespace(raw_json, position + 1)
+
+
+def skip_whitespace(raw_json: str, position: int) -> int:
+    return whitespace_pattern.match(raw_json, position).end()  # type: ignore
+
+
+# --- Sharding ----------------------------------------------------------------
+
+fence_pattern = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+chapter_pattern = re.compile(r"^#(\s|$)")
+header_pattern = re.compile(r"^#{1,6}\s+(.*?)(\s+#+)?\s*(\{.*\})?\s*$")
+footnote_pattern = re.compile(r"^ {0,3}\[\^([^\]]+)\]:", re.MULTILINE)
+footnote_ref_pattern = re.compile(r"\[\^([^\]]+)\](?!:)")
+reference_pattern = re.compile(r"^[ \t]*\[([^\]^][^\]]*)\]:.*$", re.MULTILINE)
+
+
+def split_chapters(markdown_content: str) -> List[str]:
+    """Splits a markdown document before each of its level 1 headers.
+
+    Headers inside fenced code blocks and YAML metadata blocks are ignored.
+    """
+    lines = markdown_content.splitlines(keepends=True)
+    chapters: List[List[str]] = [[]]
+
+    fence: Optional[str] = None
+    in_yaml = False
+    previous_blank = True
+
+    for i, line in enumerate(lines):
+        stripped = line.rstrip("\r\n")
+
+        if fence is not None:
+            closing = stripped.strip()
+            if closing.startswith(fence) and not closing.strip(fence[0]):
+                fence = None
+        elif in_yaml:
+            if stripped in ("---", "..."):
+                in_yaml = False
+        elif (
+            stripped == "---"
+            and previous_blank
+            and i + 1 < len(lines)
+            and lines[i + 1].strip()
+        ):
+            in_yaml = True
+        elif fence_pattern.match(stripped):
+            fence = fence_pattern.match(stripped).group(1)  # type: ignore
+        elif previous_blank and chapter_pattern.match(stripped) and chapters[-1]:
+            chapters.append([])
+
+        chapters[-1].append(line)
+        previous_blank = not stripped.strip()
+
+    return ["".join(chapter) for chapter in chapters]
+
+
+def shard(documents: List[str]) -> List[str]:
+    """Splits consecutive markdown documents into independently parsable chapters.
+
+    Returns the whole content as a single chapter when splitting could
+    change the result: footnotes defined in another chapter than the one
+    they are used in, or implicit references to headers of other chapters.
+    Link reference definitions are document-wide in Pandoc, so the first
+    definition of each label is copied to the top of every chapter.
+    """
+    whole = ["".join(documents)]
+    chapters = [
+        chapter
+        for document in documents
+        for chapter in split_chapters(document)
+    ]
+    if len(chapters) <= 1:
+        return whole
+
+    references: Dict[str, str] = {}
+    for match in reference_pattern.finditer(whole[0]):
+        label = " ".join(match.group(1).lower().split())
+        references.setdefault(label, match.group(0).strip())
+
+    titles = [
+        [
+            m.group(1).lower()
+            for m in map(header_pattern.match, chapter.splitlines())
+            if m
+        ]
+        for chapter in chapters
+    ]
+
+    for i, chapter in enumerate(chapters):
+        notes = set(footnote_pattern.findall(chapter))
+        if not set(footnote_ref_pattern.findall(chapter)) <= notes:
+            log.debug("Footnotes are defined in other chapters, not sharding.")
+            return whole
+
+        lowered = chapter.lower()
+        for j, other_titles in enumerate(titles):
+            if i != j and any(f"[{title}]" in lowered for title in other_titles):
+                log.debug("Headers are referenced across chapters, not sharding.")
+                return whole
+
+    if references:
+        definitions = "\n".join(references.values()) + "\n\n"
+        chapters = [definitions + chapter for chapter in chapters]
+
+    log.debug(f"Split markdown into {len(chapters)} chapters.")
+    return chapters
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from leet.logging import log, log_progress
 
@@ -20,11 +20,55 @@ def process(ast: dict, working_dir):
     return settings, cross_references, document_elements
 
 
+ProcessFunction = Callable[["Processor", Any], Optional[d.Element]]
+
+# Process functions of each kind of Pandoc element, see `processes`
+processors: Dict[str, ProcessFunction] = {}
+
+
+def processes(*kinds: str) -> Callable[[ProcessFunction], ProcessFunction]:
+    """Registers a function processing the given kinds of Pandoc elements.
+
+    The function takes the processor and the content (`"c"`) of the Pandoc
+    element, and returns a domain element, or `None` to drop it:
+
+        @processes("Strikeout")
+        def process_strikeout(processor, value):
+            return d.Italic(children=processor.process_elements(value))
+
+    Pandoc elements without a process function become `d.Unprocessed`.
+    """
+    def register(function: ProcessFunction) -> ProcessFunction:
+        for kind in kinds:
+            processors[kind] = function
+        return function
+    return register
+
+
 class Processor(object):
+    """Processes Pandoc's AST into the mono AST, in a single pass over its blocks.
+
+    The blocks can be a generator (see `parse.decode_stream`), in which case
+    each block is released as soon as it has been processed. Links to headers
+    that have not been processed yet are fixed once all blocks are processed.
+
+    Cross-references are indexed both ways, from identifiers to titles and
+    from titles to identifiers, so that processing is linear in the number
+    of headers and links.
+    """
+
     def __init__(self, ast: dict, settings: Settings) -> None:
         self.settings = settings
         self.note_count = -1
-        self.cross_references = self.find_references(ast["blocks"])
+        self.cross_references: Dict[str, str] = {}
+        # Reverse index, from titles to the first header with that title
+        self.identifiers: Dict[str, str] = {}
+        # Titles of links, stylized once per header
+        self.link_titles: Dict[str, List[d.Element]] = {}
+        # Cross-references whose title is only known at the end
+        self.pending_links: List[Tuple[d.CrossRef, str]] = []
+        log.info("Processing AST tree into domain elements...")
+        self.processed = self.process_elements(ast["blocks"], progress=True)
         # FIXME: This is just for the mockup
         self.cross_references.update({
             "how-to-pay": "How to pay",
@@ -43,78 +87,94 @@ class Processor(object):
             "summary-of-key-rules": "Summary of key rules",
             "foreword": "Foreword",
         })
-        log.info("Processing AST tree into domain elements...")
-        self.processed = self.process_elements(ast["blocks"], progress=True)
-
-    def find_references(self, elements: list) -> Dict[str, str]:
-        references: Dict[str, str] = {}
-        log.info("Finding cross-references...")
-        for element in log_progress.debug(elements):
-            if element["t"] == "Header":
-                identifier = Metadata(element["c"][1]).identifier
-                title = join(self.process_elements(element["c"][2]))
-                assert identifier not in references,\
-                    "A header with this title already exists: %s" % title
-                references[identifier] = title
-        self.note_count = -1
-        return references
+        self.resolve_links()
+
+    def add_reference(self, identifier: str, title: str) -> None:
+        assert identifier not in self.cross_references,\
+            "A header with this title already exists: %s" % title
+        self.cross_references[identifier] = title
+        self.identifiers.setdefault(title, identifier)
+
+    def link_title(self, identifier: str) -> List[d.Element]:
+        if identifier not in self.link_titles:
+            self.link_titles[identifier] = stylize(
+                self.cross_references[identifier], styles.small_caps)
+        return [d.SmallCaps(list(self.link_titles[identifier]))]
+
+    def resolve_links(self) -> None:
+        for cross_ref, reference in self.pending_links:
+            assert reference in self.cross_references,\
+                "Link points to unknown reference '#%s'" % reference
+            cross_ref.children = self.link_title(reference)
+        self.pending_links = []
 
     def process_elements(self, elements, progress=False) -> List[d.Element]:
         if progress:
             elements = log_progress.debug(elements)
 
-        processed = [
-            self.process_element(e["t"], e["c"] if "c" in e else None)
-            for e in elements
-        ]
-        return [pe for pe in processed if pe is not None]
+        processed = []
+        for e in elements:
+            pe = self.process_element(e["t"], e.get("c"))
+            if pe is not None:
+                processed.append(pe)
+        return processed
 
     def process_element(self, kind: str, value: Any) -> Optional[d.Element]:
-        # --- Structural ------------------------------------------------------
-        if kind == "Header":
-            return self.process_header(value)
-        elif kind == "Para" or kind == "Plain":
-            return self.process_paragraph(value)
-        elif kind == "BlockQuote":
-            return self.process_quote(value)
-        elif kind == "OrderedList":
-            return d.OrderedList(
-                [self.process_elements(elements) for elements in value[1]])
-        elif kind == "BulletList":
-            return d.UnorderedList(
-                [self.process_elements(elements) for elements in value])
-        elif kind == "Div":
-            return self.process_div(value)
-        elif kind == "CodeBlock":
-            language = "" if not value[0][1] else value[0][1][0]
-            return d.CodeBlock(language=language, code=value[1])
-        elif kind == "Image":
-            return d.Image(
-                uri=value[2][0],
-                caption=d.Note(children=self.process_elements(value[1]), count=None),
-                **dict(value[0][2])
-            )
-        elif kind == "HorizontalRule":
-            return d.PageBreak()
-        # --- Textual ---------------------------------------------------------
-        elif kind == "Str":
-            return value
-        elif kind == "Strong":
-            return d.Bold(children=self.process_elements(value))
-        elif kind == "Emph":
-            return d.Italic(children=self.process_elements(value))
-        elif kind == "Link":
-            return self.process_link(value)
-        elif kind == "Code":
-            return d.Code(stylize(value[1], styles.monospace))
-        elif kind == "Quoted":
-            return self.process_quoted(value)
-        elif kind == "Note":
-            return self.process_note(value)
-        elif kind == "Space" or kind == "SoftBreak":
-            return d.Space()
-
-        return d.Unprocessed(kind)
+        process_function = processors.get(kind)
+        if process_function is None:
+            return d.Unprocessed(kind)
+        return process_function(self, value)
+
+    # --- Structural ----------------------------------------------------------
+
+    @processes("OrderedList")
+    def process_ordered_list(self, value):
+        return d.OrderedList(
+            [self.process_elements(elements) for elements in value[1]])
+
+    @processes("BulletList")
+    def process_bullet_list(self, value):
+        return d.UnorderedList(
+            [self.process_elements(elements) for elements in value])
+
+    @processes("CodeBlock")
+    def process_code_block(self, value):
+        language = "" if not value[0][1] else value[0][1][0]
+        return d.CodeBlock(language=language, code=value[1])
+
+    @processes("Image")
+    def process_image(self, value):
+        return d.Image(
+            uri=value[2][0],
+            caption=d.Note(children=self.process_elements(value[1]), count=None),
+            **dict(value[0][2])
+        )
+
+    @processes("HorizontalRule")
+    def process_horizontal_rule(self, value):
+        return d.PageBreak()
+
+    # --- Textual -------------------------------------------------------------
+
+    @processes("Str")
+    def process_str(self, value):
+        return value
+
+    @processes("Strong")
+    def process_strong(self, value):
+        return d.Bold(children=self.process_elements(value))
+
+    @processes("Emph")
+    def process_emph(self, value):
+        return d.Italic(children=self.process_elements(value))
+
+    @processes("Code")
+    def process_code(self, value):
+        return d.Code(stylize(value[1], styles.monospace))
+
+    @processes("Space", "SoftBreak")
+    def process_space(self, value):
+        return d.Space()
 
     def make_text(self, elements):
         return d.Text(
@@ -122,6 +182,7 @@ class Processor(object):
             notes=[]  # TODO: populate this
         )
 
+    @processes("Para", "Plain")
     def process_paragraph(self, value):
         text = self.make_text(value)
         if any(isinstance(e, d.Image) for e in text.elements):
@@ -130,6 +191,7 @@ class Processor(object):
             return text.elements[0]
         return d.Paragraph(text)
 
+    @processes("Note")
     def process_note(self, value):
         self.note_count += 1
         elements = self.process_elements(value)
@@ -140,10 +202,12 @@ class Processor(object):
             count=self.note_count
         )
 
+    @processes("BlockQuote")
     def process_quote(self, value):
         # Quote text elements are wrapped in a paragraph
         return d.Quote(self.make_text(value).elements[0].text)
 
+    @processes("Header")
     def process_header(self, value):
         level = value[0]
         metadata = Metadata(value[1])
@@ -159,10 +223,8 @@ class Processor(object):
 
         title = self.make_text(value[2])
         title_string = join([title])
-        id = next(
-            k for k, v in self.cross_references.items()
-            if v == title_string
-        )
+        self.add_reference(metadata.identifier, title_string)
+        id = self.identifiers[title_string]
 
         assert level in (1, 2, 3), "Hedings must be of level 1, 2 or 3"
         if level == 1:
@@ -172,26 +234,33 @@ class Processor(object):
         else:
             return d.Section(title=title, identifier=id)
 
+    @processes("Link")
     def process_link(self, value):
         if not value[2]:
             raise ValueError("Missing URI for link %s" % value)
 
         identifier = value[2][0]
-        title = join(self.process_elements(value[1]))
+        children = self.process_elements(value[1])
 
+        pending = None
         if identifier.startswith("#"):
-            assert identifier[1:] in self.cross_references,\
-                "Link points to unknown reference '%s'" % identifier
-            title = self.cross_references[identifier[1:]]
+            if identifier[1:] in self.cross_references:
+                children = self.link_title(identifier[1:])
+            else:
+                # Forward reference, the title is set once the header is processed
+                pending = identifier[1:]
+                children = []
             if self.settings.github_anchors:
                 identifier = "#user-content-" + identifier[1:]
+        else:
+            children = [d.SmallCaps(stylize(join(children), styles.small_caps))]
 
-        formatted_title = stylize(title, styles.small_caps)
-        return d.CrossRef(
-            children=formatted_title,
-            identifier=identifier
-        )
+        cross_ref = d.CrossRef(children=children, identifier=identifier)
+        if pending is not None:
+            self.pending_links.append((cross_ref, pending))
+        return cross_ref
 
+    @processes("Quoted")
     def process_quoted(self, value):
         quotes = double_quotes
         if value[0]["t"] == "SingleQuote":
@@ -200,6 +269,7 @@ class Processor(object):
         elements = self.process_elements(value[1])
         return d.Quoted(children=[quotes[0]] + elements + [quotes[1]])
 
+    @processes("Div")
     def process_div(self, value):
         kind = value[0][1][0]
         if kind == "Aside":
@@ -40,87 +40,212 @@ need to be aligned left or right depending on which page they are on.
 """
 
 import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import replace
-from typing import Dict, Iterator, List, Optional, Type
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Type, Union)
 
 from leet.logging import log, log_progress
 
+from .cache import DiskCache, make_key
 from .domain import Settings
 from .domain import blocks as b
 from .domain import document as d
-from .formatting import AnsiFormatter
 from .formatting import Format as F
-from .formatting import FormatTag, Formatter, PostScriptFormatter, styles
+from .formatting import FormatTag, Glyph, Line, styled, styles
 from .rendering import code, images
 from .rendering import paragraph as p
 from .symbols import characters
 
+# Maximum size of the on-disk cache of rendered blocks
+BLOCK_CACHE_SIZE = 256 * 1024 * 1024
+# Bump when the output of the renderers changes
+BLOCK_CACHE_VERSION = 6
+
+# Rendered from other files than the markdown, never cached
+uncached_elements = (d.Image,)
+
+
+def block_cache(directory=None) -> DiskCache:
+    return DiskCache("blocks", max_size=BLOCK_CACHE_SIZE, directory=directory)
+
 
 def render(
     elements: Iterator[d.Element],
     settings: Settings,
     cross_references: Dict[str, str],
-    formatter: Optional[Type[Formatter]] = None
+    cache: Optional[DiskCache] = None,
+    jobs: int = 1,
 ) -> Iterator[b.Block]:
-    renderer = Renderer(settings, cross_references, formatter)
-    log.info("Rendering domain elements into string blocks...")
-    return renderer.render_elements(elements, progress=True)
+    renderer = Renderer(settings, cross_references, cache)
+    log.info("Rendering domain elements into styled blocks...")
+    return renderer.render_document(elements, jobs=jobs)
+
+
+RenderFunction = Callable[["Renderer", Any], Union[b.Block, Iterable[b.Block]]]
+
+# Render functions of each type of domain element, see `renders`
+renderers: Dict[Type[d.Element], RenderFunction] = {}
+
+
+def renders(*kinds: Type[d.Element]) -> Callable[[RenderFunction], RenderFunction]:
+    """Registers a function rendering the given types of domain elements.
+
+    The function takes the renderer and the element, and returns a block,
+    or an iterable of blocks when the element can be broken across pages:
+
+        @renders(d.Quote)
+        def render_quote(renderer, quote):
+            return b.Block(main=...)
+
+    Subclasses of a registered type are rendered by the same function,
+    elements without a render function are skipped.
+    """
+    def register(function: RenderFunction) -> RenderFunction:
+        for kind in kinds:
+            renderers[kind] = function
+        return function
+    return register
+
+
+def find_renderer(kind: type) -> Optional[RenderFunction]:
+    if kind in renderers:
+        return renderers[kind]
+    for base in kind.__mro__[1:]:
+        if base in renderers:
+            return renderers[base]
+    return None
+
+
+# Renderer of the current worker process, see `render_parallel`
+worker: Optional["Renderer"] = None
+
+
+def start_worker(settings, cross_references) -> None:
+    global worker
+    worker = Renderer(settings, cross_references)
+
+
+def render_in_worker(element: d.Element) -> List[b.Block]:
+    return worker.render_top_level(element)  # type: ignore
 
 
 class Renderer(object):
-    def __init__(self, settings, cross_references, formatter=None):
+    def __init__(self, settings, cross_references, cache=None):
         self.settings: Settings = settings
         self.cross_references: Dict[str, str] = cross_references
-        self.formatter = formatter
+        # Only used by `render_document`, sub-renderers have no cache
+        self.cache: Optional[DiskCache] = cache
 
-    def render_elements(self, elements, progress=False) -> Iterator[b.Block]:
-        if progress:
-            elements = log_progress.debug(elements)
+    def render_document(self, elements, jobs: int = 1) -> Iterator[b.Block]:
+        """Renders the top-level elements of a document, in order.
 
-        for element in elements:
-            name = element.__class__.__name__
-
-            def pb(block):
-                if name in self.settings.break_before:
-                    (block[0] if isinstance(block, list) else block).break_before = True
-                return block
-
-            if isinstance(element, d.Chapter):
-                yield pb(self.render_chapter(element))
-            elif isinstance(element, d.SubChapter):
-                yield pb(self.render_subchapter(element))
-            elif isinstance(element, d.Section):
-                yield pb(self.render_section(element))
-            elif isinstance(element, d.Paragraph):
-                yield pb(self.render_paragraph(element))
-            elif isinstance(element, d.OrderedList):
-                yield from pb(self.render_list(element, ordered=True))
-            elif isinstance(element, d.UnorderedList):
-                yield from pb(self.render_list(element, ordered=False))
-            elif isinstance(element, d.Aside):
-                yield pb(self.render_aside(element))
-            elif isinstance(element, d.CodeBlock):
-                yield pb(self.render_code_block(element))
-            elif isinstance(element, d.Image):
-                yield pb(self.render_image(element))
-            elif isinstance(element, d.Quote):
-                yield pb(self.render_quote(element))
-            elif isinstance(element, d.PageBreak):
-                yield b.Block()
-
-            # Unimplemented:
-            elif (
-                isinstance(element, d.SubChapter)
-                or isinstance(element, d.Unprocessed)
-            ):
-                if isinstance(element, d.Unprocessed):
-                    kind = element.kind
+        With more than one job, elements are rendered by a pool of processes.
+        """
+        if jobs > 1:
+            yield from self.render_parallel(elements, jobs)
+            return
+
+        for element in log_progress.debug(elements):
+            yield from self.with_page_break(element, self.render_top_level(element))
+
+    def render_parallel(self, elements, jobs: int) -> Iterator[b.Block]:
+        elements = list(elements)
+        keys = [self.cache_key(element) for element in elements]
+        cached = [
+            self.cache.get(key) if self.cache is not None and key is not None else None
+            for key in keys
+        ]
+        misses = [element for element, data in zip(elements, cached) if data is None]
+        log.debug(f"Rendering {len(misses)} elements using {jobs} processes...")
+
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=start_worker,
+            initargs=(self.settings, self.cross_references),
+        ) as executor:
+            rendered = executor.map(
+                render_in_worker, misses,
+                chunksize=max(1, len(misses) // (jobs * 4)),
+            )
+            for element, key, data in zip(log_progress.debug(elements), keys, cached):
+                if data is not None:
+                    blocks = pickle.loads(data)
                 else:
-                    kind = element.__class__.__name__
+                    blocks = next(rendered)
+                    if self.cache is not None and key is not None:
+                        self.cache.put(key, pickle.dumps(blocks, protocol=pickle.HIGHEST_PROTOCOL))
+                yield from self.with_page_break(element, blocks)
+
+    def render_top_level(self, element) -> List[b.Block]:
+        """Renders a top-level element, or loads its blocks from the block cache."""
+        key = self.cache_key(element)
+        if self.cache is not None and key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return pickle.loads(cached)
+
+        blocks = list(self.render_element(element))
+
+        if self.cache is not None and key is not None:
+            self.cache.put(key, pickle.dumps(blocks, protocol=pickle.HIGHEST_PROTOCOL))
+        return blocks
+
+    def cache_key(self, element) -> Optional[str]:
+        render_function = find_renderer(type(element))
+        if self.cache is None or render_function is None:
+            return None
+        if isinstance(element, uncached_elements):
+            return None
+
+        settings = self.settings
+        return make_key(
+            str(BLOCK_CACHE_VERSION),
+            render_function.__module__,
+            render_function.__qualname__,
+            repr((
+                settings.main_width, settings.side_width, settings.tab_size,
+                settings.light, settings.line_breaking, settings.language,
+            )),
+            repr(element),
+        )
 
-                yield self.render_paragraph(
-                    d.Paragraph(text=d.Text(["<UNRENDERED: %s>" % kind]))
-                )
+    def render_elements(self, elements) -> Iterator[b.Block]:
+        for element in elements:
+            yield from self.with_page_break(element, self.render_element(element))
+
+    def render_element(self, element) -> Iterable[b.Block]:
+        render_function = find_renderer(type(element))
+        if render_function is None:
+            return []
+        rendered = render_function(self, element)
+        return [rendered] if isinstance(rendered, b.Block) else rendered
+
+    def with_page_break(self, element, blocks: Iterable[b.Block]) -> Iterator[b.Block]:
+        break_before = type(element).__name__ in self.settings.break_before
+        for i, block in enumerate(blocks):
+            if i == 0 and break_before:
+                block.break_before = True
+            yield block
+
+    @renders(d.OrderedList)
+    def render_ordered_list(self, ordered_list):
+        return self.render_list(ordered_list, ordered=True)
+
+    @renders(d.UnorderedList)
+    def render_unordered_list(self, unordered_list):
+        return self.render_list(unordered_list, ordered=False)
+
+    @renders(d.PageBreak)
+    def render_page_break(self, page_break):
+        return b.Block()
+
+    @renders(d.Unprocessed)
+    def render_unprocessed(self, unprocessed):
+        return self.render_paragraph(
+            d.Paragraph(text=d.Text(["<UNRENDERED: %s>" % unprocessed.kind]))
+        )
 
     def render_list(self, ordered_list, ordered=False):
         # Create sub-renderer that will create thinner blocks
@@ -133,21 +258,9 @@ class Renderer(object):
         # so the indentation adds up, no need to count levels :)
 
         def decorated_indent(n):
-            spaces = " " * self.settings.tab_size
-            bullet = "•"
-            offset = 1
-            if ordered:
-                bullet = styles.circled(n)
-                offset = 2  # Circled numbers are two characters wide...
-                if self.formatter == AnsiFormatter and n <= 20:
-                    # ...Unless you print them in a terminal and
-                    # the number is <= 20? o_O
-                    offset = 1
-                if self.formatter == PostScriptFormatter:
-                    offset = 1  # ps template has fixed offsets
-
-            result = bullet + spaces[offset:]
-            return self.format(result)
+            # The width of circled numbers depends on the format
+            bullet = styles.circled(n) if ordered else "•"
+            return (Glyph(bullet, width=self.settings.tab_size),)
 
         for i, elements in enumerate(ordered_list.list_elements):
             sub_blocks = renderer.render_elements(elements)
@@ -162,6 +275,7 @@ class Renderer(object):
                 )
                 yield block
 
+    @renders(d.Chapter)
     def render_chapter(self, chapter):
         elements, notes = self.render_notes(chapter.title.elements)
         title = [
@@ -175,7 +289,8 @@ class Renderer(object):
             text_elements=title,
             alignment=p.Alignment.left,
             width=self.settings.main_width,
-            format_func=self.format
+            format_func=self.format,
+            language=self.settings.language,
         )
         fence = ["━" * self.settings.main_width]
         lines.insert(0, self.format(fence))
@@ -183,6 +298,7 @@ class Renderer(object):
 
         return b.Block(main=lines, sides=notes)
 
+    @renders(d.SubChapter)
     def render_subchapter(self, subchapter):
         elements, notes = self.render_notes(subchapter.title.elements)
         line = ["━" * self.settings.side_width]
@@ -195,7 +311,8 @@ class Renderer(object):
             text_elements=title,
             alignment=p.Alignment.left,
             width=self.settings.side_width,
-            format_func=self.format
+            format_func=self.format,
+            language=self.settings.language,
         )
 
         side = [formatted_line] + title_lines
@@ -206,23 +323,26 @@ class Renderer(object):
                 text_elements=subtitle,
                 alignment=p.Alignment.left,
                 width=self.settings.side_width,
-                format_func=self.format
+                format_func=self.format,
+                language=self.settings.language,
             )
             space = self.format([" " * self.settings.side_width])
             side += [space] + subtitle_lines
 
         return b.Block(sides=[side] + notes)
 
+    @renders(d.Section)
     def render_section(self, section):
         elements, notes = self.render_notes(section.title.elements)
-        title = [d.Anchor([d.Bold(elements)], identifier=section.identifier)]
+        title = [d.Anchor([d.Bold([d.SmallCaps(elements)])], identifier=section.identifier)]
 
         lines = p.align(
             text_elements=title,
             alignment=p.Alignment.left,
             width=self.settings.main_width,
             format_func=self.format,
-            text_filter=styles.small_caps
+            text_filter=styles.small_caps,
+            language=self.settings.language,
         )
 
         return b.Block(main=lines, sides=notes)
@@ -231,14 +351,6 @@ class Renderer(object):
         new_elements = []
         notes = []
 
-        # TODO: Put this in Theme object
-        color = light_gray
-        if self.settings.light:
-            color = mid_gray
-
-        def gray_format(elems):
-            return self.format([color, *elems, color.close_tag])
-
         for elem in elements:
             if isinstance(elem, d.Note):
                 counter = []
@@ -252,23 +364,28 @@ class Renderer(object):
                     text_elements=side,
                     alignment=p.Alignment.left,
                     width=self.settings.side_width,
-                    format_func=gray_format
+                    format_func=mid_gray_note if self.settings.light else light_gray_note,
+                    language=self.settings.language,
                 ))
             else:
                 new_elements.append(elem)
         return new_elements, notes
 
+    @renders(d.Paragraph)
     def render_paragraph(self, paragraph):
         elements, notes = self.render_notes(paragraph.text.elements)
         lines = p.align(
             text_elements=elements,
             alignment=p.Alignment.justify,
             width=self.settings.main_width,
-            format_func=self.format
+            format_func=self.format,
+            line_breaking=p.LineBreaking[self.settings.line_breaking],
+            language=self.settings.language,
         )
 
-        return b.Block(main=lines, sides=notes)
+        return b.Block(main=lines, sides=notes, splittable=True)
 
+    @renders(d.Aside)
     def render_aside(self, aside):
         # Note: although aside is composed of multiple blocks,
         # we want to only return one block, because aside shouldn't be broken
@@ -314,6 +431,7 @@ class Renderer(object):
             sides=notes
         )
 
+    @renders(d.Quote)
     def render_quote(self, quote):
         tab_size = self.settings.tab_size
         content_width = self.settings.main_width - tab_size * 2
@@ -327,7 +445,8 @@ class Renderer(object):
                 text_elements=author,
                 alignment=p.Alignment.right,
                 width=content_width,
-                format_func=self.format
+                format_func=self.format,
+                language=self.settings.language,
             )
 
         elements, notes = self.render_notes(elements)
@@ -336,7 +455,8 @@ class Renderer(object):
             text_elements=[d.Italic(elements)],
             alignment=p.Alignment.center,
             width=content_width,
-            format_func=self.format
+            format_func=self.format,
+            language=self.settings.language,
         )
 
         empty_line = self.format(" " * content_width)
@@ -349,6 +469,7 @@ class Renderer(object):
             sides=notes
         )
 
+    @renders(d.CodeBlock)
     def render_code_block(self, code_block):
         ft = self.format
         ts = self.settings.tab_size
@@ -383,6 +504,7 @@ class Renderer(object):
             inner_tags=[bg]
         ))
 
+    @renders(d.Image)
     def render_image(self, image):
         extension = image.uri.rsplit(".", 1)[-1]
         real_uri = os.path.join(self.settings.working_dir, image.uri)
@@ -459,18 +581,17 @@ class Renderer(object):
                 )
             ),
             cross_references=self.cross_references,
-            formatter=self.formatter
         )
 
     def indent(
         self,
-        lines: List[str],
+        lines: List[Line],
         left_width: int,
         right_width: int,
-        top_line: Optional[str] = None,
-        bottom_line: Optional[str] = None,
-        before: Optional[str] = None,
-        after: Optional[str] = None,
+        top_line: Optional[Line] = None,
+        bottom_line: Optional[Line] = None,
+        before: Optional[Line] = None,
+        after: Optional[Line] = None,
         outer_tags: Optional[List[FormatTag]] = None,
         inner_tags: Optional[List[FormatTag]] = None,
     ):
@@ -517,10 +638,21 @@ class Renderer(object):
 
         return result
 
-    def format(self, elems):
-        return self.formatter.format_tags(elems, self.settings)
+    # Styling does not depend on the renderer, aligned text is memoized across renderers
+    format = staticmethod(styled)
 
 
 light_gray = FormatTag(kind=F.ForegroundColor, data={"color": "#aaaaaa"})
 mid_gray = FormatTag(kind=F.ForegroundColor, data={"color": "#888888"})
 dark_gray = FormatTag(kind=F.ForegroundColor, data={"color": "#444444"})
+
+
+# Notes, on dark and light themes. Like `Renderer.format`, they do not depend
+# on the renderer, so that notes are memoized across renderers.
+# TODO: Put this in Theme object
+def light_gray_note(elems) -> Line:
+    return styled([light_gray, *elems, light_gray.close_tag])
+
+
+def mid_gray_note(elems) -> Line:
+    return styled([mid_gray, *elems, mid_gray.close_tag])
@@ -1,14 +1,9 @@
 import re
 from typing import Callable, List, Union
 
-from pygments.lexers import get_lexer_by_name  # type: ignore
-from pygments.styles import get_style_by_name  # type: ignore
-from pygments.token import Token  # type: ignore
-from pygments.util import ClassNotFound  # type: ignore
-
 from ..domain import document as d
 from ..formatting import Format as F
-from ..formatting import FormatTag
+from ..formatting import FormatTag, Line
 
 
 def highlight_code_block(
@@ -16,7 +11,12 @@ def highlight_code_block(
     format_func: Callable,
     width: int,
     light: bool = False
-) -> List[str]:
+) -> List[Line]:
+    from pygments.lexers import get_lexer_by_name  # type: ignore
+    from pygments.styles import get_style_by_name  # type: ignore
+    from pygments.token import Token  # type: ignore
+    from pygments.util import ClassNotFound  # type: ignore
+
     try:
         lexer = get_lexer_by_name(code_block.language)
     except ClassNotFound:
@@ -95,5 +95,4 @@ def highlight_code_block(
             current_length += len(word)
 
     rjust_last()
-    formatted_lines = [format_func(line) for line in wrapped]
-    return ["".join(line) for line in formatted_lines]
+    return [format_func(line) for line in wrapped]
@@ -1,26 +1,31 @@
 from enum import Enum
+from functools import lru_cache
 from heapq import nsmallest
 from math import sqrt
 from typing import Callable, List, Optional, Sequence
 
-from cursebox.palette import distance, generate_xterm_256  # type: ignore
-from PIL import Image  # type: ignore
-
 from ..formatting import Format as F
 from ..formatting import FormatTag
 
 Mode = Enum("Mode", ["Blocks", "Dithered", "Pixels", "Super"])
 Palette = Enum("Palette", ["Monochrome", "ANSI", "Xterm", "RGB"])
 
-XTERM_256 = generate_xterm_256()
-palettes = {
-    Palette.Monochrome: {n: XTERM_256[n] for n in (0, 15)},
-    Palette.ANSI: {n: XTERM_256[n] for n in range(16)},
-    Palette.Xterm: XTERM_256,
-}
+
+@lru_cache(maxsize=None)
+def palettes():
+    from cursebox.palette import generate_xterm_256  # type: ignore
+
+    xterm_256 = generate_xterm_256()
+    return {
+        Palette.Monochrome: {n: xterm_256[n] for n in (0, 15)},
+        Palette.ANSI: {n: xterm_256[n] for n in range(16)},
+        Palette.Xterm: xterm_256,
+    }
 
 
 def dimensions(uri) -> List[int]:
+    from PIL import Image  # type: ignore
+
     image = Image.open(uri)
     return image.size
 
@@ -32,6 +37,7 @@ def ansify(
     palette: Palette = Palette.RGB,
     width: Optional[int] = None,
 ) -> List[str]:
+    from PIL import Image  # type: ignore
 
     original = Image.open(uri)
 
@@ -158,6 +164,8 @@ def pixelify(image, pixels, palette, format_func):
 
 
 def ditherify(image, pixels, palette, format_func):
+    from cursebox.palette import distance  # type: ignore
+
     for y in range(0, image.height - (image.height % 2), 2):
         line = []
         for x in range(image.width):
@@ -198,7 +206,9 @@ def blockify(image, pixels, palette, format_func):
 
 
 def n_closest_color(n, color, palette_name):
-    palette = palettes[palette_name]
+    from cursebox.palette import distance  # type: ignore
+
+    palette = palettes()[palette_name]
     n_closest = nsmallest(
         n, palette,
         key=lambda k: distance(color, palette[k])
@@ -1,25 +1,59 @@
 import random
-from copy import copy
-from dataclasses import dataclass
+import zlib
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
 from enum import Enum
-from itertools import groupby
-from typing import Callable, List, Optional, Tuple, Union
-
-import pyphen  # type: ignore
+from functools import lru_cache
+from itertools import accumulate
+from typing import Callable, Hashable, List, Optional, Tuple, Union
 
+from ...util import slotted
+from ..cache import MemoryCache
 from ..domain import document as d
 from ..formatting import Format, FormatTag
 
-random.seed(1337)
-
 Alignment = Enum("Alignment", ["left", "center", "right", "justify"])
+LineBreaking = Enum("LineBreaking", ["greedy", "optimal"])
 
 Element = Union[FormatTag, str]
 Line = List[Union[Element, d.Space]]
 
-# TODO: Language in settings for hyphen dictionary
-pyphen_dictionary = pyphen.Pyphen(lang="en_US")
-wrap = pyphen_dictionary.wrap
+
+# Number of words whose hyphenation points are kept
+HYPHENATION_CACHE_SIZE = 16384
+# Number of aligned texts that are kept, see `align`
+ALIGN_CACHE_SIZE = 4096
+
+align_cache = MemoryCache("align", ALIGN_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def hyphenator(language: str):
+    import pyphen  # type: ignore
+    dictionary = pyphen.language_fallback(language)
+    if dictionary is None:
+        raise ValueError("No hyphenation dictionary for language '%s'" % language)
+    return pyphen.Pyphen(lang=dictionary)
+
+
+@lru_cache(maxsize=HYPHENATION_CACHE_SIZE)
+def hyphenation_points(word: str, language: str) -> Tuple[int, ...]:
+    """Indices where a word can be hyphenated, in increasing order.
+
+    Hyphenations that change the spelling of the word are not supported.
+    """
+    return tuple(int(p) for p in hyphenator(language).positions(word) if p.data is None)
+
+
+def hyphenate(word: str, width: int, language: str) -> Optional[int]:
+    """Index of the longest start of a word that fits in `width` with a hyphen."""
+    index = None
+    for point in hyphenation_points(word, language):
+        if point >= width:
+            break
+        index = point
+    return index
 
 
 def align(
@@ -27,44 +61,65 @@ def align(
     alignment: Alignment,
     width: int,
     format_func: Optional[Callable] = None,
-    text_filter: Callable[[str], str] = lambda s: s
+    text_filter: Callable[[str], str] = lambda s: s,
+    line_breaking: LineBreaking = LineBreaking.greedy,
+    language: str = "en_US",
 ) -> List[str]:
-
-    elements = flatten(text_elements)
-    words = [Word(elems) for elems in split(elements, d.Space())]
-    lines = break_words(words, width)
-    insert_spaces(lines, alignment, width)
-    add_padding(lines, alignment, width)
+    """Breaks text in lines of `width` characters, aligns and formats them.
+
+    Results are memoized: the same text is aligned once for all the page
+    numbers, captions or notes where it appears. `format_func` and
+    `text_filter` are part of the key, they must only depend on their input.
+    """
+    tokens = tokenize(text_elements)
+    key = (tokens.key(), alignment, width, format_func, text_filter, line_breaking, language)
+    lines = align_cache.get(key)
+    if lines is None:
+        lines = tuple(align_tokens(
+            tokens, alignment, width, format_func, text_filter, line_breaking, language))
+        align_cache.put(key, lines)
+    return list(lines)
+
+
+def align_tokens(
+    tokens, alignment, width, format_func, text_filter, line_breaking, language
+) -> List[str]:
+    words = tokens.words()
+    if alignment == Alignment.justify and line_breaking == LineBreaking.optimal:
+        lines = break_words_optimally(words, width, language)
+    else:
+        lines = break_words(words, width, language)
+    lengths = insert_spaces(lines, alignment, width)
+    add_padding(lines, lengths, alignment, width)
     return format_lines(lines, text_filter, format_func)
 
 
-def break_words(words, width):
+def break_words(words, width, language):
     # Break up elements in lines (with hyphenation)
     # and cross tags over the line when tags are still open.
 
     lines: List[Line] = [[]]
     open_tags: List[str] = []
+    # Length of the current line, spaces included
+    length = 0
 
     for word in words:
-        line = lines[-1]
+        available = width - length
 
-        available = room_left(line, width)
-
-        if len(word) <= available:
-            append_word(word, line, open_tags)
+        if word.length <= available:
+            length += append_word(word, lines[-1], open_tags)
         else:
-            hyphenated = wrap(word.word(), available)
+            index = hyphenate(word.word(), available, language)
 
-            if hyphenated:
-                index = len(hyphenated[0]) - 1
+            if index is not None:
                 left, right = word.split_at(index)
                 # Don't add a hyphen if the word is a compound word
                 if not left.word().endswith("-"):
                     left += "-"
-                append_word(left, line, open_tags)
-                end_line(lines, open_tags, next_word=right)
+                append_word(left, lines[-1], open_tags)
+                length = end_line(lines, open_tags, next_word=right)
             else:
-                end_line(lines, open_tags, next_word=word)
+                length = end_line(lines, open_tags, next_word=word)
 
     end_line(lines, open_tags)
     lines.pop()
@@ -72,44 +127,208 @@ def break_words(words, width):
     return lines
 
 
-def insert_spaces(lines, alignment, width):
-    # Depending on alignment, insert appropriate amount of spaces between words
+# Demerits of the optimal line breaking, the badness of a line
+# is 100 when it needs as many extra spaces as it has spaces.
+LINE_PENALTY = 10
+HYPHEN_PENALTY = 25
+DOUBLE_HYPHEN_DEMERITS = 10000
+# Lines that cannot be stretched (single word) or that are too long
+UNSTRETCHABLE_BADNESS = 10000
+OVERFULL_DEMERITS = 10 ** 9
+# Loosest line considered on the first try, without hyphenation (as
+# TeX's pretolerance), and on the second try
+PRETOLERANCE = 100
+TOLERANCE = 200
+
+# A break is the index of a word and where the word is hyphenated,
+# or None when breaking at the space after the word.
+Break = Tuple[int, Optional[int]]
+
+
+def break_words_optimally(words, width, language):
+    # Same as break_words, but with the breaks that minimize
+    # the demerits of the whole paragraph (Knuth-Plass).
+
+    breaks = (
+        optimal_breaks(words, width, language, PRETOLERANCE, hyphenation=False)
+        or optimal_breaks(words, width, language, TOLERANCE)
+        or optimal_breaks(words, width, language)
+    )
+    lines: List[Line] = [[]]
+    open_tags: List[str] = []
+    b = 0
+
+    for i, word in enumerate(words):
+        hyphenated = 0
+        while breaks[b][0] == i and breaks[b][1] is not None:
+            index = breaks[b][1]
+            left, word = word.split_at(index - hyphenated)
+            hyphenated = index
+            # Don't add a hyphen if the word is a compound word
+            if not left.word().endswith("-"):
+                left += "-"
+            append_word(left, lines[-1], open_tags)
+            end_line(lines, open_tags)
+            b += 1
+        append_word(word, lines[-1], open_tags)
+        if breaks[b] == (i, None):
+            end_line(lines, open_tags)
+            b += 1
+
+    lines.pop()
+
+    return lines
+
+
+def optimal_breaks(
+    words, width, language, tolerance=None, hyphenation=True
+) -> Optional[List[Break]]:
+    """Breaks with the least total demerits, ending with the last word.
+
+    Every space is a feasible break, and so are the hyphenation points of
+    words that do not fit on a line, unless `hyphenation` is off. Only breaks
+    less than a line away from the current word are active. With a
+    `tolerance`, lines with a higher badness are not considered, and None is
+    returned if the paragraph cannot be broken without such a line.
+
+    Hyphenation points are most of the breaks of a paragraph: a first pass
+    without them sets most paragraphs at a fraction of the cost.
+    """
+    last = len(words) - 1
+
+    # Nodes are stored in parallel lists, node 0 is the start of the paragraph
+    breaks: List[Optional[Break]] = [None]
+    previous = [0]
+    demerits = [0]
+    hyphenated = [False]
+    # Position and word at which the line after the break starts
+    starts = [0]
+    start_words = [0]
+    # Nodes are created in order of position, and lines only get longer:
+    # the active nodes are the ones from `first` on.
+    first = 0
+
+    position = 0
+    for i, word in enumerate(words):
+        word_end = position + word.length
+        # (break, end of the line, start of the next line, penalty)
+        candidates = []
+        if hyphenation and word_end - starts[first] > width:
+            text = word.word()
+            candidates = [
+                ((i, offset), position + offset + (text[offset - 1] != "-"), position + offset,
+                 HYPHEN_PENALTY)
+                for offset in hyphenation_points(text, language)
+            ]
+        candidates.append(((i, None), word_end, word_end + 1, 0))
+
+        for break_, end, start, penalty in candidates:
+            while first < len(starts) and end - starts[first] > width:
+                first += 1
+            last_line = break_ == (last, None)
+            best = best_demerits = None
+
+            # The later a node, the looser its line: stop at the first one
+            # above the tolerance.
+            for a in range(first, len(starts)):
+                slack = width - end + starts[a]
+                spaces = i - start_words[a]
+                if last_line or slack == 0:
+                    badness = 0
+                elif spaces == 0:
+                    badness = UNSTRETCHABLE_BADNESS
+                else:
+                    badness = 100 * slack ** 3 // spaces ** 3
+                if tolerance is not None and badness > tolerance:
+                    break
+
+                line_demerits = (LINE_PENALTY + badness) ** 2 + penalty ** 2
+                if penalty and hyphenated[a]:
+                    line_demerits += DOUBLE_HYPHEN_DEMERITS
+                total = demerits[a] + line_demerits
+                if best_demerits is None or total < best_demerits:
+                    best, best_demerits = a, total
+
+            if first == len(starts):
+                if tolerance is not None:
+                    return None
+                # Nothing fits, put as little as possible on an overfull line
+                first -= 1
+                best, best_demerits = first, demerits[first] + OVERFULL_DEMERITS
+
+            if best is not None:
+                breaks.append(break_)
+                previous.append(best)
+                demerits.append(best_demerits)
+                hyphenated.append(penalty > 0)
+                starts.append(start)
+                start_words.append(i if break_[1] is not None else i + 1)
+
+        position = word_end + 1
+
+    result = []
+    node = len(breaks) - 1
+    while node:
+        result.append(breaks[node])
+        node = previous[node]
+    return result[::-1]
+
+
+def insert_spaces(lines, alignment, width) -> List[int]:
+    # Depending on alignment, insert appropriate amount of spaces between words,
+    # returns the length of each line
+    lengths = []
     for i, line in enumerate(lines):
+        # Length of the text and indices of the spaces, in a single pass
+        length = 0
+        spaces = []
+        for j, elem in enumerate(line):
+            if isinstance(elem, str):
+                length += len(elem)
+            elif isinstance(elem, d.Space):
+                spaces.append(j)
+        length += len(spaces)
+
+        widths: Counter = Counter()
         # For the last line, we will let it be left-aligned
         if alignment == Alignment.justify and i < len(lines) - 1:
             # To justify the paragraph, we will take a random sample
             # of words from the line and add a space to them
-
-            # with_space=True because each word will get one space after
-            spaces_to_add = width - line_length(line, with_spaces=True)
-            indices_candidates = [
-                i for i, elem in enumerate(line)
-                if isinstance(elem, d.Space)
-                and i != len(line) - 1
-            ]
+            spaces_to_add = width - length
+            indices_candidates = [j for j in spaces if j != len(line) - 1]
 
             # If we have more spaces to add than candidates,
-            # we need to double the population space.
-            population: List[int] = copy(indices_candidates)
-            while spaces_to_add > len(population):
-                population.extend(indices_candidates)
+            # we need to repeat the population space.
+            if indices_candidates:
+                repeat = max(1, -(-spaces_to_add // len(indices_candidates)))
+                population = indices_candidates * repeat
+                indices = line_random(line, width).sample(population, spaces_to_add)
+                # Spaces are shared, count the added spaces separately
+                widths.update(indices)
+                length += spaces_to_add
+
+        # Replace all Space object with spaces:
+        for j in spaces:
+            line[j] = " " * (1 + widths[j])
+        lengths.append(length)
+    return lengths
 
-            indices = random.sample(population, spaces_to_add)
-            for index in indices:
-                assert isinstance(line[index], d.Space)
-                line[index].count += 1
 
-        # Replace all Space object with single spaces:
-        for j, e in enumerate(line):
-            if isinstance(e, d.Space):
-                line[j] = " " * e.count
+def line_random(line: Line, width: int) -> random.Random:
+    """Random generator seeded by the words of a line and its width.
 
+    Justifying a line gives the same result wherever it is rendered,
+    regardless of what was rendered before.
+    """
+    words = "\0".join(e for e in line if isinstance(e, str))
+    return random.Random(zlib.crc32(("%d\0%s" % (width, words)).encode("UTF-8")))
 
-def add_padding(lines, alignment, width):
+
+def add_padding(lines, lengths, alignment, width):
     # --- Step 3 --------------------------------------------------------------
     # Add necessary padding
-    for line in lines:
-        padding = " " * (width - line_length(line, with_spaces=True))
+    for line, length in zip(lines, lengths):
+        padding = " " * (width - length)
 
         if alignment == Alignment.left or alignment == Alignment.justify:
             line.append(padding)
@@ -146,20 +365,71 @@ def format_lines(lines, text_filter, format_func):
         ]
 
 
+# Kinds of tokens
+TEXT, SPACE, TAG = 0, 1, 2
+
+
+@slotted
+@dataclass
+class Tokens:
+    """Inline text as parallel arrays of the kind, element and text width of each token.
+
+    Tokens are texts, the shared space and format tags, words are found and measured
+    from the kinds and widths.
+    """
+    kinds: array = field(default_factory=lambda: array("b"))
+    elements: List[Union[Element, d.Space]] = field(default_factory=list)
+    widths: array = field(default_factory=lambda: array("l"))
+
+    def words(self) -> List["Word"]:
+        """Runs of tokens between spaces."""
+        kinds = self.kinds.tobytes()
+        space = bytes([SPACE])
+        # Length of the text before each token
+        offsets = [0, *accumulate(self.widths)]
+        words = []
+        start = 0
+        while start < len(kinds):
+            end = kinds.find(space, start)
+            if end < 0:
+                end = len(kinds)
+            if end > start:
+                words.append(Word(self.elements[start:end], offsets[end] - offsets[start]))
+            start = end + 1
+        return words
+
+    def key(self) -> Hashable:
+        """Hashable form of the tokens."""
+        kinds = self.kinds.tobytes()
+        tag = bytes([TAG])
+        i = kinds.find(tag)
+        if i < 0:
+            return tuple(self.elements)
+        elements = list(self.elements)
+        while i >= 0:
+            element = elements[i]
+            elements[i] = (element.kind, element.open, tuple(element.data.items()))
+            i = kinds.find(tag, i + 1)
+        return tuple(elements)
+
+
+@slotted
 @dataclass
 class Word:
     elems: List[Element]
+    # Length of the text of the word, without tags
+    length: int
 
     def __len__(self):
-        return len(self.word())
+        return self.length
 
     def __iadd__(self, s: str):
-        last_str_index = next(
-            i for i, elem in list(enumerate(self.elems))[::-1]
-            if isinstance(elem, str)
-        )
-        self.elems[last_str_index] += s  # type: ignore
-        return self
+        for i in range(len(self.elems) - 1, -1, -1):
+            if isinstance(self.elems[i], str):
+                self.elems[i] += s  # type: ignore
+                self.length += len(s)
+                return self
+        raise ValueError("Cannot append to a word without text: %s" % self.elems)
 
     def word(self) -> str:
         return "".join(elem for elem in self.elems if isinstance(elem, str))
@@ -177,7 +447,7 @@ class Word:
                     break
                 i += len(elem)
             left.append(elem)
-        return Word(left), Word(right)
+        return Word(left, index), Word(right, self.length - index)
 
 
 def get_tag(element):
@@ -194,41 +464,42 @@ def get_tag(element):
     return FormatTag(Format[element.__class__.__name__])
 
 
-def flatten(elements: d.TextElements) -> List[Union[Element, d.Space]]:
-    result: List[Union[Element, d.Space]] = []
-    for element in elements:
-        if isinstance(element, str):
-            result.append(element)
-        elif isinstance(element, d.Space):
-            result.append(element)
-        elif isinstance(element, d.Unprocessed):
-            result.append("<%s>" % element.kind)
-        else:
-            tag = get_tag(element)
-            result.append(tag)
-            result.extend(flatten(element.children))  # type: ignore
-            result.append(tag.close_tag)
-    return result
-
-
-def split(iterable, separator):
-    groups = groupby(iterable, lambda e: e != separator)
-    return (list(group) for b, group in groups if b)
-
-
-def line_length(line: Line, with_spaces=False) -> int:
-    only_words = [e for e in line if isinstance(e, str)]
-    length_words = sum(len(word) for word in only_words)
-    if with_spaces:
-        return length_words + sum(1 for e in line if isinstance(e, d.Space))
-    return length_words
-
+def tokenize(elements: d.TextElements) -> Tokens:
+    tokens = Tokens()
+    add_kind, add_element, add_width = (
+        tokens.kinds.append, tokens.elements.append, tokens.widths.append)
+
+    def add_elements(elements):
+        for element in elements:
+            if isinstance(element, str):
+                add_kind(TEXT)
+                add_element(element)
+                add_width(len(element))
+            elif isinstance(element, d.Space):
+                add_kind(SPACE)
+                add_element(element)
+                add_width(0)
+            elif isinstance(element, d.Unprocessed):
+                text = "<%s>" % element.kind
+                add_kind(TEXT)
+                add_element(text)
+                add_width(len(text))
+            else:
+                tag = get_tag(element)
+                add_kind(TAG)
+                add_element(tag)
+                add_width(0)
+                add_elements(element.children)  # type: ignore
+                add_kind(TAG)
+                add_element(tag.close_tag)
+                add_width(0)
 
-def room_left(line: Line, width: int) -> int:
-    return width - line_length(line, with_spaces=True)
+    add_elements(elements)
+    return tokens
 
 
-def append_word(word, line, open_tags):
+def append_word(word, line, open_tags) -> int:
+    """Appends a word and a space to a line, returns the added length."""
     for element in word.elems:
         if isinstance(element, FormatTag):
             tag = element
@@ -244,9 +515,11 @@ def append_word(word, line, open_tags):
         else:
             line.append(element)
     line.append(d.Space())
+    return word.length + 1
 
 
-def end_line(lines, open_tags, next_word=None):
+def end_line(lines, open_tags, next_word=None) -> int:
+    """Starts a new line, returns its length."""
     next_line = []
     # Remove trailing space first
     if isinstance(lines[-1][-1], d.Space):
@@ -257,6 +530,8 @@ def end_line(lines, open_tags, next_word=None):
     for kind in open_tags:
         # FIXME: Bug: original data object from tag is lost
         next_line.append(FormatTag(kind=kind))
+    length = 0
     if next_word:
-        append_word(next_word, next_line, open_tags)
+        length = append_word(next_word, next_line, open_tags)
     lines.append(next_line)
+    return length
@@ -0,0 +1,101 @@
+"""Snapshots of the mono AST
+
+Everything that the stages after `process()` need (settings, cross-references
+and document elements) can be saved in a compact binary snapshot:
+
+    MONO <version> <source hash> <zlib-compressed pickle>
+
+The source hash covers the markdown documents, the working directory and
+the parser. When it matches, the snapshot is loaded instead of running
+Pandoc and the processor. Upgrading Pandoc does not invalidate snapshots,
+rebuild them with `monospace snapshot --rebuild`.
+"""
+
+import os
+import pickle
+import tempfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from leet.logging import log
+
+from .cache import make_key
+from .domain import Settings
+from .domain import document as d
+
+# Bump when the domain model or the processor change
+SNAPSHOT_VERSION = 7
+
+magic = b"MONO"
+file_extension = "mono"
+
+Processed = Tuple[Settings, Dict[str, str], List[d.Element]]
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+@dataclass
+class Snapshot:
+    version: int
+    key: str
+    processed: Processed
+
+
+def snapshot_key(documents: List[str], working_dir, parser: str) -> str:
+    return make_key(str(SNAPSHOT_VERSION), str(working_dir), parser, *documents)
+
+
+def write_snapshot(path, key: str, processed: Processed) -> None:
+    data = zlib.compress(pickle.dumps(processed, protocol=pickle.HIGHEST_PROTOCOL))
+    header = b"%s %d %s " % (magic, SNAPSHOT_VERSION, key.encode("ascii"))
+
+    path = Path(path)
+    try:
+        # Write atomically, a snapshot is either complete or missing
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + data)
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.warning(f"Could not write snapshot '{path}': {e}")
+        return
+    log.info(f"Wrote snapshot '{path}' ({len(header) + len(data)} bytes).")
+
+
+def read_snapshot(path) -> Snapshot:
+    with open(path, "rb") as f:
+        content = f.read()
+
+    try:
+        header_magic, version, key, data = content.split(b" ", 3)
+        if header_magic != magic:
+            raise ValueError("not a snapshot")
+        if int(version) != SNAPSHOT_VERSION:
+            raise ValueError(f"version {int(version)} is not {SNAPSHOT_VERSION}")
+        processed = pickle.loads(zlib.decompress(data))
+    except (ValueError, zlib.error, pickle.UnpicklingError, EOFError) as e:
+        raise SnapshotError(f"Invalid snapshot '{path}': {e}")
+
+    return Snapshot(version=int(version), key=key.decode("ascii"), processed=processed)
+
+
+def load_snapshot(path, key: str) -> Optional[Processed]:
+    """Returns the processed document of a snapshot if it is up to date."""
+    try:
+        snapshot = read_snapshot(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, SnapshotError) as e:
+        log.warning(str(e))
+        return None
+
+    if snapshot.key != key:
+        log.info(f"Snapshot '{path}' is outdated.")
+        return None
+
+    log.info(f"Loaded snapshot '{path}', skipping parsing and processing.")
+    return snapshot.processed
@@ -1,13 +1,17 @@
 import os
 import re
+from functools import lru_cache
 from pathlib import Path
 
 from leet.logging import log, log_progress
-from spellchecker import SpellChecker
 
 from ..util import flatten
 
-spell = SpellChecker()
+
+@lru_cache(maxsize=None)
+def spell_checker():
+    from spellchecker import SpellChecker
+    return SpellChecker()
 
 
 def check_spelling(path, settings):
@@ -21,6 +25,7 @@ def check_spelling(path, settings):
 
 
 def _check_file(file, settings):
+    spell = spell_checker()
     with open(file, "r") as f:
         lines = _unmarkdown1(f.read()).splitlines()
 
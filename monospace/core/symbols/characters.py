@@ -65,15 +65,15 @@ monospace = {
 
 # X missing from unicode
 # (but small x looks like a small cap X anyway)
-# Q only displays nice in postscript, so replaced with "Q"
+# Q only displays nice in postscript, the other formatters replace it with "Q"
+small_cap_q = "ꞯ"
 small_caps = {
     "A": "ᴀ", "B": "ʙ", "C": "ᴄ", "D": "ᴅ", "E": "ᴇ", "F": "ꜰ",
     "G": "ɢ", "H": "ʜ", "I": "ɪ", "J": "ᴊ", "K": "ᴋ", "L": "ʟ",
-    "M": "ᴍ", "N": "ɴ", "O": "ᴏ", "P": "ᴘ", "Q": "Q", "R": "ʀ",
+    "M": "ᴍ", "N": "ɴ", "O": "ᴏ", "P": "ᴘ", "Q": small_cap_q, "R": "ʀ",
     "S": "ꜱ", "T": "ᴛ", "U": "ᴜ", "V": "ᴠ", "W": "ᴡ", "X": "x",
     "Y": "ʏ", "Z": "ᴢ",
 }
-small_cap_q = "ꞯ"
 small_caps.update(
     {str(i): char for i, char in enumerate(subscript)}
 )
@@ -1,7 +1,12 @@
-from dataclasses import replace
-
-from . import layout, parse, process, render
-from .formatting import PostScriptFormatter
+from . import layout, process, render
+from .formatting import write_files
+from .layout import linear_layout
+from .markdown import parse_markdown
+from .pandoc import start_backend
+from .parse import ast_cache, parse_chapters, shard
+from .render import block_cache
+from .rendering.paragraph import align_cache
+from .snapshot import load_snapshot, snapshot_key, write_snapshot
 from .spelling import check_spelling
 
 
@@ -9,29 +14,88 @@ def typeset(
     markdown_content,
     output,
     working_dir,
-    formatter,
+    formatters,
     linear=False,
-    check_spelling_path=None
+    check_spelling_path=None,
+    use_cache=False,
+    pandoc_server=False,
+    parser="pandoc",
+    snapshot_path=None,
+    jobs=1,
+    editions=None,
 ):
-    # Somehow the real Small Cap Q symbol only displays nice in PostScript
-    if formatter == PostScriptFormatter:
-        from ..core.symbols import characters
-        characters.small_caps["Q"] = characters.small_cap_q
+    """Typesets a book, and returns the paths of the written files without extension.
+
+    Each edition of the book (all the editions of the settings, unless
+    `editions` names some of them) is written to `<output>.<edition>`.
+    """
+    # Either a single markdown document, or a list of consecutive documents
+    documents = [markdown_content] if isinstance(markdown_content, str) else markdown_content
+    # Either a single formatter, or a list of formatters writing the same book
+    formatters = [formatters] if isinstance(formatters, type) else formatters
+
+    processed = None
+    if snapshot_path is not None:
+        key = snapshot_key(documents, working_dir, parser)
+        processed = load_snapshot(snapshot_path, key)
 
-    ast = parse(markdown_content)
-    settings, references, elements = process(ast, working_dir)
+    if processed is None:
+        processed = process_documents(documents, working_dir, use_cache, pandoc_server, parser)
+        if snapshot_path is not None:
+            write_snapshot(snapshot_path, key, processed)
+
+    settings, references, elements = processed
 
     if check_spelling_path is not None:
         check_spelling(check_spelling_path, settings)
 
-    blocks = render(elements, settings, references, formatter=formatter)
-    pages = layout(blocks, settings, formatter, linear=linear)
+    if editions is None:
+        editions = list(settings.editions)
+    edition_settings = [settings.edition(name) for name in editions]
+
+    cache = block_cache() if use_cache else None
+    blocks = render(elements, settings, references, cache=cache, jobs=jobs)
+
+    outputs = []
+    if editions:
+        # Blocks do not depend on the layout settings, all editions share them
+        blocks = list(blocks)
+        for name, edition in zip(editions, edition_settings):
+            edition_output = "%s.%s" % (output, name) if isinstance(output, str) else output
+            write_edition(blocks, edition, edition_output, formatters, linear)
+            outputs.append(edition_output)
+    else:
+        write_edition(blocks, settings, output, formatters, linear)
+        outputs.append(output)
 
+    if cache is not None:
+        cache.log_stats()
+    align_cache.log_stats()
+    return outputs
+
+
+def write_edition(blocks, settings, output, formatters, linear=False):
     if linear:
-        pages = list(pages)
-        settings = replace(
-            settings,
-            page_height=len(pages[0]) + settings.margin_bottom
-        )
+        settings, page = linear_layout(blocks, settings)
+        pages = iter([page])
+    else:
+        pages = layout(blocks, settings)
+
+    # Pages are styled lines, each formatter serialises them as they are laid out
+    write_files(formatters, output, pages, settings)
 
-    formatter.write_file(output, list(pages), settings)
+
+def process_documents(
+    documents,
+    working_dir,
+    use_cache=False,
+    pandoc_server=False,
+    parser="pandoc",
+):
+    if parser == "builtin":
+        ast = parse_markdown("".join(documents))
+    else:
+        cache = ast_cache() if use_cache else None
+        with start_backend(server=pandoc_server) as backend:
+            ast = parse_chapters(shard(documents), cache=cache, backend=backend, stream=True)
+    return process(ast, working_dir)
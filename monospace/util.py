@@ -1,5 +1,6 @@
 import re
 from copy import copy
+from dataclasses import fields
 from pathlib import Path
 
 
@@ -10,6 +11,23 @@ def intersperse(sequence, value):
     return result
 
 
+def slotted(cls):
+    """Recreates a dataclass with `__slots__` instead of an instance `__dict__`.
+
+    Same as `dataclass(slots=True)`, which needs Python 3.10. Base classes
+    must be slotted too, otherwise instances still get a `__dict__`.
+    """
+    inherited = {name for base in cls.__mro__[1:] for name in getattr(base, "__slots__", ())}
+    slots = tuple(f.name for f in fields(cls) if f.name not in inherited)
+
+    namespace = dict(cls.__dict__)
+    for name in slots + ("__dict__", "__weakref__"):
+        namespace.pop(name, None)
+    namespace["__slots__"] = slots
+
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
 def flatten(list):
     return [item for sublist in list for item in sublist]
 
@@ -19,9 +37,17 @@ def flatten_dict(dict):
 
 
 def concatenate_markdown_directory(directory):
+    return collapse_blank_lines("".join(read_markdown_directory(directory)))
+
+
+def read_markdown_directory(directory):
+    """Reads all markdown files of a directory, in alphabetical order.
+
+    Relative image links are rewritten to be relative to `directory`.
+    """
     all_markdown = sorted(Path(directory).rglob("*.md"))
 
-    content = ""
+    documents = []
     for path in all_markdown:
         rel_path = path.relative_to(directory).parent
         with open(path, "r") as f:
@@ -32,8 +58,10 @@ def concatenate_markdown_directory(directory):
                 f"![\\1]({rel_path}/\\2)",
                 markdown
             )
-            content += markdown
-            content += "\n\n"
-    content = re.sub(r"\n\n\n+", "\n\n", content)
+            documents.append(collapse_blank_lines(markdown + "\n\n"))
+
+    return documents
+
 
-    return content
+def collapse_blank_lines(content):
+    return re.sub(r"\n\n\n+", "\n\n", content)
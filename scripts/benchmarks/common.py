@@ -0,0 +1,52 @@
+"""Helpers shared by the benchmarks
+
+Run the benchmarks from the root of the repository, e.g.:
+
+    python scripts/benchmarks/parsers.py
+"""
+
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from leet.logging import log
+
+root = Path(__file__).parents[2]
+resources = root / "resources"
+
+# Benchmark the working tree, quietly
+sys.path.insert(0, str(root))
+log.setLevel(logging.WARNING)
+
+
+def synthetic_book(chapters: int = 10) -> str:
+    """A book made of copies of `resources/test.md`, with unique headers.
+
+    Links to the headers of each copy are renamed accordingly.
+    """
+    source = (resources / "test.md").read_text()
+    meta, body = re.match(r"(---\n.*?\n\.\.\.\n)(.*)", source, re.DOTALL).groups()  # type: ignore
+    header = r"^(#+ .*?)( \{|\^\[|$)"
+    identifiers = [
+        "-".join(re.sub(r"[^\w\s-]", "", title.lower()).split())
+        for title, _ in re.findall(header, body, flags=re.MULTILINE)
+    ]
+    link = r"\]\(#(%s)\)" % "|".join(map(re.escape, identifiers))
+    copies = [
+        re.sub(link, r"](#\1-%d)" % i, re.sub(header, r"\1 %d\2" % i, body, flags=re.MULTILINE))
+        for i in range(chapters)
+    ]
+    return meta + "\n".join(copies)
+
+
+def best_of(function: Callable[[], object], repeat: int = 5) -> float:
+    """Best wall-clock time of a few runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Throughput of processing and rendering a large synthetic AST"""
+
+from collections import deque
+from copy import deepcopy
+
+from common import best_of, root, synthetic_book
+
+from monospace.core.markdown import parse_markdown
+from monospace.core.process import process
+from monospace.core.render import render
+from monospace.core.rendering.paragraph import align_cache
+
+
+def count_nodes(node) -> int:
+    if isinstance(node, dict):
+        return ("t" in node) + sum(count_nodes(value) for value in node.values())
+    if isinstance(node, list):
+        return sum(count_nodes(value) for value in node)
+    return 0
+
+
+def main():
+    ast = parse_markdown(synthetic_book(50))
+    nodes = count_nodes(ast["blocks"])
+    settings, references, elements = process(ast, root)
+    # Measure the work, not the memoization of repeated paragraphs
+    align_cache.max_entries = 0
+
+    processing = best_of(lambda: process(ast, root))
+    # Rendering modifies some elements, render a fresh copy each time
+    copies = iter([deepcopy(elements) for _ in range(5)])
+    rendering = best_of(lambda: deque(
+        render(next(copies), settings, references), maxlen=0))
+
+    print("%d Pandoc nodes, %d top-level elements" % (nodes, len(elements)))
+    print("process %8.1fms %10.0f nodes/s" % (processing * 1000, nodes / processing))
+    print("render  %8.1fms %10.0f elements/s" % (
+        rendering * 1000, len(elements) / rendering))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Aligning the inline text of README.source.md scaled up 100x"""
+
+import re
+import tracemalloc
+
+from common import best_of, resources
+
+from monospace.core.domain import Settings
+from monospace.core.domain import document as d
+from monospace.core.formatting import AnsiFormatter
+from monospace.core.markdown import parse_markdown
+from monospace.core.process import process
+from monospace.core.rendering.paragraph import Alignment, align, align_cache
+
+
+def scaled_readme(copies: int) -> str:
+    source = (resources / "README.source.md").read_text()
+    meta, body = re.match(r"(---\n.*?\n\.\.\.\n)(.*)", source, re.DOTALL).groups()  # type: ignore
+    return meta + "\n".join([body] * copies)
+
+
+def inline_texts(elements) -> list:
+    """Inline text of all the paragraphs, without notes."""
+    texts = []
+    for element in elements:
+        if isinstance(element, d.Paragraph):
+            texts.append([e for e in element.text.elements if not isinstance(e, d.Note)])
+        elif isinstance(element, (d.OrderedList, d.UnorderedList)):
+            for item in element.list_elements:
+                texts.extend(inline_texts(item))
+        elif isinstance(element, d.Aside):
+            texts.extend(inline_texts(element.elements))
+    return texts
+
+
+def main():
+    _, _, elements = process(parse_markdown(scaled_readme(100)), resources)
+    texts = inline_texts(elements)
+    words = sum(len(text) for text in texts) // 2
+
+    settings = Settings.from_meta({}, "")
+
+    def format_func(line):
+        return AnsiFormatter.format_tags(line, settings)
+
+    def align_all():
+        return [
+            align(text, Alignment.justify, 70, format_func=format_func)
+            for text in texts
+        ]
+
+    # Measure the work, not the memoization of repeated paragraphs
+    align_cache.max_entries = 0
+    duration = best_of(align_all, repeat=20)
+
+    tracemalloc.start()
+    align_all()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("%d paragraphs, ~%d words" % (len(texts), words))
+    print("align   %8.1fms %8.1fµs/word" % (duration * 1000, duration / words * 1e6))
+    print("peak    %8.0fkB %8.0fB/word" % (peak / 1000, peak / words))
+
+
+if __name__ == "__main__":
+    main()
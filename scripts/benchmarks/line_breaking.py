@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Breaking and justifying paragraphs, greedily and optimally (Knuth-Plass)"""
+
+import re
+from itertools import cycle, islice
+
+from common import best_of, root, synthetic_book
+
+from monospace.core.domain import document as d
+from monospace.core.markdown import parse_markdown
+from monospace.core.process import process
+from monospace.core.rendering.paragraph import (Alignment, LineBreaking, align,
+                                                align_cache)
+from monospace.util import intersperse
+
+text = (
+    "Typography is the visual component of the written word. A text is a sequence "
+    "of words, and it stays the same no matter how it is rendered, typography is "
+    "how it looks. Extraordinarily uncharacteristically long words get hyphenated."
+).split()
+
+
+def paragraph(words: int) -> list:
+    """A paragraph of `words` words, every tenth word in bold."""
+    elements = [
+        d.Bold([word]) if i % 10 == 0 else word
+        for i, word in enumerate(islice(cycle(text), words))
+    ]
+    return intersperse(elements, d.Space())
+
+
+def book_paragraphs(chapters: int) -> list:
+    """Text of the top-level paragraphs of a synthetic book, without notes."""
+    _, _, elements = process(parse_markdown(synthetic_book(chapters)), root)
+    return [
+        [e for e in element.text.elements if not isinstance(e, d.Note)]
+        for element in elements
+        if isinstance(element, d.Paragraph)
+    ]
+
+
+def justify(paragraphs, line_breaking):
+    return [
+        align(elements, Alignment.justify, 70, line_breaking=line_breaking)
+        for elements in paragraphs
+    ]
+
+
+def main():
+    # Measure the work, not the memoization of repeated paragraphs
+    align_cache.max_entries = 0
+    print("   words    greedy   optimal   ratio")
+    for words in (10, 100, 1000, 10000):
+        elements = paragraph(words)
+        timings = [
+            best_of(lambda: align(elements, Alignment.justify, 70, line_breaking=b), repeat=5)
+            for b in LineBreaking
+        ]
+        print("%8d %7.1fms %7.1fms %6.2fx" % (
+            words, timings[0] * 1000, timings[1] * 1000, timings[1] / timings[0]))
+
+    paragraphs = book_paragraphs(20)
+    words = sum(len(elements) for elements in paragraphs) // 2
+    print("\nbook of %d paragraphs, ~%d words" % (len(paragraphs), words))
+    print("           time  hyphenated  widened gaps")
+    for line_breaking in LineBreaking:
+        duration = best_of(lambda: justify(paragraphs, line_breaking), repeat=5)
+        lines = [line for lines in justify(paragraphs, line_breaking) for line in lines[:-1]]
+        hyphenated = sum(line.endswith("-") for line in lines)
+        # Gaps between words that justification made wider than one space
+        widened = sum(len(re.findall("  +", line)) for line in lines)
+        print("%-8s %5.1fms %11d %13d" % (
+            line_breaking.name, duration * 1000, hyphenated, widened))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Memory used by the mono AST and the rendered blocks, per word of input,
+and by the pages of a book of ~1000 pages, per page"""
+
+import importlib
+import tracemalloc
+
+from common import root, synthetic_book
+
+from monospace.core.markdown import parse_markdown
+from monospace.core.process import process
+from monospace.core.render import render
+
+layout = importlib.import_module("monospace.core.layout")
+
+
+def traced(function):
+    """Result of `function`, with the memory it keeps and its peak memory."""
+    tracemalloc.start()
+    try:
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+
+def main():
+    markdown = synthetic_book(20)
+    words = len(markdown.split())
+    ast = parse_markdown(markdown)
+
+    (settings, references, elements), processed, processing_peak = traced(
+        lambda: process(ast, root))
+    _, rendered, rendering_peak = traced(
+        lambda: list(render(elements, settings, references)))
+
+    print("%d words of input" % words)
+    print("           kept/word  peak/word")
+    print("process %10.0fB %9.0fB" % (processed / words, processing_peak / words))
+    print("render  %10.0fB %9.0fB" % (rendered / words, rendering_peak / words))
+
+    # Pages keep references to the lines of the blocks, only count the pages
+    settings, references, elements = process(parse_markdown(synthetic_book(160)), root)
+    blocks = list(render(elements, settings, references))
+    s = settings
+    content_length = s.page_height - s.margin_top - s.margin_bottom
+
+    pages, broken, _ = traced(
+        lambda: list(layout.break_blocks(iter(blocks), False, content_length, s.margin_top)))
+    _, rendered_pages, _ = traced(lambda: list(layout.render_pages(pages, False, s)))
+
+    print("\n%d pages" % len(pages))
+    print("             kept/page")
+    print("break     %10.0fB" % (broken / len(pages)))
+    print("render    %10.0fB" % (rendered_pages / len(pages)))
+
+
+if __name__ == "__main__":
+    main()
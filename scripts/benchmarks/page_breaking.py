@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Breaking a book of ~1000 pages into pages, greedily and optimally"""
+
+import importlib
+
+from common import best_of, root, synthetic_book
+
+from monospace.core import parse, process, render
+from monospace.core.domain import Settings
+
+layout = importlib.import_module("monospace.core.layout")
+
+
+def book_blocks(chapters: int, copies: int):
+    """Blocks of a synthetic book without chapter page breaks, repeated."""
+    markdown = synthetic_book(chapters).replace(
+        "break-before: [Chapter, SubChapter]", "break-before: []")
+    settings, cross_references, elements = process(parse(markdown), root)
+    return settings, list(render(elements, settings, cross_references)) * copies
+
+
+def statistics(pages, content_length: int) -> str:
+    holes = [content_length - len(main) for main, _ in pages[:-1]]
+    overflow = sum(
+        max(0, len(main) - content_length) + max(0, max(sides, default=-1) + 1 - content_length)
+        for main, sides in pages
+    )
+    return "%6d %10.1f %9d %9d" % (len(pages), sum(holes) / len(holes), max(holes), overflow)
+
+
+def main():
+    settings, blocks = book_blocks(20, copies=16)
+    s: Settings = settings
+    content_length = s.page_height - s.margin_top - s.margin_bottom
+
+    def greedy():
+        return list(layout.break_blocks(iter(blocks), False, content_length, s.margin_top))
+
+    def optimal(lookahead):
+        return list(layout.break_blocks_optimally(
+            iter(blocks), content_length, s.margin_top, lookahead))
+
+    print("%d blocks" % len(blocks))
+    print("                   time   pages  mean hole  max hole  overflow")
+    duration = best_of(greedy, repeat=3)
+    print("greedy       %7.1fms" % (duration * 1000), statistics(greedy(), content_length))
+    for lookahead in (1, 2, 4, 8):
+        duration = best_of(lambda: optimal(lookahead), repeat=3)
+        print("optimal (%d)  %7.1fms" % (lookahead, duration * 1000),
+              statistics(optimal(lookahead), content_length))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Composing and serialising the pages of a synthetic book, per page and formatter"""
+
+import importlib
+
+from common import best_of, root, synthetic_book
+
+from monospace.core import parse, process, render
+from monospace.core.formatting import (AnsiFormatter, HtmlFormatter,
+                                       PostScriptFormatter)
+
+layout = importlib.import_module("monospace.core.layout")
+
+
+def main():
+    settings, cross_references, elements = process(parse(synthetic_book(20)), root)
+    s = settings
+    blocks = list(render(elements, s, cross_references))
+    content_length = s.page_height - s.margin_top - s.margin_bottom
+    pages = list(layout.break_blocks(iter(blocks), False, content_length, s.margin_top))
+    rendered_pages = list(layout.render_pages(pages, False, s))
+
+    print("%d pages" % len(pages))
+    print("                   per page")
+    duration = best_of(lambda: list(layout.render_pages(pages, False, s)), repeat=10)
+    print("compose       %8.1fµs" % (duration / len(pages) * 1e6))
+    for formatter in (AnsiFormatter, HtmlFormatter, PostScriptFormatter):
+        duration = best_of(
+            lambda: [formatter.format_page(page, s) for page in rendered_pages], repeat=10)
+        print("%-13s %8.1fµs" % (formatter.file_extension, duration / len(pages) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
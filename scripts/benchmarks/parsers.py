@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Pandoc versus the built-in markdown parser"""
+
+from common import best_of, synthetic_book
+
+from monospace.core.markdown import parse_markdown
+from monospace.core.parse import parse
+
+
+def main():
+    print("chapters      chars     pandoc    builtin   speedup")
+    for chapters in (1, 10, 50):
+        markdown = synthetic_book(chapters)
+        assert parse(markdown)["blocks"] == parse_markdown(markdown)["blocks"]
+
+        pandoc = best_of(lambda: parse(markdown))
+        builtin = best_of(lambda: parse_markdown(markdown))
+        print("%8d %10d %8.1fms %8.1fms %8.1fx" % (
+            chapters, len(markdown), pandoc * 1000, builtin * 1000, pandoc / builtin))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Processing books with thousands of headers and cross-references"""
+
+from common import best_of, root
+
+from monospace.core.markdown import parse_markdown
+from monospace.core.process import process
+
+
+def cross_referenced_book(headers: int) -> str:
+    """A book where every sub-chapter links to an earlier and a later one."""
+    sections = []
+    for i in range(headers):
+        if i % 10 == 0:
+            sections.append("# Chapter %d\n" % i)
+        sections.append(
+            "## Section %d\n\nSee [before](#section-%d) and [after](#section-%d).\n"
+            % (i, i // 2, (i * 7 + 1) % headers)
+        )
+    return "\n".join(sections)
+
+
+def main():
+    print(" headers    process   per header")
+    for headers in (500, 1000, 2000, 4000):
+        ast = parse_markdown(cross_referenced_book(headers))
+
+        duration = best_of(lambda: process(ast, root), repeat=3)
+        print("%8d %8.1fms %10.1fµs" % (headers, duration * 1000, duration / headers * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+
+from monospace.core import parse
+from monospace.core.cache import DiskCache, MemoryCache, make_key
+from monospace.core.parse import ast_cache
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = DiskCache("test", max_size=1024, directory=tmp_path)
+    key = make_key("content")
+
+    assert cache.get(key) is None
+    cache.put(key, b"data")
+    assert cache.get(key) == b"data"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_keys_are_unambiguous():
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache("test", max_size=350, directory=tmp_path)
+    keys = [make_key(str(i)) for i in range(3)]
+
+    # Incompressible payloads, so that each entry takes ~100 bytes on disk
+    for i, key in enumerate(keys):
+        cache.put(key, os.urandom(90))
+        os.utime(cache.path(key), (i, i))
+
+    # Touch the oldest entry, the second one is now the least recently used
+    assert cache.get(keys[0]) is not None
+
+    cache.put(make_key("3"), os.urandom(90))
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache("test", max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_parse_cache_skips_pandoc(tmp_path, monkeypatch):
+    cache = ast_cache(directory=tmp_path)
+    markdown = "# Title\n\nSome *text*."
+
+    ast = parse(markdown, cache=cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Pandoc should not be called on a cache hit")
+
+    monkeypatch.setattr("monospace.core.pandoc.Pandoc.convert", fail)
+
+    assert parse(markdown, cache=cache) == ast
+    assert cache.hits == 1
@@ -0,0 +1,181 @@
+import tracemalloc
+
+import pytest
+
+from monospace.core import layout, parse, process, render
+from monospace.core.domain import Settings
+from monospace.core.domain import blocks as b
+from monospace.core.formatting import AnsiFormatter
+from monospace.core.layout import (Page, break_blocks, break_blocks_optimally,
+                                   linear_layout, place_sides)
+from monospace.core.typeset import write_edition
+
+paragraph = "Amongst moments do in arrived at my replied, fat weddings servants but man.\n\n"
+
+
+def peak_memory(paragraphs, output) -> int:
+    """Peak memory of rendering, laying out and writing a book."""
+    settings, references, elements = process(parse(paragraph * paragraphs), ".")
+    tracemalloc.start()
+    try:
+        write_edition(render(elements, settings, references), settings, output, [AnsiFormatter])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def test_peak_memory_does_not_grow_with_the_book(tmp_path):
+    # Load the hyphenation dictionaries and fill the caches first
+    peak_memory(10, str(tmp_path / "warm-up"))
+
+    short = peak_memory(200, str(tmp_path / "short"))
+    long = peak_memory(1000, str(tmp_path / "long"))
+
+    assert long < short * 1.5
+
+
+def test_linear_page_height():
+    settings, references, elements = process(parse(paragraph * 20), ".")
+
+    settings, page = linear_layout(render(elements, settings, references), settings)
+
+    assert settings.page_height == len(page) + settings.margin_bottom
+
+
+def test_rendered_pages_share_repeated_lines():
+    settings, references, elements = process(parse(paragraph * 60), ".")
+
+    pages = list(layout(render(elements, settings, references), settings))
+    first, third = list(pages[0]), list(pages[2])
+
+    assert len(pages) > 2
+    assert all(len(page) == settings.page_height for page in pages)
+    assert first[-1] is third[-1]
+    assert first[-2] == pages[0][-2]
+
+
+def test_rendered_page_lines_are_indexed_like_they_are_iterated():
+    markdown = "---\ndraw-borders: true\n...\n\n" + paragraph * 3 + "Noted.^[A note]\n"
+    settings, references, elements = process(parse(markdown), ".")
+
+    page = next(layout(render(elements, settings, references), settings))
+    lines = list(page)
+
+    assert [page[j] for j in range(len(page))] == lines
+    assert page[-1] == lines[-1] and page[2:-2:3] == lines[2:-2:3]
+    with pytest.raises(IndexError):
+        page[len(page)]
+
+
+def lines(name, count):
+    return [("%s%d" % (name, i),) for i in range(count)]
+
+
+def test_optimal_page_breaking_splits_paragraphs_without_widows():
+    blocks = [
+        b.Block(main=lines("a", 6), block_offset=0),
+        b.Block(main=lines("p", 5), block_offset=0, splittable=True),
+    ]
+
+    greedy = list(break_blocks(iter(blocks), False, 10, 0))
+    optimal = list(break_blocks_optimally(iter(blocks), 10, 0, 4))
+
+    assert [len(page.main) for page in greedy] == [6, 5]
+    # Splitting after the 4th line would leave the last line alone on the next page
+    assert [page.main for page in optimal] == [lines("a", 6) + lines("p", 3), lines("p", 5)[3:]]
+
+
+def test_optimal_page_breaking_avoids_carrying_sides():
+    blocks = [
+        b.Block(main=lines("a", 2), sides=[lines("r", 8)], block_offset=0),
+        b.Block(main=lines("b", 2), sides=[lines("s", 7)], block_offset=0),
+    ]
+
+    greedy = list(break_blocks(iter(blocks), False, 10, 0))
+    optimal = list(break_blocks_optimally(iter(blocks), 10, 0, 4))
+
+    # The sides of the second block don't fit next to the first ones
+    assert greedy == [
+        Page(main=lines("a", 2) + lines("b", 2), sides=lines("r", 8)),
+        Page(main=[], sides=lines("s", 7)),
+    ]
+    assert optimal == [
+        Page(main=lines("a", 2), sides=lines("r", 8)),
+        Page(main=lines("b", 2), sides=lines("s", 7)),
+    ]
+
+
+def test_optimal_page_breaking_over_a_small_lookahead():
+    blocks = [b.Block(main=lines("p", 7), splittable=True) for _ in range(20)]
+
+    pages = list(break_blocks_optimally(iter(blocks), 10, 0, 1))
+
+    assert [line for page in pages for line in page.main if line] == lines("p", 7) * 20
+    assert all(len(page.main) <= 10 for page in pages)
+
+
+def test_overlapping_sides_are_centered_on_their_desired_lines():
+    sides = [(0, 4, lines("r", 3)), (0, 4, lines("s", 3))]
+
+    placed, carried = place_sides(sides, 0, 20)
+
+    assert placed == [None] * 2 + lines("r", 3) + [None] + lines("s", 3)
+    assert carried == []
+
+
+def test_sides_are_not_moved_above_their_highest_line():
+    sides = [(4, 4, lines("r", 3)), (0, 4, lines("s", 3))]
+
+    placed, _ = place_sides(sides, 0, 20)
+
+    assert placed == [None] * 4 + lines("r", 3) + [None] + lines("s", 3)
+
+
+def test_sides_are_moved_up_to_the_bottom_and_carried():
+    sides = [(0, 8, lines("r", 4)), (0, 9, lines("s", 4)), (0, 9, lines("t", 4))]
+
+    placed, carried = place_sides(sides, 1, 11)
+
+    assert placed == [None] * 2 + lines("r", 4) + [None] + lines("s", 4)
+    assert carried == [lines("t", 4)]
+
+
+def test_dense_sides_are_carried_to_the_next_page():
+    blocks = [b.Block(main=lines("a", 1), sides=[lines("n", 4)], block_offset=0)] * 6
+
+    pages = list(break_blocks(iter(blocks), False, 10, 0))
+
+    # Two sides fit next to a page, the sides of 4 blocks next to two pages
+    assert [page.main for page in pages] == [lines("a", 1) * 4, lines("a", 1) * 2, []]
+    assert [line for page in pages for line in page.sides if line] == lines("n", 4) * 6
+
+
+def test_sides_taller_than_the_page_are_split():
+    blocks = [b.Block(main=lines("a", 2), sides=[lines("n", 25)], block_offset=0)]
+
+    for pages in (
+        list(break_blocks(iter(blocks), False, 10, 0)),
+        list(break_blocks_optimally(iter(blocks), 10, 0, 4)),
+    ):
+        assert [page.main for page in pages] == [lines("a", 2), [], []]
+        assert [page.sides for page in pages] == [
+            lines("n", 25)[:10], lines("n", 25)[10:20], lines("n", 25)[20:]]
+
+
+def test_unknown_page_breaking():
+    with pytest.raises(ValueError, match="Unknown page breaking"):
+        Settings.from_meta({"page-breaking": "best"}, "")
+
+
+def test_unknown_edition_page_breaking():
+    with pytest.raises(ValueError, match="Edition 'x': Unknown page breaking 'best'"):
+        Settings.from_meta({"editions": {"x": {"page-breaking": "best"}}}, "")
+
+    settings = Settings.from_meta({"editions": {"x": {"page-breaking": "optimal"}}}, "")
+    assert settings.edition("x").page_breaking == "optimal"
+
+
+def test_edition_page_lookahead_is_checked():
+    with pytest.raises(ValueError, match="Edition 'x': Page lookahead must be at least 1"):
+        Settings.from_meta({"editions": {"x": {"page-lookahead": 0}}}, "")
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import pytest
+
+from monospace.core import parse
+from monospace.core.markdown import parse_markdown
+
+resources = Path(__file__).parent.parent / "resources"
+
+
+def assert_same_ast(markdown):
+    expected = parse(markdown)
+    actual = parse_markdown(markdown)
+
+    assert actual["meta"] == expected["meta"]
+    assert actual["blocks"] == expected["blocks"]
+
+
+@pytest.mark.parametrize("path", sorted(resources.glob("*.md")), ids=lambda p: p.name)
+def test_resources_conform_to_pandoc(path):
+    assert_same_ast(path.read_text())
+
+
+@pytest.mark.parametrize("markdown", [
+    "*a **b** c* ***d*** **e *f*** *unclosed snake_case_x",
+    "`code` ``a`b`` `unclosed and ` spaced `",
+    "[text](http://x.com/a b \"Title\") <http://auto.org> <me@x.com>",
+    "[ref], [Text][ref], [missing] and [x][]\n\n[ref]: http://example.com 'T'\n",
+    "Note[^1], ^[inline *note*], H~2~O, x^2^, ~~gone~~.\n\n[^1]: Note.\n\n    More.\n",
+    "Hard  \nbreaks\\\nand  soft\n  ones",
+    "e.g. this, i.e. that, Mr. Smith.",
+    "See e.g. [^1], e.g. [^2] and e.g. ^[inline].\n\n[^1]: Note.\n",
+    "'Single' \"double\" it's '90s rock'n'roll (x)'s \"unclosed -- --- ...",
+    "#\n\n## ##\n\n"
+    "# Same\n\n## Same {#custom .class key=\"value\"}\n\nSetext\n---\n\n# Same #\n\n[Same]",
+    "> quote\nlazy\n> > nested\n\n- a\n- b\n\n    c\n- d\n",
+    "1. one\n2. two\n   - tight\n   - list\n3. three\n\n#. x\n\na) a\nb) b\n",
+    "    code\n\n    more\n\n~~~ {.python #id}\nx\n~~~\n\n```Python\ny\n```\n\n* * *\n",
+    ":::: Aside\nText\n\n::: {.inner}\nx\n:::\n::::\n",
+    "![](a.png){palette=RGB}\n\n![Caption](b.png)\n\n- [ ] todo\n- [x] done\n",
+    "---\na: yes\nb: 1.50\nc: [x, y z]\nd:\n  - one\n  - e: f\ng: |\n  p1\n\n  p2\n...\n",
+])
+def test_features_conform_to_pandoc(markdown):
+    assert_same_ast(markdown)
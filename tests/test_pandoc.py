@@ -0,0 +1,91 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from monospace.core import parse
+from monospace.core.pandoc import (Pandoc, PandocServer, default_backend,
+                                   find_pandoc, start_backend)
+
+# Stand-in for `pandoc server`, implementing the same JSON API
+# on top of the real Pandoc binary
+fake_server = textwrap.dedent("""\
+    #!{python}
+    import json, subprocess, sys
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    if sys.argv[1] == "--version":
+        print("pandoc 0.0-fake")
+        sys.exit(0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            output = subprocess.run(
+                [{pandoc!r}, "--from", body["from"], "--to", body["to"]],
+                input=body["text"].encode(), stdout=subprocess.PIPE,
+            ).stdout.decode()
+            response = json.dumps({{"output": output, "base64": False}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+    port = int(sys.argv[2].split("=")[1])
+    HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+""")
+
+
+@pytest.fixture
+def fake_pandoc(tmp_path):
+    path = tmp_path / "pandoc"
+    path.write_text(fake_server.format(python=sys.executable, pandoc=find_pandoc()))
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_import_does_not_probe_pandoc():
+    subprocess.check_call([
+        sys.executable, "-c",
+        "import sys, monospace.core.parse; assert 'pypandoc' not in sys.modules"
+    ])
+
+
+def test_pandoc_path_from_environment(monkeypatch, fake_pandoc):
+    monkeypatch.setenv("PANDOC_PATH", fake_pandoc)
+    find_pandoc.cache_clear()
+    try:
+        assert Pandoc().version == "0.0-fake"
+    finally:
+        find_pandoc.cache_clear()
+
+
+def test_pandoc_server(fake_pandoc):
+    markdown = "# Title\n\nSome *text*."
+
+    with PandocServer(fake_pandoc) as server:
+        assert server.version == "0.0-fake"
+        for _ in range(3):
+            assert parse(markdown, backend=server) == parse(markdown)
+
+    assert server.process.poll() is not None
+
+
+def test_pandoc_server_fallback(monkeypatch, tmp_path):
+    broken = tmp_path / "pandoc"
+    broken.write_text(textwrap.dedent("""\
+        #!/bin/sh
+        if [ "$1" = --version ]; then echo "pandoc 1.0"; exit 0; fi
+        echo "server mode is not supported" >&2
+        exit 1
+    """))
+    broken.chmod(0o755)
+
+    backend = default_backend()
+    monkeypatch.setenv("PANDOC_PATH", str(broken))
+    find_pandoc.cache_clear()
+    try:
+        assert start_backend(server=True) is backend
+    finally:
+        find_pandoc.cache_clear()
@@ -1,15 +1,21 @@
+import pytest
+
 from monospace.core.domain import Settings
 from monospace.core.domain import document as d
 from monospace.core.formatting import Format as F
 from monospace.core.formatting import FormatTag, HtmlFormatter
-from monospace.core.rendering.paragraph import Alignment, align, flatten
+from monospace.core.rendering.paragraph import (SPACE, TAG, TEXT, Alignment,
+                                                LineBreaking, align,
+                                                align_cache, hyphenate,
+                                                hyphenation_points, hyphenator,
+                                                tokenize)
 from monospace.util import intersperse
 
 
 def s(): return d.Space()
 
 
-def test_flatten():
+def test_tokenize_flattens_elements():
     elements = [
         "This", s(), "text", s(), "contains",
         s(), "mixed", s(), "styles:", s(),
@@ -29,7 +35,19 @@ def test_flatten():
         FormatTag(F.Bold, open=False)
     ]
 
-    assert flatten(elements) == expected
+    assert tokenize(elements).elements == expected
+
+
+def test_tokenize():
+    tokens = tokenize(["Some", s(), d.Bold(["bold", s(), "text"]), "."])
+
+    assert list(tokens.kinds) == [TEXT, SPACE, TAG, TEXT, SPACE, TEXT, TAG, TEXT]
+    assert list(tokens.widths) == [4, 0, 0, 4, 0, 4, 0, 1]
+    assert [(word.elems, word.length) for word in tokens.words()] == [
+        (["Some"], 4),
+        ([FormatTag(F.Bold, open=True), "bold"], 4),
+        (["text", FormatTag(F.Bold, open=False), "."], 5),
+    ]
 
 
 def test_plain_paragraph_rendering():
@@ -147,6 +165,159 @@ def test_punctuation_after_tag():
     assert align(text, Alignment.left, 14, format_func=format_func) == expected
 
 
+def test_justified_paragraph_shares_spaces():
+    words = intersperse("Spaces are shared by all the words of this text.".split(), s())
+
+    lines = align(words, Alignment.justify, 21)
+
+    assert [len(line.split()) for line in lines] == [4, 5, 1]
+    assert all(len(line) == 21 for line in lines)
+    assert all(word is s() for word in words[1::2])
+
+
+def test_justification_does_not_depend_on_previous_paragraphs():
+    text = "Smile spoke total few great had never their too. Amongst moments do in arrived at my replied."  # noqa
+    words = intersperse(text.split(), s())
+    other = intersperse("Fat weddings servants but man believed prospect.".split(), s())
+
+    alone = align(words, Alignment.justify, 30)
+    for _ in range(3):
+        align(other, Alignment.justify, 30)
+
+    assert align(words, Alignment.justify, 30) == alone
+
+
+def test_optimal_line_breaking():
+    text = "Smile spoke total few great had never their too. Amongst moments do in arrived at my replied. Fat weddings servants but man believed prospect. Companions understood is as especially pianoforte connection introduced. Nay newspaper can sportsman are admitting gentleman belonging his."  # noqa
+    words = intersperse(text.split(), s())
+    width = 40
+
+    expected = [
+        "Smile spoke total few great had never",
+        "their too. Amongst moments do in arrived",
+        "at my replied. Fat weddings servants",
+        "but man believed prospect. Companions",
+        "understood is as especially pianoforte",
+        "connection introduced. Nay newspaper can",
+        "sportsman are admitting gentleman be-",
+        "longing his.",
+    ]
+
+    greedy = align(words, Alignment.justify, width)
+    optimal = align(words, Alignment.justify, width, line_breaking=LineBreaking.optimal)
+
+    assert [" ".join(line.split()) for line in optimal] == expected
+    assert all(len(line) == width for line in optimal)
+    # Fewer hyphenated lines than when filling each line greedily
+    assert sum(line.endswith("-") for line in optimal) < sum(
+        line.endswith("-") for line in greedy)
+
+
+def test_optimal_line_breaking_avoids_hyphenation_when_possible():
+    text = "Smile spoke total few great had never their too. Amongst moments do in arrived at my replied. Fat weddings servants but man believed prospect. Companions understood is as especially pianoforte connection introduced. Nay newspaper can sportsman are admitting gentleman belonging his."  # noqa
+    words = intersperse(text.split(), s())
+
+    greedy = align(words, Alignment.justify, 70)
+    optimal = align(words, Alignment.justify, 70, line_breaking=LineBreaking.optimal)
+
+    assert any(line.endswith("-") for line in greedy)
+    assert not any(line.endswith("-") for line in optimal)
+    assert all(len(line) == 70 for line in optimal)
+
+
+def test_optimal_line_breaking_reopens_tags():
+    text = [
+        "Yet", s(), "bed", s(),
+        d.Bold([
+            "any", s(), "for", s(),
+            d.Italic(["travelling", s(), "assistance"]),
+            s(), "indulgence", s(), "unpleasing", s(), "foobar.",
+        ]),
+        s(), "Not", s(), "thoughts",
+    ]
+
+    settings = Settings.from_meta({}, "")
+    format_func = lambda t: HtmlFormatter.format_tags(t, settings)  # noqa
+
+    lines = align(
+        text, Alignment.justify, 21, format_func=format_func,
+        line_breaking=LineBreaking.optimal,
+    )
+
+    assert lines[0].startswith("Yet")
+    for line in lines[1:-1]:
+        assert line.startswith("<b>") and line.endswith("</b>")
+        assert line.count("<i>") == line.count("</i>")
+
+
+def test_unknown_line_breaking_setting():
+    with pytest.raises(ValueError):
+        Settings.from_meta({"line-breaking": "balanced"}, "")
+
+
+def test_hyphenate_like_pyphen():
+    words = ["understood", "pianoforte", "connection", "well-known", "Typography", "a"]
+    pyphen = hyphenator("en_US")
+
+    for word in words:
+        for width in range(-1, len(word) + 2):
+            wrapped = pyphen.wrap(word, width)
+            expected = len(wrapped[0]) - 1 if wrapped else None
+            assert hyphenate(word, width, "en_US") == expected
+
+
+def test_hyphenation_points_are_computed_once():
+    hyphenation_points.cache_clear()
+
+    for width in range(2, 12):
+        hyphenate("extraordinarily", width, "en_US")
+
+    assert hyphenation_points.cache_info().misses == 1
+
+
+def test_hyphenation_language():
+    words = intersperse("Die Rechtschreibung".split(), s())
+
+    assert align(words, Alignment.left, 12, language="de") == [
+        "Die Recht-  ",
+        "schreibung  ",
+    ]
+    assert align(words, Alignment.left, 12, language="en_US") == [
+        "Die         ",
+        "Rechtschreibung",
+    ]
+    with pytest.raises(ValueError):
+        align(words, Alignment.left, 12, language="tlh")
+
+
+def test_align_is_memoized():
+    def link(identifier):
+        return [d.CrossRef(identifier=identifier, children=["link"])]
+
+    def upper(line):
+        return "".join(e for e in line if isinstance(e, str)).upper()
+
+    align_cache.clear()
+    hits, misses = align_cache.hits, align_cache.misses
+
+    first = align(link("a"), Alignment.left, 6, format_func=upper)
+    first.append("changed")
+    again = align(link("a"), Alignment.left, 6, format_func=upper)
+    unformatted = align(link("a"), Alignment.left, 6)
+    other = align(link("b"), Alignment.left, 6)
+
+    assert again == ["LINK  "]
+    assert unformatted == other == ["link  "]
+    # Only the second call is a hit: the format function and the
+    # identifier of the link are part of the key
+    assert (align_cache.hits - hits, align_cache.misses - misses) == (1, 3)
+
+
+def test_domain_elements_are_slotted():
+    assert not hasattr(d.Bold(["text"]), "__dict__")
+    assert not hasattr(d.Paragraph(d.Text(["text"])), "__dict__")
+
+
 def ignore_test_punctuation_on_new_line():
     text = ["Hello,", s(), d.Bold(["World"]), "!"]
     expected = [
@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+from monospace.core import parse
+from monospace.core.parse import parse_chapters, shard, split_chapters
+from monospace.util import (concatenate_markdown_directory,
+                            read_markdown_directory)
+
+resources = Path(__file__).parent.parent / "resources"
+
+
+@pytest.mark.parametrize("name", ["test.md", "README.source.md", "images.md"])
+def test_sharded_parse_is_identical(name):
+    markdown = (resources / name).read_text()
+    chapters = shard([markdown])
+
+    assert parse_chapters(chapters) == parse(markdown)
+
+
+def test_sharded_directory_parse_is_identical(tmp_path):
+    for i, name in enumerate(["test.md", "images.md"]):
+        chapter_dir = tmp_path / ("chapter%d" % i)
+        chapter_dir.mkdir()
+        (chapter_dir / name).write_text((resources / name).read_text())
+
+    documents = read_markdown_directory(tmp_path)
+    chapters = shard(documents)
+
+    assert len(chapters) > len(documents)
+    assert parse_chapters(chapters) == parse(concatenate_markdown_directory(tmp_path))
+
+
+@pytest.mark.parametrize("name", ["test.md", "README.source.md"])
+def test_streamed_parse_is_identical(name):
+    markdown = (resources / name).read_text()
+    expected = parse(markdown)
+
+    for ast in [parse(markdown, stream=True), parse_chapters(shard([markdown]), stream=True)]:
+        assert ast["meta"] == expected["meta"]
+        assert list(ast["blocks"]) == expected["blocks"]
+
+
+def test_split_chapters():
+    markdown = "\n".join([
+        "---",
+        "# Not a header",
+        "...",
+        "",
+        "# One",
+        "",
+        "```",
+        "",
+        "# Not a header",
+        "```",
+        "",
+        "# Two",
+        "Text",
+        "# Not a header",
+    ])
+
+    chapters = split_chapters(markdown)
+
+    assert [c.splitlines()[0] for c in chapters] == ["---", "# One", "# Two"]
+
+
+def test_duplicate_identifiers_across_chapters():
+    markdown = "# A\n\n## Intro\n\n## Intro\n\n# B\n\n## Intro\n\n## Intro-1\n"
+    chapters = shard([markdown])
+
+    assert len(chapters) == 2
+    assert parse_chapters(chapters) == parse(markdown)
+
+
+def test_no_sharding_with_shared_footnotes():
+    markdown = "# A\n\nText[^1]\n\n# B\n\n[^1]: Note\n"
+
+    assert shard([markdown]) == [markdown]
@@ -0,0 +1,52 @@
+import json
+import tracemalloc
+
+from monospace.core import parse, process
+from monospace.core.domain import document as d
+from monospace.core.parse import decode_stream, parse_raw
+from monospace.core.process import processors
+
+
+def synthetic_book(chapters):
+    paragraph = " ".join(["Some *emphasized* and **strong** words,"] * 10)
+    return "\n\n".join(
+        "# Chapter %d\n\nSee [the next one](#chapter-%d).\n\n" % (i, (i + 1) % chapters)
+        + "\n\n".join([paragraph] * 20)
+        for i in range(chapters)
+    )
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_processing_is_identical():
+    raw_ast = parse_raw(synthetic_book(3))
+
+    assert process(decode_stream(raw_ast), ".") == process(json.loads(raw_ast), ".")
+
+
+def test_streamed_processing_releases_pandoc_ast():
+    raw_ast = parse_raw(synthetic_book(20))
+
+    def eager():
+        process(json.loads(raw_ast), ".")
+
+    def streamed():
+        process(decode_stream(raw_ast), ".")
+
+    assert peak_memory(streamed) < 0.6 * peak_memory(eager)
+
+
+def test_registered_process_function(monkeypatch):
+    monkeypatch.setitem(processors, "Strikeout", lambda processor, value: None)
+    ast = parse("Some ~~removed~~ text")
+
+    _, _, elements = process(ast, ".")
+
+    assert elements[0].text.elements == ["Some", d.Space(), d.Space(), "text"]
@@ -0,0 +1,210 @@
+from copy import deepcopy
+from importlib import import_module
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from monospace.cli.typeset import typeset as cli_typeset
+from monospace.core import parse, process, render, typeset
+from monospace.core.cache import DiskCache
+from monospace.core.domain import Settings
+from monospace.core.domain import blocks as b
+from monospace.core.domain import document as d
+from monospace.core.formatting import (AnsiFormatter, HtmlFormatter,
+                                       PostScriptFormatter, styled)
+from monospace.core.render import renderers, renders
+from monospace.core.rendering.paragraph import align_cache
+
+resources = Path(__file__).parent.parent / "resources"
+
+
+class Epigraph(d.Paragraph):
+    pass
+
+
+def test_registered_render_function(monkeypatch):
+    monkeypatch.setitem(renderers, d.PageBreak, renderers[d.PageBreak])
+
+    @renders(d.PageBreak)
+    def render_page_break(renderer, page_break):
+        return [b.Block(main=["1"]), b.Block(main=["2"])]
+
+    settings, references, elements = process(parse("Text\n\n* * *"), ".")
+    blocks = list(render(elements, settings, references))
+
+    assert [block.main for block in blocks[1:]] == [["1"], ["2"]]
+
+
+def test_subclasses_use_registered_render_function():
+    settings, references, elements = process(parse("Text"), ".")
+    epigraph = Epigraph(text=elements[0].text)
+
+    blocks = list(render([epigraph, *elements], settings, references))
+
+    assert blocks[0].main == blocks[1].main
+
+
+def test_block_cache(tmp_path):
+    markdown = "# Title\n\nFirst paragraph.\n\nSecond paragraph.\n\n- A\n- List\n"
+
+    def render_with_cache(markdown):
+        cache = DiskCache("blocks", max_size=1024 * 1024, directory=tmp_path)
+        settings, references, elements = process(parse(markdown), ".")
+        blocks = list(render(elements, settings, references, cache))
+        return blocks, cache
+
+    expected, cache = render_with_cache(markdown)
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    blocks, cache = render_with_cache(markdown)
+    assert (cache.hits, cache.misses) == (4, 0)
+    assert blocks == expected
+
+    blocks, cache = render_with_cache(markdown.replace("Second", "Edited"))
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert blocks[:2] + blocks[3:] == expected[:2] + expected[3:]
+
+
+def test_cached_rendering_is_identical(tmp_path):
+    markdown = (resources / "test.md").read_text()
+    settings, references, elements = process(parse(markdown), ".")
+    expected = list(render(deepcopy(elements), settings, references))
+
+    # Cache only some of the elements first, the others are rendered after them
+    cache = DiskCache("blocks", max_size=16 * 1024 * 1024, directory=tmp_path)
+    list(render(deepcopy(elements[1::2]), settings, references, cache))
+    blocks = list(render(deepcopy(elements), settings, references, cache))
+
+    assert cache.hits > 0 and cache.misses > 0
+    assert blocks == expected
+
+
+def test_notes_are_memoized_across_renderers():
+    settings, references, elements = process(parse("Text.^[A note]\n"), ".")
+    list(render(deepcopy(elements), settings, references))
+
+    misses = align_cache.misses
+    list(render(deepcopy(elements), settings, references))
+
+    assert align_cache.misses == misses
+
+
+def test_parallel_rendering_is_identical():
+    settings, references, elements = process(parse((resources / "test.md").read_text()), ".")
+
+    def render_blocks(jobs):
+        return list(render(deepcopy(elements), settings, references, jobs=jobs))
+
+    assert render_blocks(jobs=3) == render_blocks(jobs=1)
+
+
+def test_paragraph_renders_the_same_alone_and_in_a_book():
+    paragraph = "Amongst moments do in arrived at my replied, fat weddings servants but man " * 5
+    book = (resources / "test.md").read_text() + "\n\n" + paragraph
+
+    def rendered_lines(markdown):
+        settings, references, elements = process(parse(markdown), ".")
+        return list(render(elements, settings, references))[-1].main
+
+    assert rendered_lines(book) == rendered_lines(paragraph)
+
+
+def test_rendered_lines_are_serialised_by_each_formatter():
+    settings, references, elements = process(parse("### Quiz\n\n1. One\n"), ".")
+    section, item = [block.main[0] for block in render(elements, settings, references)]
+
+    def serialized(formatter, line):
+        return formatter.serialize(line, settings).rstrip()
+
+    # Circled numbers are not as wide in every format
+    assert serialized(AnsiFormatter, item) == "⓪   One"
+    assert serialized(HtmlFormatter, item) == "⓪  One"
+    # The small cap Q only displays nice in PostScript
+    assert serialized(HtmlFormatter, section) == '<a name="quiz"><b>Qᴜɪᴢ</b></a>'
+    assert "(ꞯᴜɪᴢ)" in serialized(PostScriptFormatter, section)
+
+
+def test_only_small_caps_glyphs_are_replaced():
+    markdown = "### Quiz\n\nThe ꞯ letter, see [](#quiz).\n"
+    settings, references, elements = process(parse(markdown), ".")
+    lines = [block.main[0] for block in render(elements, settings, references)]
+
+    for formatter in (AnsiFormatter, HtmlFormatter):
+        section, paragraph = [formatter.serialize(line, settings) for line in lines]
+        assert "Qᴜɪᴢ" in section
+        assert "The ꞯ letter" in paragraph and "Qᴜɪᴢ" in paragraph
+    assert "ꞯᴜɪᴢ" in PostScriptFormatter.serialize(lines[1], settings)
+
+
+def test_repeated_spans_are_serialised_once_per_page(monkeypatch):
+    settings = Settings.from_meta({}, "")
+    margin = styled("│ ")
+    page = [margin + styled(["a", "<"]) + margin, margin + styled("b") + margin]
+
+    spans = []
+    format_tags = HtmlFormatter.format_tags
+    monkeypatch.setattr(HtmlFormatter, "format_tags", lambda span, settings: (
+        spans.append(span) or format_tags(span, settings)))
+
+    formatted = HtmlFormatter.format_page(page, settings)
+
+    assert spans == [("│ ",), ("a", "<"), ("b",)]
+    assert formatted.split("\n")[1:3] == ["│ a&lt;│ ", "│ b│ "]
+
+
+def test_typeset_to_several_formats(tmp_path):
+    markdown = (resources / "test.md").read_text()
+    formatters = [AnsiFormatter, HtmlFormatter, PostScriptFormatter]
+
+    typeset(markdown, str(tmp_path / "all"), resources, formatters)
+
+    for formatter in formatters:
+        typeset(markdown, str(tmp_path / "one"), resources, formatter)
+        expected = (tmp_path / ("one." + formatter.file_extension)).read_text()
+        assert (tmp_path / ("all." + formatter.file_extension)).read_text() == expected
+
+
+def test_editions_are_laid_out_from_the_same_blocks(tmp_path, monkeypatch):
+    text = "Amongst moments do in arrived at my replied, fat weddings servants.\n\n" * 80
+    editions = "editions:\n  pocket:\n    dimensions:\n      page-height: 40\n"
+    editions += "  bordered:\n    draw-borders: true\n"
+
+    calls = []
+
+    def counted_render(*args, **kwargs):
+        calls.append(args)
+        return render(*args, **kwargs)
+
+    monkeypatch.setattr(import_module("monospace.core.typeset"), "render", counted_render)
+
+    output = str(tmp_path / "book")
+    outputs = typeset("---\n%s...\n\n%s" % (editions, text), output, ".", AnsiFormatter)
+
+    assert sorted(outputs) == [output + ".bordered", output + ".pocket"]
+    assert len(calls) == 1
+
+    typeset("---\ndimensions:\n  page-height: 40\n...\n\n" + text, output, ".", AnsiFormatter)
+    expected = (tmp_path / "book.ansi").read_text()
+    assert (tmp_path / "book.pocket.ansi").read_text() == expected
+
+
+def test_editions_only_change_the_layout():
+    meta = {"editions": {"wide": {"dimensions": {"body-width": 80}}}}
+
+    with pytest.raises(ValueError, match="cannot change 'dimensions.body-width'"):
+        Settings.from_meta(meta, "")
+    with pytest.raises(ValueError, match="Unknown edition"):
+        Settings.from_meta({}, "").edition("wide")
+
+
+def test_unknown_edition_is_a_usage_error(tmp_path):
+    markdown = tmp_path / "book.md"
+    markdown.write_text("---\neditions:\n  pocket:\n    draw-borders: true\n...\n\nText\n")
+
+    result = CliRunner().invoke(
+        cli_typeset, [str(markdown), "-t", "ansi", "-s", "-p", "--parser", "builtin", "-e", "nope"])
+
+    assert result.exit_code == 2
+    assert "Invalid value for '-e' / '--edition'" in result.output
+    assert "expected one of: pocket" in result.output
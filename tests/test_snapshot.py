@@ -0,0 +1,51 @@
+from importlib import import_module
+from pathlib import Path
+
+import pytest
+
+from monospace.core import typeset
+from monospace.core.formatting import HtmlFormatter
+from monospace.core.snapshot import (SnapshotError, load_snapshot,
+                                     read_snapshot, snapshot_key,
+                                     write_snapshot)
+from monospace.core.typeset import process_documents
+
+resources = Path(__file__).parent.parent / "resources"
+
+
+def test_snapshot_round_trip(tmp_path):
+    markdown = (resources / "test.md").read_text()
+    processed = process_documents([markdown], resources)
+    key = snapshot_key([markdown], resources, "pandoc")
+    path = tmp_path / "test.mono"
+
+    write_snapshot(path, key, processed)
+
+    assert load_snapshot(path, key) == processed
+    assert load_snapshot(path, snapshot_key([markdown + "\n"], resources, "pandoc")) is None
+    assert load_snapshot(tmp_path / "missing.mono", key) is None
+
+
+def test_invalid_snapshot(tmp_path):
+    path = tmp_path / "test.mono"
+    path.write_bytes(b"MONO 1 abc garbage")
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(path)
+    assert load_snapshot(path, "abc") is None
+
+
+def test_typeset_from_snapshot(tmp_path, monkeypatch):
+    markdown = (resources / "test.md").read_text()
+    snapshot_path = tmp_path / "test.mono"
+
+    def run(name):
+        output = str(tmp_path / name)
+        typeset(markdown, output, resources, HtmlFormatter, snapshot_path=snapshot_path)
+        return Path(output + ".html").read_text()
+
+    expected = run("first")
+    # Parsing and processing are skipped
+    monkeypatch.setattr(import_module("monospace.core.typeset"), "process_documents", None)
+
+    assert run("second") == expected
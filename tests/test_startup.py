@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+# Slow to import, and only needed by some features
+heavy_modules = [
+    "cursebox",
+    "jinja2",
+    "pkg_resources",
+    "pygments",
+    "pypandoc",
+    "pyphen",
+    "spellchecker",
+    "urllib.request",
+]
+
+# Cumulative import time of `monospace.cli`, in seconds
+IMPORT_TIME_BUDGET = 0.5
+
+
+def import_times(module):
+    """Cumulative import times in seconds of all modules loaded by `module`."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_cli_does_not_import_heavy_dependencies():
+    imported = import_times("monospace.cli")
+
+    assert [m for m in heavy_modules if m in imported] == []
+
+
+def test_cli_import_time_budget():
+    best = min(import_times("monospace.cli")["monospace.cli"] for _ in range(3))
+
+    assert best < IMPORT_TIME_BUDGET